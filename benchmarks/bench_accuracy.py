@@ -0,0 +1,151 @@
+#! /usr/bin/env python3
+
+"""
+Accuracy and speed of the cumulative integration rules against grid size.
+
+The integrand exp(-r/10) sin(r) on 0 < r < 100 has a known running
+integral. For every grid size and rule, we report:
+
+    - error: the largest deviation from the exact running integral
+    - roundoff: the largest deviation from the same rule summed in extended
+      precision, i.e. the drift picked up by the running sum
+    - best: the best wall time of the call
+
+The rules are scipy.integrate.cumulative_trapezoid, numerics.cumtrapz with
+and without pairwise summation, and numerics.cumsimpson. The "_float32"
+cases integrate the integrand stored in float32, as in compact RDFs.
+
+Usage:
+    python benchmarks/bench_accuracy.py --output accuracy.json
+    python benchmarks/bench_accuracy.py --sizes 1000 100000 --repeat 5
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+import scipy
+import scipy.integrate
+import pykbi
+from pykbi import numerics
+
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000, 10000000]
+
+DECAY = 0.1
+
+
+def Exact(r):
+    """
+    Running integral of exp(-DECAY r) sin(r) from r[0]
+    """
+
+    def antiderivative(x):
+        return -np.exp(-DECAY * x) * (DECAY * np.sin(x) + np.cos(x)) / (DECAY**2 + 1.0)
+
+    return antiderivative(r[1:]) - antiderivative(r[0])
+
+
+def ExtendedTrapezoid(y, r):
+    """
+    The trapezoidal rule summed in extended precision
+    """
+
+    y = y.astype(np.longdouble)
+    dx = np.diff(r).astype(np.longdouble)
+    return np.cumsum(dx * (y[1:] + y[:-1]) / 2, dtype=np.longdouble)
+
+
+def Rules():
+    """
+    Return the rules as a dictionary of (function, input dtype, extended reference)
+    """
+
+    trapezoid = ExtendedTrapezoid
+
+    return {
+        "scipy_trapezoid": (scipy.integrate.cumulative_trapezoid, np.float64, trapezoid),
+        "trapezoid": (numerics.cumtrapz, np.float64, trapezoid),
+        "trapezoid_pairwise": (lambda y, r: numerics.cumtrapz(y, r, pairwise=True),
+                               np.float64, trapezoid),
+        "simpson_pairwise": (lambda y, r: numerics.cumsimpson(y, r, pairwise=True),
+                             np.float64, None),
+        "trapezoid_float32": (numerics.cumtrapz, np.float32, trapezoid),
+        "trapezoid_pairwise_float32": (lambda y, r: numerics.cumtrapz(y, r, pairwise=True),
+                                       np.float32, trapezoid),
+    }
+
+
+def Measure(function, y, r, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(y, r)
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+
+def Run(sizes, repeat):
+    """
+    Run all rules for all sizes, returns the results as a dictionary
+    """
+
+    results = {
+        "environment": {
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "scipy": scipy.__version__,
+            "pykbi": pykbi.__version__,
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+        },
+        "results": [],
+    }
+
+    for size in sizes:
+        r = np.linspace(0.0, 100.0, size)
+        exact = Exact(r)
+
+        for name, (function, dtype, reference) in Rules().items():
+            y = (np.exp(-DECAY * r) * np.sin(r)).astype(dtype)
+
+            result, best = Measure(function, y, r, repeat)
+
+            entry = {"case": name, "size": size, "best": best,
+                     "error": float(np.abs(result - exact).max()),
+                     "roundoff": None}
+            if reference is not None:
+                entry["roundoff"] = float(np.abs(result - reference(y, r)).max())
+
+            results["results"].append(entry)
+            print("{:>28s} {:>9d} bins: {:10.6f} s  error {:9.2e}  roundoff {:>9s}".format(
+                name, size, best, entry["error"],
+                "-" if entry["roundoff"] is None else "{:9.2e}".format(entry["roundoff"])),
+                  file=sys.stderr)
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Accuracy of the cumulative integration rules")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="number of bins in the grid")
+    parser.add_argument("--repeat", type=int, default=3, help="repetitions per case")
+    parser.add_argument("--output", default=None, help="json file, default is stdout")
+    args = parser.parse_args(argv)
+
+    results = Run(args.sizes, args.repeat)
+
+    if args.output is None:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as outfile:
+            json.dump(results, outfile, indent=2)
+
+
+if __name__ == "__main__":
+    main()
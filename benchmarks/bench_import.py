@@ -0,0 +1,71 @@
+#! /usr/bin/env python3
+
+"""
+Benchmark the time it takes to import pykbi.
+
+Every measurement starts a fresh python interpreter, so nothing is cached
+between the runs. The time for a bare interpreter is measured as well and
+subtracted. The result is written as JSON, together with the modules that
+were loaded by the import.
+
+Usage:
+    python benchmarks/bench_import.py --repeat 20 --output import.json
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+
+CHECK = "import sys, json, pykbi; print(json.dumps({m: m in sys.modules for m in %r}))"
+
+HEAVY_MODULES = ["scipy", "scipy.integrate", "scipy.stats", "matplotlib"]
+
+
+def TimeCommand(code, repeat):
+    """
+    Return the wall times of running 'code' in a fresh interpreter
+    """
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the import time of pykbi")
+    parser.add_argument("--repeat", type=int, default=10, help="number of fresh interpreters")
+    parser.add_argument("--output", default=None, help="json file, default is stdout")
+    args = parser.parse_args(argv)
+
+    baseline = TimeCommand("pass", args.repeat)
+    imported = TimeCommand("import pykbi", args.repeat)
+
+    loaded = subprocess.run([sys.executable, "-c", CHECK % HEAVY_MODULES], check=True,
+                            capture_output=True, text=True).stdout
+
+    results = {
+        "python": sys.version.split()[0],
+        "repeat": args.repeat,
+        "interpreter_best": min(baseline),
+        "import_best": min(imported),
+        "import_mean": sum(imported) / len(imported),
+        "pykbi_import_best": min(imported) - min(baseline),
+        "loaded_modules": json.loads(loaded),
+    }
+
+    if args.output is None:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as outfile:
+            json.dump(results, outfile, indent=2)
+
+
+if __name__ == "__main__":
+    main()
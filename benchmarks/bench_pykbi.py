@@ -0,0 +1,167 @@
+#! /usr/bin/env python3
+
+"""
+Benchmarks for pykbi at production sizes.
+
+Every stage of the rdf pipeline is timed on a g(r) generated with the
+oscillatory decaying function, for grids from 1e3 up to 1e6 bins:
+
+    - odf
+    - RDF.Integrate, open and closed
+    - RDF.FindValues, open and closed
+    - CorrectInverseN and CorrectVanDerVegt
+    - KBdata2comp, KBdata3comp and KBdataNcomp CalculateProperties
+
+The results are written as JSON, with the best and mean wall time and the
+peak traced memory of every case, together with the versions of python,
+numpy and scipy, so runs can be compared against each other.
+
+Usage:
+    python benchmarks/bench_pykbi.py --output bench.json
+    python benchmarks/bench_pykbi.py --sizes 1000 10000 --repeat 5
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import scipy
+import pykbi
+
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+
+
+def Measure(function, setup=None, repeat=3):
+    """
+    Time a function and trace its peak memory.
+
+    'setup' is called before every repetition and its return value is passed
+    to 'function', so the stage can be timed on fresh objects.
+    """
+
+    times = []
+    for _ in range(repeat):
+        args = setup() if setup is not None else ()
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+
+    # the memory is traced in a separate run, tracing slows down the timing
+    args = setup() if setup is not None else ()
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {"best": min(times), "mean": sum(times) / len(times),
+            "repeat": repeat, "peak_memory": peak}
+
+
+def Cases(size):
+    """
+    Return the benchmark cases for a grid with 'size' bins,
+    as a dictionary of (function, setup) tuples
+    """
+
+    r = np.linspace(0.01, 100.0, size)
+    gr = pykbi.odf(r, 2.0)
+
+    def new_rdf(closed, integrate=False, **kwargs):
+        def setup():
+            rdf = pykbi.RDF(r, gr, closed=closed, **kwargs)
+            if integrate:
+                rdf.Integrate()
+            return (rdf,)
+        return setup
+
+    def inversen_setup():
+        rdf1 = pykbi.RDF(r, gr, npart=1000, box_size=200.0, eqint=True)
+        rdf2 = pykbi.RDF(r, gr, npart=2000, box_size=250.0, eqint=True)
+        return (rdf1, rdf2)
+
+    # composition sweep with one state point per bin, the same for the
+    # three component cases so their timings compare
+    x1 = np.linspace(0.01, 0.99, size)
+    c1 = 0.03 * x1
+    c2 = 0.03 * (1.0 - x1)
+    G = np.broadcast_to(np.array([[-10.0, -5.0, -3.0],
+                                  [-5.0, -20.0, -4.0],
+                                  [-3.0, -4.0, -15.0]]), (size, 3, 3))
+    c = np.stack([c1, c2, np.full(size, 0.01)], axis=-1)
+
+    return {
+        "odf": (lambda: pykbi.odf(r, 2.0), None),
+        "integrate_open": (lambda rdf: rdf.Integrate(), new_rdf(False)),
+        "integrate_closed": (lambda rdf: rdf.Integrate(), new_rdf(True)),
+        "findvalues_open": (lambda rdf: rdf.FindValues((50.0,)), new_rdf(False, True)),
+        "findvalues_closed": (lambda rdf: rdf.FindValues((0.02, 0.05)), new_rdf(True, True)),
+        "correct_inversen": (pykbi.CorrectInverseN, inversen_setup),
+        "correct_vandervegt": (pykbi.CorrectVanDerVegt,
+                               new_rdf(True, npart=1000, box_size=200.0, eqint=True)),
+        "kbdata2comp": (lambda kb: kb.CalculateProperties(),
+                        lambda: (pykbi.KBdata2comp(-10.0, -20.0, -5.0, c1, c2),)),
+        "kbdata3comp": (lambda kb: kb.CalculateProperties(),
+                        lambda: (pykbi.KBdata3comp(G[:, 0, 0], G[:, 1, 1], G[:, 2, 2],
+                                                   G[:, 0, 1], G[:, 0, 2], G[:, 1, 2],
+                                                   c[:, 0], c[:, 1], c[:, 2]),)),
+        "kbdatancomp": (lambda kb: kb.CalculateProperties(),
+                        lambda: (pykbi.KBdataNcomp(G, c),)),
+    }
+
+
+def Run(sizes, repeat, only=None):
+    """
+    Run all benchmark cases for all sizes, returns the results as a dictionary
+    """
+
+    results = {
+        "environment": {
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "scipy": scipy.__version__,
+            "pykbi": pykbi.__version__,
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+        },
+        "results": [],
+    }
+
+    for size in sizes:
+        for name, (function, setup) in Cases(size).items():
+            if only is not None and name not in only:
+                continue
+            entry = {"case": name, "size": size}
+            entry.update(Measure(function, setup, repeat))
+            results["results"].append(entry)
+            print("{:>22s} {:>9d} bins: {:10.6f} s  {:12d} bytes".format(
+                name, size, entry["best"], entry["peak_memory"]), file=sys.stderr)
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pykbi pipeline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="number of bins in the g(r)")
+    parser.add_argument("--repeat", type=int, default=3, help="repetitions per case")
+    parser.add_argument("--only", nargs="+", default=None, help="only run these cases")
+    parser.add_argument("--output", default=None, help="json file, default is stdout")
+    args = parser.parse_args(argv)
+
+    results = Run(args.sizes, args.repeat, args.only)
+
+    if args.output is None:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as outfile:
+            json.dump(results, outfile, indent=2)
+
+
+if __name__ == "__main__":
+    main()
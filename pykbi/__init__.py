@@ -6,9 +6,23 @@ and work on the position
 """
 
 
+from . import numerics
+from . import profiling
 from .rdf import *
+from .rdfset import *
+from .accumulator import *
 from .odf import *
 from .fscorr import *
+from .resample import *
+from .kernels import *
+from .fourier import *
 from .fct import *
+from .storage import *
+from .parallel import *
+from .uncertainty import *
+from .online import *
+from .reader import *
+from .cache import *
+from .kbmatrix import *
 
 __version__ = "1.0.0"
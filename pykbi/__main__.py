@@ -0,0 +1,8 @@
+"""
+Run the pykbi command line tool, see pykbi.cli
+"""
+
+import sys
+from pykbi.cli import main
+
+sys.exit(main())
@@ -0,0 +1,287 @@
+#! /usr/bin/env python3
+
+"""
+Build radial distribution functions directly from simulation frames.
+
+The accumulator takes coordinate frames one at a time, as (N, 3) numpy arrays
+together with the side length of the cubic box, and histograms the
+minimum-image pair distances. Pairs are found with a linked-cell search, so
+the cost per frame scales with the number of neighbours within the cut-off
+rather than with all pairs. Only the histogram is kept between frames, so
+the frames can be read from a generator and memory stays bounded.
+
+When done, the accumulated g(r) is returned as an RDF object, with the
+number of particles, box size and eqint already set. With a block size, the
+g(r) of every block of frames is kept as well, for uncertainty estimates.
+"""
+
+#pylint: disable=invalid-name
+#pylint: disable=too-many-instance-attributes
+#pylint: disable=too-many-arguments
+
+import itertools
+import numpy as np
+import pykbi.rdf as _rdf
+
+
+__all__ = ["RDFAccumulator"]
+
+
+## offsets to the 27 neighbouring cells, including the cell itself
+_CELL_OFFSETS = np.array(list(itertools.product((-1, 0, 1), repeat=3)))
+
+## number of rows of 'a' compared to all of 'b' at a time, when no cell list is used
+_CHUNK = 1024
+
+
+def _MinimumImage(delta, lt):
+    """
+    Apply the minimum image convention to the distance vectors delta
+    """
+    delta -= lt * np.round(delta / lt)
+    return np.sqrt((delta**2).sum(axis=-1))
+
+
+def _CellPairDistances(pos_a, pos_b, lt, rmax, same):
+    """
+    Generate the distances below rmax between particles in pos_a and pos_b.
+
+    A linked-cell search is used, with cells at least rmax wide. If the box is
+    too small to hold three cells in each direction, all pairs are compared in
+    chunks instead. For same=True, pos_a and pos_b are the same particles, and
+    each pair is only counted once.
+    """
+
+    ncell = int(lt // rmax)
+
+    if ncell < 3:
+        for start in range(0, len(pos_a), _CHUNK):
+            stop = min(start + _CHUNK, len(pos_a))
+            dist = _MinimumImage(pos_b[np.newaxis, :, :] - pos_a[start:stop, np.newaxis, :], lt)
+            if same:
+                # only keep the upper triangle, j > i
+                dist = dist[np.arange(start, stop)[:, np.newaxis] < np.arange(len(pos_b))]
+            yield dist[dist < rmax]
+        return
+
+    cell_a = np.floor(pos_a / lt * ncell).astype(int) % ncell
+    cell_b = np.floor(pos_b / lt * ncell).astype(int) % ncell
+
+    flat_b = (cell_b[:, 0] * ncell + cell_b[:, 1]) * ncell + cell_b[:, 2]
+
+    # sort 'b' by cell, and locate the first particle of each cell
+    order = np.argsort(flat_b, kind="stable")
+    counts = np.bincount(flat_b, minlength=ncell**3)
+    starts = np.cumsum(counts) - counts
+
+    index_a = np.arange(len(pos_a))
+
+    for offset in _CELL_OFFSETS:
+        neigh = (cell_a + offset) % ncell
+        neigh = (neigh[:, 0] * ncell + neigh[:, 1]) * ncell + neigh[:, 2]
+
+        count = counts[neigh]
+        total = count.sum()
+        if total == 0:
+            continue
+
+        # expand every particle in 'a' to all particles in its neighbour cell
+        i = np.repeat(index_a, count)
+        first = np.repeat(np.cumsum(count) - count, count)
+        j = order[np.repeat(starts[neigh], count) + np.arange(total) - first]
+
+        if same:
+            keep = j > i
+            i = i[keep]
+            j = j[keep]
+
+        dist = _MinimumImage(pos_b[j] - pos_a[i], lt)
+        yield dist[dist < rmax]
+
+
+class RDFAccumulator:
+    """
+    Accumulate a radial distribution function from coordinate frames.
+
+    param: rmax: largest distance in the histogram, at most half the box size
+    param: nbins: number of bins in the histogram
+    param: block_size: if set, also keep the averaged g(r) of every
+        'block_size' consecutive frames
+
+    """
+    def __init__(self, rmax, nbins, block_size=None):
+
+        if rmax <= 0.0 or nbins < 1:
+            raise ValueError("RDFAccumulator: 'rmax' and 'nbins' must be positive")
+
+        self.rmax = float(rmax)
+        self.nbins = int(nbins)
+        self.dr = self.rmax / self.nbins
+
+        self.edges = np.linspace(0.0, self.rmax, self.nbins + 1)
+        self.r = 0.5 * (self.edges[1:] + self.edges[:-1])
+        self.shell_volume = 4.0 * np.pi / 3.0 * (self.edges[1:]**3 - self.edges[:-1]**3)
+
+        self.gr_sum = np.zeros(self.nbins)
+        self.lt_sum = 0.0
+        self.nframes = 0
+
+        self.npart = None
+        self.npart_b = None
+        self.eqint = None
+
+        self.block_size = block_size
+        self.blocks = []
+        self._block_sum = np.zeros(self.nbins)
+        self._block_frames = 0
+
+
+    def AddFrame(self, positions, lt, positions_b=None):
+        """
+        Add the pair distances of a single frame to the histogram.
+
+        param: positions: (N, 3) array with the coordinates
+        param: lt: side length of the cubic box
+        param: positions_b: (M, 3) array with the coordinates of the second
+            species, if the rdf is between particles of different type
+        """
+
+        if 2.0 * self.rmax > lt:
+            raise ValueError("RDFAccumulator: 'rmax' must be at most half the box size")
+
+        eqint = positions_b is None
+
+        pos_a = np.mod(np.asarray(positions, dtype=float), lt)
+        pos_b = pos_a if eqint else np.mod(np.asarray(positions_b, dtype=float), lt)
+
+        if self.nframes == 0:
+            self.npart = len(pos_a)
+            self.npart_b = len(pos_b)
+            self.eqint = eqint
+        elif eqint != self.eqint or len(pos_a) != self.npart or len(pos_b) != self.npart_b:
+            raise ValueError("RDFAccumulator: all frames must contain the same particles")
+
+        counts = np.zeros(self.nbins)
+        for dist in _CellPairDistances(pos_a, pos_b, lt, self.rmax, eqint):
+            counts += np.bincount(np.minimum((dist / self.dr).astype(int), self.nbins - 1),
+                                  minlength=self.nbins)
+
+        volume = lt**3
+        if eqint:
+            # each pair is counted once
+            norm = 2.0 * volume / (self.npart * (self.npart - 1))
+        else:
+            norm = volume / (self.npart * self.npart_b)
+
+        gr = norm * counts / self.shell_volume
+
+        self.gr_sum += gr
+        self.lt_sum += lt
+        self.nframes += 1
+
+        if self.block_size is not None:
+            self._block_sum += gr
+            self._block_frames += 1
+            if self._block_frames == self.block_size:
+                self.blocks.append(self._block_sum / self.block_size)
+                self._block_sum = np.zeros(self.nbins)
+                self._block_frames = 0
+
+
+    def AddFrames(self, frames):
+        """
+        Add frames from an iterable or generator, one at a time.
+
+        Every frame is a tuple (positions, lt) or (positions, lt, positions_b).
+        """
+
+        for frame in frames:
+            self.AddFrame(*frame)
+
+
+    def Merge(self, other):
+        """
+        Add the frames of another accumulator with the same histogram to this one.
+
+        With blocks, the completed blocks of the other accumulator are kept,
+        so it must have the same block size. Its frames not yet in a block,
+        which for an accumulator without blocks are all its frames, are added
+        to our unfinished block. A block never holds more than 'block_size'
+        frames, so these must fit in what is left of our unfinished block,
+        e.g. when merging accumulators of single frames, as AccumulateFrames
+        does. Otherwise a ValueError is raised.
+        """
+
+        if other.nframes == 0:
+            return
+
+        if other.nbins != self.nbins or other.rmax != self.rmax:
+            raise ValueError("RDFAccumulator: can only merge accumulators with the same bins")
+
+        if self.nframes == 0:
+            self.npart = other.npart
+            self.npart_b = other.npart_b
+            self.eqint = other.eqint
+        elif (other.eqint != self.eqint or other.npart != self.npart
+              or other.npart_b != self.npart_b):
+            raise ValueError("RDFAccumulator: all frames must contain the same particles")
+
+        if self.block_size is not None:
+            if other.block_size is None:
+                other_sum, other_frames = other.gr_sum, other.nframes
+            elif other.block_size == self.block_size:
+                other_sum, other_frames = other._block_sum, other._block_frames
+            else:
+                raise ValueError("RDFAccumulator: can only merge accumulators with the same "
+                                 "block size")
+
+            if self._block_frames + other_frames > self.block_size:
+                raise ValueError("RDFAccumulator: the frames to merge do not fit in the "
+                                 "unfinished block")
+
+        self.gr_sum += other.gr_sum
+        self.lt_sum += other.lt_sum
+        self.nframes += other.nframes
+
+        if self.block_size is None:
+            return
+
+        if other.block_size is not None:
+            self.blocks.extend(other.blocks)
+
+        self._block_sum += other_sum
+        self._block_frames += other_frames
+
+        if self._block_frames == self.block_size:
+            self.blocks.append(self._block_sum / self.block_size)
+            self._block_sum = np.zeros(self.nbins)
+            self._block_frames = 0
+
+
+    def ReturnBlocks(self):
+        """
+        Return the g(r) of the completed blocks as an array of shape (n_blocks, n_bins)
+        """
+
+        if not self.blocks:
+            print("No completed blocks in the accumulator.")
+            return None
+
+        return np.array(self.blocks)
+
+
+    def ReturnRDF(self, closed=True, name=None):
+        """
+        Return the averaged g(r) as an RDF object
+        """
+
+        if self.nframes == 0:
+            print("No frames have been added to the accumulator.")
+            return None
+
+        return _rdf.RDF(self.r.copy(), self.gr_sum / self.nframes,
+                        closed=closed,
+                        npart=self.npart,
+                        box_size=self.lt_sum / self.nframes,
+                        eqint=self.eqint,
+                        name=name)
@@ -0,0 +1,220 @@
+#! /usr/bin/env python3
+
+"""
+Opt-in memoization of integrals, read-outs and finite size corrections.
+
+When windows are tuned interactively, the same g(r) is integrated, corrected
+and read out over and over. With the cache enabled, the results of
+RDF.Integrate, RDF.FindValues, RDF.ScanWindows, CorrectVanDerVegt and
+CorrectInverseN are stored under a key built from a hash of the input arrays
+and the parameters (npart, box size, eqint, integration type, window), and
+repeated calls return the stored results instead of recomputing them.
+
+The results are kept in a bounded in-memory LRU, and optionally in a
+directory on disk, one binary file per result (see storage), so they survive
+between sessions. The cache is disabled by default, and costs a single check
+per call when it is disabled.
+
+    pykbi.EnableCache(maxsize=256, directory="kbi-cache")
+    ...
+    pykbi.DisableCache()
+
+The cached arrays are returned as copies, so modifying a result never changes
+the cache.
+"""
+
+#pylint: disable=invalid-name
+#pylint: disable=global-statement
+
+import collections
+import copy
+import hashlib
+import json
+import os
+import numpy as np
+
+
+__all__ = ["EnableCache", "DisableCache", "ClearCache", "CacheInfo"]
+
+
+class _ResultCache:
+    """
+    LRU of results, each a dictionary of arrays and plain values, with an
+    optional directory on disk behind it.
+    """
+    def __init__(self, maxsize, directory=None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+
+    def _FileName(self, key):
+        return os.path.join(self.directory, key + ".pykbi")
+
+
+    def _Remember(self, key, values):
+        self.entries[key] = values
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+
+    def Get(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(self.entries[key])
+
+        if self.directory is not None and os.path.exists(self._FileName(key)):
+            import pykbi.storage as _storage
+            try:
+                header, arrays = _storage.ReadArrays(self._FileName(key))
+            except (OSError, ValueError):
+                pass
+            else:
+                values = dict(header["values"], **arrays)
+                self._Remember(key, values)
+                self.hits += 1
+                return copy.deepcopy(values)
+
+        self.misses += 1
+        return None
+
+
+    def Put(self, key, values):
+        values = copy.deepcopy(values)
+        self._Remember(key, values)
+
+        if self.directory is None:
+            return
+
+        import pykbi.storage as _storage
+
+        arrays = {name: value for name, value in values.items() if isinstance(value, np.ndarray)}
+        plain = {name: value for name, value in values.items() if name not in arrays}
+
+        # write to a temporary file first, so readers never see a partial file
+        fname = self._FileName(key)
+        try:
+            _storage.WriteArrays(fname + ".tmp", {"values": plain}, arrays)
+            os.replace(fname + ".tmp", fname)
+        except (OSError, TypeError):
+            print("Could not write cache entry to '{}'".format(self.directory))
+
+
+    def Clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+        if self.directory is not None:
+            for fname in os.listdir(self.directory):
+                if fname.endswith(".pykbi"):
+                    os.remove(os.path.join(self.directory, fname))
+
+
+## the active cache, None when caching is disabled
+_cache = None
+
+
+def EnableCache(maxsize=128, directory=None):
+    """
+    Enable the result cache.
+
+    param: maxsize: number of results kept in memory
+    param: directory: directory for results stored on disk, none if not given
+    """
+
+    global _cache
+
+    if maxsize < 1:
+        raise ValueError("EnableCache: 'maxsize' must be at least 1")
+
+    _cache = _ResultCache(maxsize, directory)
+
+
+def DisableCache():
+    """
+    Disable the result cache. Results on disk are kept.
+    """
+
+    global _cache
+    _cache = None
+
+
+def ClearCache():
+    """
+    Remove all results from the cache, in memory and on disk
+    """
+
+    if _cache is not None:
+        _cache.Clear()
+
+
+def CacheInfo():
+    """
+    Return a dictionary with the state of the cache, or None if it is disabled
+    """
+
+    if _cache is None:
+        return None
+
+    return {"hits": _cache.hits, "misses": _cache.misses, "size": len(_cache.entries),
+            "maxsize": _cache.maxsize, "directory": _cache.directory}
+
+
+def _ToJSON(o):
+    if isinstance(o, np.generic):
+        return o.item()
+    raise TypeError
+
+
+def Key(stage, parameters, *arrays):
+    """
+    Return the key of a result from the name of the stage, a json-serializable
+    list of parameters and the input arrays, or None if caching is disabled.
+    """
+
+    if _cache is None:
+        return None
+
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(stage.encode("utf-8"))
+    digest.update(json.dumps(parameters, default=_ToJSON).encode("utf-8"))
+
+    for array in arrays:
+        if array is None:
+            digest.update(b"none")
+            continue
+        array = np.ascontiguousarray(array)
+        digest.update("{}{}".format(array.dtype.str, array.shape).encode("utf-8"))
+        digest.update(array.data)
+
+    return digest.hexdigest()
+
+
+def Get(key):
+    """
+    Return the cached result of a key as a dictionary, or None
+    """
+
+    if key is None or _cache is None:
+        return None
+
+    return _cache.Get(key)
+
+
+def Put(key, values):
+    """
+    Store a result, a dictionary of arrays and json-serializable values
+    """
+
+    if key is None or _cache is None:
+        return
+
+    _cache.Put(key, values)
@@ -0,0 +1,288 @@
+#! /usr/bin/env python3
+
+"""
+Command line tool to run KBI pipelines from a job manifest.
+
+    pykbi manifest.json --workers 4 --output results.csv
+
+The manifest is a JSON (or, with PyYAML installed, YAML) file with a list of
+jobs, and optionally defaults shared by all jobs:
+
+    {
+      "defaults": {"closed": true, "correction": "vdv", "position": [0.1, 0.2]},
+      "jobs": [
+        {"name": "rdf_11", "file": "rdf1.txt", "column": 1,
+         "npart": 1200, "box_size": 14.82, "eqint": true},
+        {"name": "rdf_12", "file": "rdf1.txt", "column": 2,
+         "npart": 1200, "box_size": 14.82, "eqint": false,
+         "correction": "invn",
+         "partner": {"file": "rdf2.txt", "column": 2, "npart": 2400}}
+      ]
+    }
+
+Every job reads a column of a text file (with 'r_column' as the radial
+distances, default 0), applies the correction (null, "vdv" or "invn"), and
+integrates, with the scheme named by 'kernel' if given (see the kernels
+module), and reads out the KBI at 'position'. File names are relative to the
+manifest. The jobs are run with ProcessRDFs, and the results are written as
+one table, CSV or binary (see storage.WriteArrays).
+
+The hash of every job and its input files is kept in a state file next to the
+output, and jobs whose inputs have not changed since the last run are not
+run again, their previous results are reused. Use --force to run all jobs.
+"""
+
+#pylint: disable=invalid-name
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import numpy as np
+import pykbi.parallel as _parallel
+import pykbi.storage as _storage
+
+
+__all__ = ["main"]
+
+
+## keys of a job passed on to the rdf
+_RDF_KEYS = ("file", "column", "r_column", "closed", "kernel", "npart", "box_size", "eqint", "name")
+
+## columns of the result table
+COLUMNS = ["name", "file", "column", "correction", "integral_type", "status",
+           "G", "slope", "r_value", "p_value", "std_error", "limit_low", "limit_high"]
+
+
+def ReadManifest(fname):
+    """
+    Read a manifest, and return the list of jobs with the defaults filled in
+    and the file names made relative to the working directory
+    """
+
+    with open(fname) as infile:
+        if fname.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("Reading YAML manifests needs PyYAML, use JSON instead")
+            manifest = yaml.safe_load(infile)
+        else:
+            manifest = json.load(infile)
+
+    if "jobs" not in manifest:
+        raise ValueError("The manifest '{}' has no 'jobs' entry".format(fname))
+
+    base = os.path.dirname(os.path.abspath(fname))
+    defaults = manifest.get("defaults", {})
+
+    jobs = []
+    for number, entry in enumerate(manifest["jobs"]):
+        job = dict(defaults)
+        job.update(entry)
+
+        if "file" not in job or "column" not in job:
+            raise ValueError("Job {} needs 'file' and 'column' entries".format(number))
+
+        job.setdefault("name", "{}:{}".format(job["file"], job["column"]))
+        job.setdefault("correction", None)
+        job.setdefault("position", None)
+
+        if job["correction"] not in (None, "vdv", "invn"):
+            raise ValueError("Job '{}': unknown correction '{}'".format(job["name"], job["correction"]))
+        if job["correction"] == "invn" and "partner" not in job:
+            raise ValueError("Job '{}': the 'invn' correction needs a 'partner'".format(job["name"]))
+
+        job["file"] = os.path.join(base, job["file"])
+        if job.get("partner") is not None:
+            job["partner"] = dict(job["partner"])
+            job["partner"]["file"] = os.path.join(base, job["partner"]["file"])
+
+        jobs.append(job)
+
+    names = [job["name"] for job in jobs]
+    if len(set(names)) != len(names):
+        raise ValueError("The job names in the manifest must be unique")
+
+    return jobs
+
+
+def _FileDigest(fname, digest):
+    with open(fname, "rb") as infile:
+        for block in iter(lambda: infile.read(1 << 20), b""):
+            digest.update(block)
+
+
+def JobHash(job):
+    """
+    Return a hash of the job settings and the content of its input files
+    """
+
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(json.dumps(job, sort_keys=True).encode("utf-8"))
+
+    _FileDigest(job["file"], digest)
+    if job.get("partner") is not None:
+        _FileDigest(job["partner"]["file"], digest)
+
+    return digest.hexdigest()
+
+
+def _Spec(job):
+    return {key: job[key] for key in _RDF_KEYS if key in job}
+
+
+def _Position(position):
+    # json holds lists or numbers, FindValues expects a tuple
+    if position is None:
+        return None
+    if np.isscalar(position):
+        return (position,)
+    return tuple(position)
+
+
+def _Row(job, rdf):
+    """
+    Return the result table row of a job
+    """
+
+    row = {key: None for key in COLUMNS}
+    row.update({"name": job["name"], "file": job["file"], "column": job["column"],
+                "correction": job["correction"]})
+
+    if rdf is None or rdf.ReturnKBI() is None:
+        row["status"] = "failed"
+        return row
+
+    values = rdf.integral_value
+    row["status"] = "ok"
+    row["integral_type"] = rdf.integral_type
+    row["G"] = float(values["G"])
+
+    for key in ("slope", "r_value", "p_value", "std_error"):
+        if key in values:
+            row[key] = float(values[key])
+
+    if "value_limit" in values:
+        row["limit_low"], row["limit_high"] = [float(v) for v in values["value_limit"]]
+    elif "rint_value" in values:
+        row["limit_low"] = row["limit_high"] = float(values["rint_value"])
+
+    return row
+
+
+def RunJobs(jobs, workers=1, state=None):
+    """
+    Run the jobs, grouped by correction, and return the result rows in the
+    order of the jobs. Jobs with a hash in 'state' are not run again.
+    Returns the rows and the new state.
+    """
+
+    state = {} if state is None else state
+    new_state = {}
+    rows = {}
+
+    pending = {}
+    for job in jobs:
+        key = JobHash(job)
+        previous = state.get(job["name"])
+        if previous is not None and previous["hash"] == key:
+            rows[job["name"]] = previous["row"]
+            new_state[job["name"]] = previous
+        else:
+            pending.setdefault(job["correction"], []).append((job, key))
+
+    for correction, group in pending.items():
+        partners = None
+        if correction == "invn":
+            partners = [_Spec(job["partner"]) for job, _ in group]
+
+        rdfs = _parallel.ProcessRDFs([_Spec(job) for job, _ in group],
+                                     correction=correction,
+                                     position=[_Position(job["position"]) for job, _ in group],
+                                     partners=partners,
+                                     workers=workers)
+
+        for (job, key), rdf in zip(group, rdfs):
+            row = _Row(job, rdf)
+            rows[job["name"]] = row
+            # failed jobs are run again next time
+            if row["status"] == "ok":
+                new_state[job["name"]] = {"hash": key, "row": row}
+
+    return [rows[job["name"]] for job in jobs], new_state
+
+
+def WriteTable(rows, fname, fmt="csv"):
+    """
+    Write the result rows as a CSV table, or as a binary file with one array
+    per numeric column and the text columns in the header
+    """
+
+    if fmt == "csv":
+        with open(fname, "w", newline="") as outfile:
+            writer = csv.DictWriter(outfile, fieldnames=COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+        return
+
+    numeric = ["G", "slope", "r_value", "p_value", "std_error", "limit_low", "limit_high"]
+    arrays = {key: np.array([np.nan if row[key] is None else row[key] for row in rows])
+              for key in numeric}
+    header = {"table": {key: [row[key] for row in rows] for key in COLUMNS if key not in numeric}}
+
+    _storage.WriteArrays(fname, header, arrays)
+
+
+def main(argv=None):
+    """
+    Entry point of the pykbi command
+    """
+
+    parser = argparse.ArgumentParser(prog="pykbi",
+                                     description="Run Kirkwood-Buff integral jobs from a manifest")
+    parser.add_argument("manifest", help="JSON or YAML job manifest")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="number of worker processes, 0 uses all cpus")
+    parser.add_argument("-o", "--output", default="pykbi_results.csv", help="result table")
+    parser.add_argument("-f", "--format", choices=("csv", "binary"), default=None,
+                        help="format of the result table, from the extension by default")
+    parser.add_argument("--state", default=None,
+                        help="state file with the job hashes, default is the output with '.state'")
+    parser.add_argument("--force", action="store_true", help="run all jobs, even if unchanged")
+    args = parser.parse_args(argv)
+
+    fmt = args.format
+    if fmt is None:
+        fmt = "binary" if args.output.endswith(_storage.EXTENSION) else "csv"
+
+    statefile = args.state if args.state is not None else args.output + ".state"
+
+    try:
+        jobs = ReadManifest(args.manifest)
+    except (OSError, ValueError) as error:
+        print("pykbi: {}".format(error), file=sys.stderr)
+        return 1
+
+    state = {}
+    if not args.force and os.path.exists(statefile):
+        with open(statefile) as infile:
+            state = json.load(infile)
+
+    rows, state = RunJobs(jobs, workers=args.workers if args.workers > 0 else None, state=state)
+
+    WriteTable(rows, args.output, fmt)
+
+    with open(statefile, "w") as outfile:
+        json.dump(state, outfile, indent=2)
+
+    failed = sum(1 for row in rows if row["status"] != "ok")
+    print("pykbi: {} jobs, {} failed, results in '{}'".format(len(rows), failed, args.output))
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,9 +3,15 @@
 """
 Fluctuation correlation theory.
 
-This module allow us to work with KBI values. The module currently supports two
-cases: 2 and 3 component mixtures.  In both cases, it will calculate the
-partial molar volume, isosteric heat, and derivative of the chemical potential.
+This module allow us to work with KBI values. The module supports 2 and 3
+component mixtures through explicit formulas, and any number of components
+through the B-matrix of Ben-Naim. In all cases, it will calculate the partial
+molar volume, isosteric heat, and derivative of the chemical potential.
+
+The KB integrals and concentrations may be numpy arrays of any broadcastable
+shape, such as a grid of compositions, and all state points are then
+calculated in one call. ReturnProperties gives the results as a dictionary
+of arrays.
 
 """
 
@@ -16,7 +22,28 @@ partial molar volume, isosteric heat, and derivative of the chemical potential.
 import numpy as _np
 
 
-__all__ = ["KBdata2comp", "KBdata3comp"]
+__all__ = ["KBdata2comp", "KBdata3comp", "KBdataNcomp"]
+
+
+def _AsArray(value):
+    """
+    Keep scalars as they are, and turn sequences into float arrays
+    """
+
+    if _np.isscalar(value):
+        return value
+    return _np.asarray(value, dtype=float)
+
+
+def _Format(value):
+    """
+    Format a scalar as before, and an array of state points compactly
+    """
+
+    if _np.ndim(value) == 0:
+        return "{}".format(value)
+    return _np.array2string(_np.asarray(value), precision=4, separator=',',
+                            suppress_small=True)
 
 
 class KBdata2comp:
@@ -29,20 +56,22 @@ class KBdata2comp:
     param: c1: concentation of component 1
     param: c2: concentration of component 2
 
+    All parameters may be scalars or arrays of broadcastable shapes.
+
     """
     def __init__(self, G11, G22, G12, c1, c2):
 
-        self.G11 = G11
-        self.G22 = G22
-        self.G12 = G12
+        self.G11 = _AsArray(G11)
+        self.G22 = _AsArray(G22)
+        self.G12 = _AsArray(G12)
 
         # numerical density
-        self.c1 = c1
-        self.c2 = c2
+        self.c1 = _AsArray(c1)
+        self.c2 = _AsArray(c2)
 
         # molefraction
-        self.x1 = c1 / (c1 + c2)
-        self.x2 = c2 / (c1 + c2)
+        self.x1 = self.c1 / (self.c1 + self.c2)
+        self.x2 = self.c2 / (self.c1 + self.c2)
 
         self.gamma = None
         self.pmv1 = None
@@ -79,17 +108,33 @@ class KBdata2comp:
                 self.c2 * self.G22 + (self.c1 * self.c2 * F12)) / denum
 
 
+    def ReturnProperties(self):
+        """
+        Return the properties as a dictionary, of arrays for array input
+        """
+
+        return {"x1": self.x1,
+                "x2": self.x2,
+                "gamma": self.gamma,
+                "pmv1": self.pmv1,
+                "pmv2": self.pmv2,
+                "dmu2dx2": self.dmu2dx2,
+                "dmudc1": self.dmudc1,
+                "dmudc2": self.dmudc2,
+                "isothermal_compress": self.isothermal_compress}
+
+
     def PrintProperties(self):
         """
         Print properties to screen
         """
-        print("Thermodynamic factor: {}".format(self.gamma))
-        print("Partial molar volume (Comp. 1): {}".format(self.pmv1))
-        print("Partial molar volume (Comp. 2): {}".format(self.pmv2))
-        print(" Isothermal compressibility (k.T.k_T=): {}".format(self.isothermal_compress))
-        print(" Derivative of chemical potential: dmu_2 / dx2)/(k.T)    : {}".format(self.dmu2dx2))
-        print(" (dmu_1/dc_1)/k.T: {}".format(self.dmudc1))
-        print(" (dmu_2/dc_2)/k.T: {}".format(self.dmudc2))
+        print("Thermodynamic factor: {}".format(_Format(self.gamma)))
+        print("Partial molar volume (Comp. 1): {}".format(_Format(self.pmv1)))
+        print("Partial molar volume (Comp. 2): {}".format(_Format(self.pmv2)))
+        print(" Isothermal compressibility (k.T.k_T=): {}".format(_Format(self.isothermal_compress)))
+        print(" Derivative of chemical potential: dmu_2 / dx2)/(k.T)    : {}".format(_Format(self.dmu2dx2)))
+        print(" (dmu_1/dc_1)/k.T: {}".format(_Format(self.dmudc1)))
+        print(" (dmu_2/dc_2)/k.T: {}".format(_Format(self.dmudc2)))
 
 
 
@@ -105,24 +150,29 @@ class KBdata3comp:
     param: c1: concentation of component 1
     param: c2: concentation of component 2
     param: c3: concentation of component 3
+
+    All parameters may be scalars or arrays of broadcastable shapes. The
+    B-matrix then has the shape (..., 3, 3).
     """
 
     def __init__(self, G11, G22, G33, G12, G13, G23, c1, c2, c3):
-        self.G11 = G11
-        self.G22 = G22
-        self.G33 = G33
-        self.G12 = G12
-        self.G13 = G13
-        self.G23 = G23
+        self.G11 = _AsArray(G11)
+        self.G22 = _AsArray(G22)
+        self.G33 = _AsArray(G33)
+        self.G12 = _AsArray(G12)
+        self.G13 = _AsArray(G13)
+        self.G23 = _AsArray(G23)
 
         #   numerical density
-        self.c1 = c1
-        self.c2 = c2
-        self.c3 = c3
+        self.c1 = _AsArray(c1)
+        self.c2 = _AsArray(c2)
+        self.c3 = _AsArray(c3)
 
-        self.x1 = c1 / (c1 + c2 + c3)
-        self.x2 = c2 / (c1 + c2 + c3)
-        self.x3 = c3 / (c1 + c2 + c3)
+        ctot = self.c1 + self.c2 + self.c3
+
+        self.x1 = self.c1 / ctot
+        self.x2 = self.c2 / ctot
+        self.x3 = self.c3 / ctot
 
         self.gamma0 = None
         self.gamma1 = None
@@ -140,9 +190,9 @@ class KBdata3comp:
         Calculate the properties using the KB coeffs
         """
 
-        D12 = self.G11 * self.G22 - 2.0 * self.G12
-        D13 = self.G11 * self.G33 - 2.0 * self.G13
-        D23 = self.G22 * self.G33 - 2.0 * self.G23
+        D12 = self.G11 + self.G22 - 2.0 * self.G12
+        D13 = self.G11 + self.G33 - 2.0 * self.G13
+        D23 = self.G22 + self.G33 - 2.0 * self.G23
 
         D123 = self.G11 * self.G22 + self.G11 * self.G33 \
         + self.G22 * self.G33 + 2.0 * self.G12 * self.G13 \
@@ -214,21 +264,43 @@ class KBdata3comp:
         ## calculate the B-matrix as given in Ben-Naim
         ## diagonal elements first
 
-        self.B = _np.zeros((3, 3))
+        shape = _np.broadcast(self.G11, self.G22, self.G33, self.G12, self.G13, self.G23,
+                              self.c1, self.c2, self.c3).shape
+
+        self.B = _np.zeros(shape + (3, 3))
 
 
-        self.B[0, 0] = self.c1 + self.c1**2 * self.G11
-        self.B[1, 1] = self.c2 + self.c2**2 * self.G22
-        self.B[2, 2] = self.c3 + self.c3**2 * self.G33
+        self.B[..., 0, 0] = self.c1 + self.c1**2 * self.G11
+        self.B[..., 1, 1] = self.c2 + self.c2**2 * self.G22
+        self.B[..., 2, 2] = self.c3 + self.c3**2 * self.G33
 
-        self.B[0, 1] = self.c1 * self.c2 * self.G12
-        self.B[0, 2] = self.c1 * self.c3 * self.G13
+        self.B[..., 0, 1] = self.c1 * self.c2 * self.G12
+        self.B[..., 0, 2] = self.c1 * self.c3 * self.G13
 
-        self.B[1, 0] = self.c1 * self.c2 * self.G12
-        self.B[1, 2] = self.c2 * self.c3 * self.G23
+        self.B[..., 1, 0] = self.c1 * self.c2 * self.G12
+        self.B[..., 1, 2] = self.c2 * self.c3 * self.G23
 
-        self.B[2, 0] = self.c1 * self.c3 * self.G13
-        self.B[2, 1] = self.c2 * self.c3 * self.G23
+        self.B[..., 2, 0] = self.c1 * self.c3 * self.G13
+        self.B[..., 2, 1] = self.c2 * self.c3 * self.G23
+
+
+    def ReturnProperties(self):
+        """
+        Return the properties as a dictionary, of arrays for array input
+        """
+
+        return {"x1": self.x1,
+                "x2": self.x2,
+                "x3": self.x3,
+                "gamma0": self.gamma0,
+                "gamma1": self.gamma1,
+                "gamma2": self.gamma2,
+                "gamma3": self.gamma3,
+                "pmv0": self.pmv0,
+                "pmv1": self.pmv1,
+                "pmv2": self.pmv2,
+                "isothermal_compress": self.isothermal_compress,
+                "B": self.B}
 
 
     def PrintProperties(self):
@@ -238,15 +310,135 @@ class KBdata3comp:
         """
 
         print("Thermodynamic factor:")
-        print(" Thermodynamic factor 1: {}".format(self.gamma0))
-        print(" Thermodynamic factor 2: {}".format(self.gamma1))
-        print(" Thermodynamic factor 3: {}".format(self.gamma2))
-        print(" Thermodynamic factor 4: {}".format(self.gamma3))
+        print(" Thermodynamic factor 1: {}".format(_Format(self.gamma0)))
+        print(" Thermodynamic factor 2: {}".format(_Format(self.gamma1)))
+        print(" Thermodynamic factor 3: {}".format(_Format(self.gamma2)))
+        print(" Thermodynamic factor 4: {}".format(_Format(self.gamma3)))
         print(" Partial molar volume: ")
-        print(" Component 1: {}".format(self.pmv0))
-        print(" Component 2: {}".format(self.pmv1))
-        print(" Component 3: {}".format(self.pmv2))
-        print(" Isothermal compressibility: {}".format(self.isothermal_compress))
+        print(" Component 1: {}".format(_Format(self.pmv0)))
+        print(" Component 2: {}".format(_Format(self.pmv1)))
+        print(" Component 3: {}".format(_Format(self.pmv2)))
+        print(" Isothermal compressibility: {}".format(_Format(self.isothermal_compress)))
         print(" B-matrix")
         print(_np.array2string(self.B, precision=4, separator=',', suppress_small=True))
-        print(" Determinant: %f" % (_np.linalg.det(self.B)))
+
+        determinant = _np.linalg.det(self.B)
+        if _np.ndim(determinant) == 0:
+            print(" Determinant: %f" % (determinant))
+        else:
+            print(" Determinant: {}".format(_Format(determinant)))
+
+
+
+
+class KBdataNcomp:
+    """
+    Using fluctuation correlation theory to calculate properties of an n component system.
+
+    The properties follow from the B-matrix of Ben-Naim,
+    B_ij = c_i delta_ij + c_i c_j G_ij, through batched linear algebra. Any
+    number of state points can be handled at once, by giving the KB integrals
+    and concentrations as stacks, where the leading axes are the state points.
+
+    param: G: KB integrals, array of shape (..., n, n), symmetric in the last two axes
+    param: c: concentrations, array of shape (..., n)
+
+    After CalculateProperties, with A the inverse of B:
+        pmv: partial molar volumes, (A c)_i / (c A c), shape (..., n)
+        isothermal_compress: k.T.k_T = 1 / (c A c), shape (...)
+        dmudn: N (d mu_i/d N_j)/(k.T) at constant T and P,
+               c_T (A_ij - (A c)_i (A c)_j / (c A c)), shape (..., n, n)
+        dmudx: (d mu_i/d x_j)/(k.T) with x_n as dependent mole fraction,
+               shape (..., n, n-1)
+        gamma: thermodynamic factors x_i (d mu_i/d x_j)/(k.T) for
+               i, j < n, shape (..., n-1, n-1)
+
+    For two components gamma[..., 0, 0] is KBdata2comp.gamma, and for three
+    components the elements of gamma are KBdata3comp.gamma0 to gamma3.
+    """
+    def __init__(self, G, c):
+
+        self.G = _np.asarray(G, dtype=float)
+        self.c = _np.asarray(c, dtype=float)
+
+        ncomp = self.c.shape[-1]
+        if self.G.shape[-2:] != (ncomp, ncomp):
+            raise ValueError("KBdataNcomp: 'G' must have shape (..., n, n) with n = c.shape[-1]")
+
+        self.ncomp = ncomp
+
+        # molefraction
+        self.x = self.c / self.c.sum(axis=-1, keepdims=True)
+
+        self.B = None
+        self.gamma = None
+        self.pmv = None
+        self.dmudn = None
+        self.dmudx = None
+        self.isothermal_compress = None
+
+
+    def CalculateProperties(self):
+        """
+        Calculate properties using KB coeffs
+        """
+
+        ncomp = self.ncomp
+        c_i = self.c[..., :, _np.newaxis]
+        c_j = self.c[..., _np.newaxis, :]
+
+        ## the B-matrix as given in Ben-Naim
+        self.B = c_i * _np.eye(ncomp) + c_i * c_j * self.G
+
+        # solve for the inverse of B and for A c in one batched call
+        shape = self.B.shape[:-1]
+        rhs = _np.concatenate((_np.broadcast_to(_np.eye(ncomp), shape + (ncomp,)),
+                               _np.broadcast_to(c_i, shape + (1,))), axis=-1)
+        solution = _np.linalg.solve(self.B, rhs)
+
+        A = solution[..., :ncomp]
+        Ac = solution[..., ncomp]
+        cAc = (self.c * Ac).sum(axis=-1)
+
+        ## partial molar volume and isothermal compressibility
+        self.pmv = Ac / cAc[..., _np.newaxis]
+        self.isothermal_compress = 1.0 / cAc
+
+        ## derivatives of the chemical potential at constant T and P
+        ctot = self.c.sum(axis=-1)[..., _np.newaxis, _np.newaxis]
+        self.dmudn = ctot * (A - Ac[..., :, _np.newaxis] * Ac[..., _np.newaxis, :]
+                             / cAc[..., _np.newaxis, _np.newaxis])
+
+        self.dmudx = self.dmudn[..., :, :-1] - self.dmudn[..., :, -1:]
+
+        ## thermodynamic factors
+        self.gamma = self.x[..., :-1, _np.newaxis] * self.dmudx[..., :-1, :]
+
+
+    def ReturnProperties(self):
+        """
+        Return the properties as a dictionary of arrays
+        """
+
+        return {"x": self.x,
+                "B": self.B,
+                "gamma": self.gamma,
+                "pmv": self.pmv,
+                "dmudn": self.dmudn,
+                "dmudx": self.dmudx,
+                "isothermal_compress": self.isothermal_compress}
+
+
+    def PrintProperties(self):
+        """
+        Print properties to screen
+        """
+
+        print("Thermodynamic factors:")
+        print(_Format(self.gamma))
+        print(" Partial molar volumes: ")
+        print(_Format(self.pmv))
+        print(" Isothermal compressibility: {}".format(_Format(self.isothermal_compress)))
+        print(" B-matrix")
+        print(_Format(self.B))
+        print(" Determinant: {}".format(_Format(_np.linalg.det(self.B))))
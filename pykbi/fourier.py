@@ -0,0 +1,154 @@
+#! /usr/bin/env python3
+
+"""
+Fourier-space route to the Kirkwood-Buff integrals.
+
+The KBI is the k -> 0 limit of the Fourier transform of h(r) = g(r) - 1,
+
+    h(k) = 4 pi / k int r h(r) sin(kr) dr,      G = h(k = 0),
+
+and the structure factor is S(k) = delta + rho h(k). Instead of truncating the
+integral in real space, we transform the (windowed) h(r) and extrapolate h(k)
+to k = 0 from small k with the Ornstein-Zernike form h(k) = G + a k^2. This
+gives an independent cross-check of the real-space extrapolation done by
+RDF.FindValues.
+
+The sine transform is done with numpy.fft.rfft on a uniform grid, so the cost
+is O(N log N). Grids that are not uniform are resampled first. The transform
+runs along the last axis, so the RDFs of an RDFSet are transformed together.
+
+Windows damp the truncation ripples of the transform:
+    - "lorch": sin(pi r / R) / (pi r / R)
+    - "hann": (1 + cos(pi r / R)) / 2
+    - None: no window
+"""
+
+#pylint: disable=invalid-name
+#pylint: disable=too-many-arguments
+
+import numpy as np
+import pykbi.numerics as _numerics
+import pykbi.resample as _resample
+
+
+__all__ = ["FourierTransform", "StructureFactor", "FourierKBI"]
+
+
+def _Window(r, window):
+    """
+    Return the window function on the grid
+    """
+
+    if window is None:
+        return np.ones_like(r)
+
+    x = r / r[-1]
+
+    if window == "lorch":
+        return np.sinc(x)
+    if window == "hann":
+        return 0.5 * (1.0 + np.cos(np.pi * x))
+
+    raise ValueError("Unknown window '{}'".format(window))
+
+
+def _UniformGrid(r, h):
+    """
+    Return r and h on a uniform grid, resampling h if needed
+    """
+
+    dr = np.diff(r)
+    if np.allclose(dr, dr[0], rtol=1e-6, atol=0.0):
+        return r, h
+
+    uniform = np.linspace(r[0], r[-1], len(r))
+
+    return uniform, _resample.ReturnPlan(r, uniform).Apply(h)
+
+
+def FourierTransform(r, h, window="lorch", pad=8):
+    """
+    Three dimensional Fourier transform of h(r), along the last axis.
+
+    param: r: radial grid, resampled to a uniform grid if it is not uniform
+    param: h: h(r) = g(r) - 1, one or more functions on the grid
+    param: window: "lorch", "hann" or None
+    param: pad: zero-padding factor, which sets the k spacing to 2 pi / (pad R)
+
+    Returns the wave numbers k, starting at 0, and h(k).
+    """
+
+    if pad < 1:
+        raise ValueError("FourierTransform: 'pad' must be at least 1")
+
+    r, h = _UniformGrid(np.asarray(r, dtype=float), np.asarray(h, dtype=float))
+
+    dr = r[1] - r[0]
+    size = pad * len(r)
+    k = 2.0 * np.pi * np.arange(size // 2 + 1) / (size * dr)
+
+    f = h * _Window(r, window) * r
+
+    # sum_n f_n sin(k (r0 + n dr)) = Im(exp(i k r0) conj(rfft(f)))
+    spectrum = np.conj(np.fft.rfft(f, n=size, axis=-1)) * np.exp(1j * k * r[0])
+    sine = dr * spectrum.imag
+
+    hk = np.empty_like(sine)
+    hk[..., 1:] = 4.0 * np.pi * sine[..., 1:] / k[1:]
+    # the k -> 0 limit of sin(kr) / k is r
+    hk[..., 0] = 4.0 * np.pi * dr * np.sum(f * r, axis=-1)
+
+    return k, hk
+
+
+def StructureFactor(rdf, window="lorch", pad=8):
+    """
+    Return k and the partial structure factor S(k) = delta + rho h(k) of an
+    RDF or RDFSet, with rho the density of the first species.
+    Needs npart, box size and eqint.
+    """
+
+    if rdf.npart is None or rdf.volume is None or rdf.eqint is None:
+        print("The structure factor needs npart, box size and eqint.")
+        return None
+
+    k, hk = FourierTransform(rdf.r, rdf.gr - 1.0, window=window, pad=pad)
+
+    rho = np.asarray(rdf.npart / rdf.volume, dtype=float)[..., np.newaxis]
+    delta = np.asarray(rdf.eqint, dtype=float)[..., np.newaxis]
+
+    return k, delta + rho * hk
+
+
+def FourierKBI(rdf, position=None, window="lorch", pad=8):
+    """
+    Kirkwood-Buff integral from the small-k limit of h(k), for an RDF or RDFSet.
+
+    h(k) is fitted to G + a k^2 for position[0] < k <= position[1]. The
+    default range runs up to 2 pi / R, with R the end of the grid.
+
+    Returns a dictionary with the KBI "G", the slope, r_value and
+    std_error of the fit, the fitted range "value_limit", and "k" and "hk".
+    For an RDFSet, the values are arrays with one entry per pair.
+    """
+
+    k, hk = FourierTransform(rdf.r, rdf.gr - 1.0, window=window, pad=pad)
+
+    if position is None:
+        position = (0.0, 2.0 * np.pi / rdf.r[-1])
+
+    mask = (k > position[0]) & (k <= position[1])
+
+    if np.count_nonzero(mask) < 2:
+        print("\n Less than two wave numbers in the range {} to {}.\n".format(*position))
+        return None
+
+    slope, intercept, r_value, _, std_error = _numerics.linregress(k[mask]**2, hk[..., mask])
+
+    return {"G": intercept,
+            "slope": slope,
+            "r_value": r_value,
+            "std_error": std_error,
+            "value_limit": k[mask][[0, -1]],
+            "k": k,
+            "hk": hk}
@@ -3,31 +3,36 @@
 """
 Perform finite size correction on the radial distribution fuction.
 
-We have two methods:
+We have three methods:
     - InverseN- correction, as described by Kruger
     - van der Vegt correction, as described by ...
+    - extrapolation of g(r) in 1/N or 1/L over several system sizes
 
 The InverseN correction method takes two RDF objects as input, and returns a new RDF object.
 
 The van der Vegt correction takes onw RDF object, and returns a new RDF object.
+CorrectVanDerVegtStack does the same correction on a stack of g(r) arrays.
+
+The finite size extrapolation takes any number of RDF objects of the same pair
+in systems of different size, and returns a new RDF object.
 """
 
 import numpy as np
-import scipy
 import pykbi.rdf as _rdf
+import pykbi.numerics as _numerics
+import pykbi.cache as _cache
+import pykbi.resample as _resample
 
-__all__ = ["CorrectInverseN", "CorrectVanDerVegt"]
+__all__ = ["CorrectInverseN", "CorrectVanDerVegt", "CorrectVanDerVegtStack", "CorrectFiniteSize"]
 
 
-def CorrectInverseN(rdf1, rdf2):
+def CorrectInverseN(rdf1, rdf2, method="linear"):
     """
     Correct the rdf based on scaling between systems.
-    """
 
-    # check that the size of the bins are the same
-    if abs(rdf1.r[1]-rdf2.r[1]) > 1e-4:
-        print("CorrectInverseN correction requires rdf's with same resolution")
-        return False
+    The rdfs do not need to share a grid, both are resampled onto the common
+    grid (see resample.CommonGrid) with the given method, "linear" or "cubic".
+    """
 
     # check that the rdfs are correctly defined
     if rdf1.npart is None or rdf2.npart is None:
@@ -48,17 +53,35 @@ def CorrectInverseN(rdf1, rdf2):
         rdfref = rdf1
         rdfext = rdf2
 
-    bins = len(rdfref.r)
+    try:
+        r = _resample.CommonGrid([rdfref.r, rdfext.r])
+    except ValueError:
+        print("CorrectInverseN correction requires rdf's with overlapping ranges")
+        return False
+
+    key = _cache.Key("inversen", [rdfref.npart, rdfext.npart, method],
+                     rdfref.r, rdfref.gr, rdfext.r, rdfext.gr)
+    cached = _cache.Get(key)
+
+    if cached is not None:
+        gr = cached["gr"]
+    else:
+        grref = _resample.ReturnPlan(rdfref.r, r, method).Apply(rdfref.gr)
+        grext = _resample.ReturnPlan(rdfext.r, r, method).Apply(rdfext.gr)
+
+        correction_mask = (grref - grext) / ((rdfext.npart/rdfref.npart) - 1.0)
 
-    correction_mask = (rdfref.gr - rdfext.gr[:bins]) / ((rdfext.npart/rdfref.npart) - 1.0)
+        gr = grref-correction_mask
+        _cache.Put(key, {"gr": gr})
 
     # build a new rdf-object
-    out_rdf = _rdf.RDF(rdfref.r.copy(),
-                       rdfref.gr-correction_mask,
+    out_rdf = _rdf.RDF(r.copy(),
+                       gr,
                        npart=rdfref.npart,
                        box_size=rdfref.lt,
                        eqint=rdfref.eqint,
-                       name=rdfref.name+" invN-corrected")
+                       name=rdfref.name+" invN-corrected",
+                       kernel=rdfref.integral_type)
 
     return out_rdf
 
@@ -89,30 +112,173 @@ def CorrectVanDerVegt(rdf):
         return False
 
 
+    key = _cache.Key("vandervegt", [rdf.npart, rdf.volume, rdf.eqint], rdf.r, rdf.gr)
+    cached = _cache.Get(key)
+
+    if cached is not None:
+        return _rdf.RDF(rdf.r.copy(),
+                        cached["gr"],
+                        npart=rdf.npart,
+                        box_size=rdf.lt,
+                        eqint=rdf.eqint,
+                        name=rdf.name,
+                        kernel=rdf.integral_type)
+
+    gr = CorrectVanDerVegtStack(rdf.r, rdf.gr, rdf.npart, rdf.volume, rdf.eqint)
+    _cache.Put(key, {"gr": gr})
+
+    # build a new rdf-object
+    out_rdf = _rdf.RDF(rdf.r.copy(),
+                       gr,
+                       npart=rdf.npart,
+                       box_size=rdf.lt,
+                       eqint=rdf.eqint,
+                       name=rdf.name,
+                       kernel=rdf.integral_type)
+
+    return out_rdf
+
+
+
+def CorrectVanDerVegtStack(r, gr, npart, volume, eqint, out=None):
+    """
+    The van der Vegt correction of a stack of g(r), along the last axis.
+
+    param: r: radial grid
+    param: gr: g(r), shape (..., len(r)), e.g. (n_pairs, n_bins)
+    param: npart: number of particles of the reference species, scalar or one per g(r)
+    param: volume: volume of the box, scalar or one per g(r)
+    param: eqint: True for a pair of equal species, scalar or one per g(r)
+    param: out: array to write the corrected g(r) to, which may be gr itself
+        to correct in place
+
+    Returns the corrected g(r). Besides the output, the correction needs two
+    work arrays the size of gr, so large stacks are not copied more than
+    needed.
+    """
+
+    gr = np.asarray(gr)
+    r = np.asarray(r, dtype=float)
+
+    if gr.shape[-1] != len(r):
+        raise ValueError("CorrectVanDerVegtStack: 'gr' and 'r' have different lengths")
+    if out is not None and out.shape != gr.shape:
+        raise ValueError("CorrectVanDerVegtStack: 'out' must have the shape of 'gr'")
+
+    # per g(r) values broadcast along the grid
+    npart = np.asarray(npart)[..., np.newaxis]
+    volume = np.asarray(volume)[..., np.newaxis]
+
     # calculate the density of the component in the box. If it is a pair, the
     # first component should be used as the ref.
-    rho_ref = rdf.npart/rdf.volume
+    rho_ref = npart / volume
 
     # kronecer delta, 1 if X-X, 0 otherwise. here we do an conversion from bool to int
-    krondelta = int(rdf.eqint)
+    krondelta = np.asarray(eqint, dtype=int)[..., np.newaxis]
 
-    c1 = rdf.npart * (1.0 - ((4.0 * np.pi * rdf.r**3 / 3.0) / rdf.volume))
+    # the first work array holds (g(r) - 1) r^2, and later c1 and c3
+    work = np.empty(np.broadcast_shapes(gr.shape, rho_ref.shape), dtype=np.float64)
+    np.subtract(gr, 1.0, out=work)
+    work *= r**2
 
-    c2 = rho_ref * 4.0 * np.pi * scipy.integrate.cumtrapz(
-        (rdf.gr[:] - 1.0) * rdf.r[:]**2,
-        rdf.r[:])
+    # c2, the running integral of (g(r) - 1) r^2, starting at 0, is the second
+    c2 = _numerics.cumtrapz(work, r, initial=0.0, pairwise=True)
+    c2 *= rho_ref * 4.0 * np.pi
 
-    ## add the extra element at the beginning. We lose on array size when we integrate
-    c2 = np.concatenate((np.array([0.0]), c2))
+    # c1 = npart * (1 - (4 pi r^3 / 3) / volume)
+    np.divide(4.0 * np.pi * r**3 / 3.0, volume, out=work)
+    np.subtract(1.0, work, out=work)
+    work *= npart
 
-    c3 = (c1 / (c1 - c2 - krondelta))
+    # c3 = c1 / (c1 - c2 - krondelta)
+    np.subtract(work, c2, out=c2)
+    c2 -= krondelta
+    np.divide(work, c2, out=work)
+    del c2
 
-    # build a new rdf-object
-    out_rdf = _rdf.RDF(rdf.r.copy(),
-                       rdf.gr*c3,
-                       npart=rdf.npart,
-                       box_size=rdf.lt,
-                       eqint=rdf.eqint,
-                       name=rdf.name)
+    if out is None:
+        work *= gr
+        return work
+
+    np.multiply(gr, work, out=out)
+
+    return out
+
+
+def CorrectFiniteSize(rdfs, variable="N", weights=None, method="linear"):
+    """
+    Extrapolate the rdf to an infinite system from several system sizes.
+
+    The g(r) of every system is fitted per bin to a line in x = 1/N or 1/L,
+
+        g(r; x) = g_inf(r) + a(r) x
+
+    with weighted least squares, and g_inf(r) is returned as a new rdf. The
+    rdfs are resampled onto their common grid (see resample.CommonGrid), so
+    the bins do not have to line up. All bins share the same design matrix,
+    so they are solved together in a single least squares call.
+
+    param: rdfs: list of RDF objects with npart, and box size for 'L'
+    param: variable: "N" to extrapolate in 1/npart, "L" in 1/box_size
+    param: weights: weight of every system in the fit, equal if not given
+    param: method: resampling method, "linear" or "cubic"
+
+    The new rdf takes npart, box size and eqint from the largest system.
+    """
+
+    if variable not in ("N", "L"):
+        raise ValueError("CorrectFiniteSize: 'variable' must be 'N' or 'L'")
+
+    if len(rdfs) < 2:
+        print("CorrectFiniteSize requires at least two rdfs")
+        return False
+
+    if any(rdf.npart is None for rdf in rdfs):
+        print("RDFs must have a defined number of particles")
+        return False
+
+    if variable == "L" and any(rdf.lt is None for rdf in rdfs):
+        print("RDFs must have a defined box size to extrapolate in 1/L")
+        return False
+
+    if variable == "N":
+        x = np.array([1.0 / rdf.npart for rdf in rdfs])
+    else:
+        x = np.array([1.0 / rdf.lt for rdf in rdfs])
+
+    if np.unique(x).size < 2:
+        print("CorrectFiniteSize requires at least two different system sizes")
+        return False
+
+    if weights is None:
+        weights = np.ones(len(rdfs))
+    else:
+        weights = np.asarray(weights, dtype=float)
+        if weights.shape != x.shape:
+            raise ValueError("CorrectFiniteSize: one weight is needed for every rdf")
+
+    try:
+        r = _resample.CommonGrid([rdf.r for rdf in rdfs]).copy()
+    except ValueError:
+        print("CorrectFiniteSize requires rdfs with overlapping ranges")
+        return False
+
+    gr = np.empty((len(rdfs), len(r)))
+    for k, rdf in enumerate(rdfs):
+        gr[k] = _resample.ReturnPlan(rdf.r, r, method).Apply(rdf.gr)
+
+    # weighted least squares for all bins at once: sqrt(w) X b = sqrt(w) g
+    sqrtw = np.sqrt(weights)
+    design = np.stack((np.ones_like(x), x), axis=-1) * sqrtw[:, np.newaxis]
+    solution = np.linalg.lstsq(design, gr * sqrtw[:, np.newaxis], rcond=None)[0]
+
+    largest = max(rdfs, key=lambda rdf: rdf.npart)
+
+    out_rdf = _rdf.RDF(r,
+                       solution[0],
+                       npart=largest.npart,
+                       box_size=largest.lt,
+                       eqint=largest.eqint,
+                       name=largest.name+" 1/{}-extrapolated".format(variable))
 
     return out_rdf
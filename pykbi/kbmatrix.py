@@ -0,0 +1,265 @@
+#! /usr/bin/env python3
+
+"""
+Kirkwood-Buff matrix of a multi-component state point.
+
+A KBMatrix maps the pairs of species (i, j) to their RDFs, and keeps track
+of the number of particles of every species and the box size. All pairs are
+integrated and read out in one batched pass, the KB integrals are placed in
+a symmetric matrix G, and the concentrations c_i = N_i / V follow from the
+metadata, so the fluctuation theory step is one more call:
+
+    kbm = pykbi.KBMatrix(["water", "ethanol"], npart=[800, 200], box_size=4.2)
+    kbm.AddRDF("water", "water", rdf_ww)
+    kbm.AddRDF("water", "ethanol", rdf_we)
+    kbm.AddRDF("ethanol", "ethanol", rdf_ee)
+    kbm.Integrate(position=(0.5, 1.0), correction="vdv")
+    kbdata = kbm.ReturnKBdata()
+
+The RDF of the pair (i, j) has the first species, i, as reference, so its
+npart is N_i, and eqint is set from i == j. Only one of (i, j) and (j, i) is
+needed. Metadata given to the KBMatrix fill in what the RDFs lack.
+
+With workers=None the pairs are integrated together as an RDFSet, after
+resampling onto a common grid if needed. Otherwise they are run with
+ProcessRDFs on the given number of worker processes.
+"""
+
+#pylint: disable=invalid-name
+#pylint: disable=too-many-arguments
+
+import numpy as np
+import pykbi.rdf as _rdf
+import pykbi.rdfset as _rdfset
+import pykbi.resample as _resample
+import pykbi.parallel as _parallel
+import pykbi.fct as _fct
+
+
+__all__ = ["KBMatrix"]
+
+
+class KBMatrix:
+    """
+    Kirkwood-Buff integrals of all species pairs of a system.
+
+    param: species: list of species names
+    param: npart: number of particles of every species, one per species.
+        Only needed for RDFs without npart.
+    param: box_size: box side length(s), only needed for RDFs without box size
+
+    After Integrate:
+        G: KB integrals, shape (n, n), symmetric
+        c: concentrations N_i / V, shape (n,)
+        rdfs: the integrated RDFs, by pair
+    """
+    def __init__(self, species, npart=None, box_size=None):
+
+        self.species = list(species)
+
+        if len(set(self.species)) != len(self.species):
+            raise ValueError("KBMatrix: the species names must be unique")
+
+        if npart is not None and len(npart) != len(self.species):
+            raise ValueError("KBMatrix: need one 'npart' per species")
+
+        self.npart = None if npart is None else list(npart)
+        self.box_size = box_size
+
+        self.pairs = {}
+        self.rdfs = None
+        self.G = None
+        self.c = None
+
+
+    def __len__(self):
+        return len(self.species)
+
+
+    def _Index(self, name):
+        if isinstance(name, (int, np.integer)) and 0 <= name < len(self.species):
+            return int(name)
+        if name in self.species:
+            return self.species.index(name)
+        raise ValueError("KBMatrix: unknown species '{}'".format(name))
+
+
+    def AddRDF(self, first, second, rdf):
+        """
+        Add the RDF of the pair of species (first, second), by name or index.
+        'first' is the reference species of the RDF. Replaces any RDF of the
+        same pair, in either order.
+        """
+
+        if not isinstance(rdf, _rdf.RDF):
+            raise TypeError("KBMatrix: 'rdf' must be an RDF")
+
+        i, j = self._Index(first), self._Index(second)
+
+        self.pairs.pop((j, i), None)
+        self.pairs[(i, j)] = rdf
+
+        self.rdfs = None
+        self.G = None
+
+
+    def ReturnMissingPairs(self):
+        """
+        Return the pairs of species names without an RDF
+        """
+
+        nspecies = len(self.species)
+        return [(self.species[i], self.species[j])
+                for i in range(nspecies) for j in range(i, nspecies)
+                if (i, j) not in self.pairs and (j, i) not in self.pairs]
+
+
+    def _Prepared(self, i, j):
+        """
+        Return a copy of the RDF of a pair, with the metadata filled in
+        """
+
+        rdf = self.pairs[(i, j)]
+
+        npart = rdf.npart
+        if npart is None and self.npart is not None:
+            npart = self.npart[i]
+
+        box_size = rdf.lt
+        if box_size is None:
+            box_size = self.box_size
+
+        return _rdf.RDF(rdf.r, rdf.gr,
+                        kernel=rdf.integral_type,
+                        npart=npart,
+                        box_size=box_size,
+                        eqint=(i == j),
+                        name="{}-{}".format(self.species[i], self.species[j]))
+
+
+    def ReturnConcentrations(self):
+        """
+        Return the concentrations N_i / V of the species. Raises a ValueError
+        if the number of particles or the volume is unknown or inconsistent.
+        """
+
+        npart = [None] * len(self.species)
+        if self.npart is not None:
+            npart = [float(value) for value in self.npart]
+
+        volumes = []
+        for (i, j) in self.pairs:
+            rdf = self._Prepared(i, j)
+
+            if rdf.npart is not None:
+                if npart[i] is None:
+                    npart[i] = float(rdf.npart)
+                elif not np.isclose(npart[i], rdf.npart):
+                    raise ValueError("KBMatrix: the RDFs disagree on the number of '{}'".format(
+                        self.species[i]))
+
+            if rdf.volume is not None:
+                volumes.append(rdf.volume)
+
+        if any(value is None for value in npart):
+            raise ValueError("KBMatrix: unknown number of particles of {}".format(
+                [name for name, value in zip(self.species, npart) if value is None]))
+
+        if not volumes:
+            raise ValueError("KBMatrix: unknown box size")
+        if not np.allclose(volumes, volumes[0]):
+            raise ValueError("KBMatrix: the RDFs have different box sizes")
+
+        return np.array(npart) / volumes[0]
+
+
+    def Integrate(self, position=None, correction=None, workers=None):
+        """
+        Correct, integrate and read out the RDFs of all pairs, and fill the
+        KB matrix G and the concentrations c.
+
+        param: position: readout position, see RDF.FindValues
+        param: correction: None or "vdv", see fscorr.CorrectVanDerVegt
+        param: workers: None integrates all pairs together as an RDFSet,
+            otherwise the number of processes used by ProcessRDFs
+
+        Returns G, or None if a pair failed.
+        """
+
+        if correction not in (None, "vdv"):
+            raise ValueError("KBMatrix: unknown correction '{}'".format(correction))
+
+        missing = self.ReturnMissingPairs()
+        if missing:
+            raise ValueError("KBMatrix: no RDF for the pairs {}".format(missing))
+
+        self.c = self.ReturnConcentrations()
+
+        keys = sorted(self.pairs)
+        rdfs = [self._Prepared(i, j) for i, j in keys]
+
+        if workers is None:
+            values, rdfs = self._IntegrateSet(rdfs, position, correction)
+        else:
+            rdfs = _parallel.ProcessRDFs(rdfs, correction=correction, position=position,
+                                         workers=workers)
+            values = None
+            if all(rdf is not None and rdf.ReturnKBI() is not None for rdf in rdfs):
+                values = [rdf.ReturnKBI() for rdf in rdfs]
+
+        if values is None:
+            print("KBMatrix: the integration of some of the pairs failed")
+            self.G = None
+            return None
+
+        self.rdfs = dict(zip(keys, rdfs))
+
+        self.G = np.zeros((len(self.species), len(self.species)))
+        for (i, j), value in zip(keys, values):
+            self.G[i, j] = value
+            self.G[j, i] = value
+
+        return self.G
+
+
+    @staticmethod
+    def _IntegrateSet(rdfs, position, correction):
+        """
+        Integrate the pairs in one RDFSet. Returns the KBIs and the RDFs.
+        """
+
+        if not all(np.array_equal(rdf.r, rdfs[0].r) for rdf in rdfs[1:]):
+            grid = _resample.CommonGrid([rdf.r for rdf in rdfs])
+            rdfs = [_resample.ResampleRDF(rdf, grid) for rdf in rdfs]
+
+        rdfset = _rdfset.RDFSet.FromRDFs(rdfs)
+
+        if correction == "vdv":
+            rdfset = rdfset.CorrectVanDerVegt()
+            if rdfset is False:
+                return None, None
+
+        rdfset.Integrate()
+        rdfset.FindValues(position)
+
+        values = rdfset.ReturnKBI()
+        if values is None:
+            return None, None
+
+        return list(values), [rdfset[index] for index in range(len(rdfset))]
+
+
+    def ReturnKBdata(self):
+        """
+        Return the fluctuation theory properties of the system, as a
+        KBdataNcomp with the properties calculated, or None before Integrate
+        """
+
+        if self.G is None:
+            print("KBMatrix: integrate the pairs first")
+            return None
+
+        kbdata = _fct.KBdataNcomp(self.G, self.c)
+        kbdata.CalculateProperties()
+
+        return kbdata
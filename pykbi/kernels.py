@@ -0,0 +1,239 @@
+#! /usr/bin/env python3
+
+"""
+Integration schemes for the Kirkwood-Buff integral, as pluggable kernels.
+
+Every scheme integrates h(r) = g(r) - 1 with a weight w(x), x = r/R, that is
+a polynomial in x,
+
+    G(R) = 4 pi int_0^R h(r) r^2 w(r/R) dr,    w(x) = sum_k a_k x^k
+
+so the integral for every R follows from the cumulative moments of h r^(k+2)
+scaled by a_k / R^k. All radii are evaluated with one cumulative pass per
+power, O(N), for one g(r) or a whole stack of them. The moments are
+integrated in float64 with the trapezoidal or the Simpson rule, and summed
+pairwise (see numerics.pairwise_cumsum), so long grids and float32 g(r) keep
+float64 accuracy. A scheme may also transform g(r) before it is integrated,
+and correct the integral for every R afterwards.
+
+The registered schemes are:
+    - "open": the running integral, w = 1
+    - "closed": the weight of Kruger et al. for a spherical subvolume,
+      w = 1 - 3x/2 + x^3/2, J. Phys. Chem. Lett. 2013, 4, 235-238
+    - "cortes_huerto": the finite-volume KBI of the "closed" scheme, for a
+      sphere of diameter R, corrected for the finite box as by Cortes-Huerto,
+      Kremer and Potestio, J. Chem. Phys. 2016, 145, 141103,
+
+          G(R) = (G_V(R) + delta_ij lambda^3 / rho_j) / (1 - lambda^3)
+
+      where lambda^3 = pi R^3 / (6 V) is the fraction of the box volume V
+      taken by the sphere, and rho_j = npart / V. The -1/N tail of the g(r)
+      of a closed box then drops out. Needs npart, box size and eqint.
+    - "ganguly": the running integral of the g(r) corrected for the finite
+      size of the box, Ganguly and van der Vegt, J. Chem. Theory Comput.
+      2013, 9, 1347-1355. Needs npart, box size and eqint.
+
+The extrapolated schemes integrate up to r[i-1] for R = r[i] (inclusive=False),
+as the original Kruger integration of pykbi did, and the direct ones up to
+r[i].
+
+The readout of a scheme is either "direct", where the KBI is read from the
+integral at a radius, or "extrapolate", where the integral is extrapolated
+linearly in 1/R to 1/R = 0, see RDF.FindValues.
+
+New schemes are added with RegisterKernel, and removed with UnregisterKernel.
+"""
+
+#pylint: disable=invalid-name
+#pylint: disable=too-many-arguments
+
+import hashlib
+import numpy as np
+import pykbi.numerics as _numerics
+
+
+__all__ = ["Kernel", "RegisterKernel", "UnregisterKernel", "ReturnKernel", "ReturnKernelNames"]
+
+
+## cumulative integration rules
+_RULES = {"trapezoid": _numerics.cumtrapz,
+          "simpson": _numerics.cumsimpson}
+
+
+def _FunctionId(function):
+    """
+    Return a name for a function that changes with its code, or None
+    """
+
+    if function is None:
+        return None
+
+    name = "{}.{}".format(getattr(function, "__module__", ""),
+                          getattr(function, "__qualname__", repr(function)))
+    code = getattr(function, "__code__", None)
+    if code is not None:
+        name += ":" + hashlib.blake2b(code.co_code, digest_size=8).hexdigest()
+
+    return name
+
+
+class Kernel:
+    """
+    An integration scheme.
+
+    param: name: name of the scheme, used as integral_type of an RDF
+    param: terms: the weight polynomial as (power, coefficient) pairs
+    param: inclusive: if True the integral for R = r[i] runs up to r[i],
+        otherwise up to r[i-1], as in the original Kruger integration
+    param: readout: "direct" or "extrapolate"
+    param: rule: "trapezoid" or "simpson", see numerics.cumtrapz and numerics.cumsimpson
+    param: transform: None, or a function (r, gr, npart, volume, eqint)
+        returning the g(r) to integrate. For a stack of g(r) the metadata
+        are arrays with one value per g(r).
+    param: correction: None, or a function (rad, kbi, npart, volume, eqint)
+        returning the corrected integral, 4 pi included, at the radii rad = r[1:]
+    """
+    def __init__(self, name, terms, inclusive=True, readout="direct", transform=None,
+                 rule="trapezoid", correction=None):
+
+        if readout not in ("direct", "extrapolate"):
+            raise ValueError("Kernel: 'readout' must be 'direct' or 'extrapolate'")
+
+        if rule not in _RULES:
+            raise ValueError("Kernel: 'rule' must be 'trapezoid' or 'simpson'")
+
+        self.name = name
+        self.terms = tuple((int(power), float(coefficient)) for power, coefficient in terms)
+        self.inclusive = inclusive
+        self.readout = readout
+        self.transform = transform
+        self.rule = rule
+        self.correction = correction
+
+
+    def NeedsSystem(self):
+        """
+        True if the scheme needs npart, box size and eqint
+        """
+
+        return self.transform is not None or self.correction is not None
+
+
+    def ReturnDefinition(self):
+        """
+        Return the definition of the scheme as a json-serializable list, which
+        changes whenever the scheme integrates differently
+        """
+
+        return [self.name, [list(term) for term in self.terms], self.inclusive,
+                self.readout, self.rule, _FunctionId(self.transform),
+                _FunctionId(self.correction)]
+
+
+    def Weight(self, x):
+        """
+        Evaluate the weight polynomial at x = r/R
+        """
+
+        return sum(coefficient * x**power for power, coefficient in self.terms)
+
+
+    def Integrate(self, r, h):
+        """
+        Integral of h(r) r^2 w(r/R) along the last axis, for every R = r[i], i >= 1.
+        The factor 4 pi is not included.
+        """
+
+        integrate = _RULES[self.rule]
+
+        moments = {}
+        for power, _ in self.terms:
+            if power not in moments:
+                moments[power] = integrate(h * r**(power + 2), r, pairwise=True)
+
+        if self.inclusive:
+            rad = r[1:]
+            kbi = np.zeros(h.shape[:-1] + (len(r) - 1,))
+            for power, coefficient in self.terms:
+                kbi += coefficient * moments[power] / rad**power
+            return kbi
+
+        # the integral for R = r[i] stops at r[i-1], so the first entry is empty
+        rad = r[2:]
+        kbi = np.zeros(h.shape[:-1] + (len(r) - 1,))
+        for power, coefficient in self.terms:
+            kbi[..., 1:] += coefficient * moments[power][..., :-1] / rad**power
+        return kbi
+
+
+def _VanDerVegt(r, gr, npart, volume, eqint):
+    """
+    The van der Vegt correction of g(r), see fscorr.CorrectVanDerVegtStack
+    """
+
+    # imported here, fscorr depends on rdf, which depends on this module
+    import pykbi.fscorr as _fscorr
+
+    return _fscorr.CorrectVanDerVegtStack(r, gr, npart, volume, eqint)
+
+
+def _CortesHuerto(rad, kbi, npart, volume, eqint):
+    """
+    The finite box correction of Cortes-Huerto et al. of the finite-volume
+    KBI of spheres of diameter rad
+    """
+
+    npart = np.asarray(npart)[..., np.newaxis]
+    volume = np.asarray(volume)[..., np.newaxis]
+    krondelta = np.asarray(eqint, dtype=int)[..., np.newaxis]
+
+    sphere = np.pi * rad**3 / 6.0
+    fraction = sphere / volume
+
+    return (kbi + krondelta * sphere / npart) / (1.0 - fraction)
+
+
+_kernels = {}
+
+
+def RegisterKernel(kernel):
+    """
+    Add an integration scheme to the registry, replacing any scheme with the same name
+    """
+
+    if not isinstance(kernel, Kernel):
+        raise TypeError("RegisterKernel: 'kernel' must be a Kernel")
+
+    _kernels[kernel.name] = kernel
+
+
+def UnregisterKernel(name):
+    """
+    Remove an integration scheme from the registry, if it is there
+    """
+
+    _kernels.pop(name, None)
+
+
+def ReturnKernel(name):
+    """
+    Return the integration scheme with the given name, or None if it is unknown
+    """
+
+    return _kernels.get(name)
+
+
+def ReturnKernelNames():
+    """
+    Return the names of the registered integration schemes
+    """
+
+    return list(_kernels.keys())
+
+
+RegisterKernel(Kernel("open", [(0, 1.0)]))
+RegisterKernel(Kernel("closed", [(0, 1.0), (1, -1.5), (3, 0.5)],
+                      inclusive=False, readout="extrapolate"))
+RegisterKernel(Kernel("cortes_huerto", [(0, 1.0), (1, -1.5), (3, 0.5)],
+                      inclusive=False, readout="extrapolate", correction=_CortesHuerto))
+RegisterKernel(Kernel("ganguly", [(0, 1.0)], transform=_VanDerVegt))
@@ -0,0 +1,182 @@
+#! /usr/bin/env python3
+
+"""
+Incremental Kirkwood-Buff integrals from g(r) arriving during a simulation.
+
+When the convergence of a KBI is monitored while a simulation is running, the
+g(r) of every new frame or block has to be added to the average, and the
+average integrated and read out again. Both integrals are linear in g(r), so
+instead of integrating the full average at every refresh, we keep running
+sums of g(r) and of the cumulative moments the integrators need:
+
+    open system:   the cumulative integral of g r^2
+    closed system: the cumulative integrals of g r^2, g r^3 and g r^5
+
+Adding a frame costs one pass over the bins, and the integral of the average
+follows from the sums without any further integration. The van der Vegt
+correction only needs the cumulative integral of (g - 1) r^2, which is the
+same running sum, so the correction is updated the same way.
+"""
+
+#pylint: disable=invalid-name
+#pylint: disable=too-many-instance-attributes
+#pylint: disable=too-many-arguments
+
+import numpy as np
+import pykbi.rdf as _rdf
+import pykbi.numerics as _numerics
+
+
+__all__ = ["OnlineKBI"]
+
+
+class OnlineKBI:
+    """
+    Running average of g(r) with its Kirkwood-Buff integral.
+
+    param: radial_dist: the radial distances, shared by all frames
+    param: closed: integrate as closed or open system
+    param: npart, box_size, eqint, name: as for RDF
+    param: vdv: apply the van der Vegt correction to the average before it is
+        integrated. Needs npart, box_size and eqint.
+
+    """
+    def __init__(self, radial_dist, closed=True, npart=None, box_size=None, eqint=None,
+                 name=None, vdv=False):
+
+        if isinstance(radial_dist, np.ndarray):
+            self.r = radial_dist
+        else:
+            raise TypeError("OnlineKBI: 'radial_dist' must be numpy.ndarray")
+
+        if vdv and (npart is None or box_size is None or eqint is None):
+            raise ValueError("OnlineKBI: the van der Vegt correction needs npart, box_size and eqint")
+
+        self.closed = closed
+        self.npart = npart
+        self.box_size = box_size
+        self.eqint = eqint
+        self.name = name
+        self.vdv = vdv
+
+        # the powers of r in the cumulative moments
+        if closed and not vdv:
+            self.powers = (2, 3, 5)
+        else:
+            self.powers = (2,)
+
+        self.rpow = {k: self.r**k for k in self.powers}
+
+        # cumulative moments of g = 1, to subtract from the moments of g
+        self.ones = {k: _numerics.cumtrapz(self.rpow[k], self.r, initial=0.0,
+                                           pairwise=True)
+                     for k in self.powers}
+
+        self.weight = 0.0
+        self.nframes = 0
+        self.gr_sum = np.zeros(len(self.r))
+        self.moment_sum = {k: np.zeros(len(self.r)) for k in self.powers}
+
+        self.rdf = None
+
+
+    def AddFrame(self, radial_dist_func, weight=1.0):
+        """
+        Add the g(r) of a frame or block to the running sums, with a weight
+        """
+
+        gr = np.asarray(radial_dist_func, dtype=float)
+
+        if gr.shape != self.r.shape:
+            raise ValueError("OnlineKBI: 'radial_dist_func' must have the same length as 'radial_dist'")
+
+        self.gr_sum += weight * gr
+        for k in self.powers:
+            self.moment_sum[k] += weight * _numerics.cumtrapz(gr * self.rpow[k], self.r,
+                                                              initial=0.0, pairwise=True)
+
+        self.weight += weight
+        self.nframes += 1
+
+
+    def AddFrames(self, frames):
+        """
+        Add the g(r) of several frames, from an iterable or generator
+        """
+
+        for gr in frames:
+            self.AddFrame(gr)
+
+
+    def _Moments(self):
+        """
+        Return the cumulative moments of h = g - 1 for the average g
+        """
+
+        return {k: self.moment_sum[k] / self.weight - self.ones[k] for k in self.powers}
+
+
+    def Integrate(self):
+        """
+        Integrate the average g(r). Returns an RDF object holding the average,
+        with the integral filled in.
+        """
+
+        if self.nframes == 0:
+            print("No frames have been added yet.")
+            return None
+
+        gr = self.gr_sum / self.weight
+        moments = self._Moments()
+
+        if self.vdv:
+            volume = self.box_size**3
+            rho_ref = self.npart / volume
+            c1 = self.npart * (1.0 - ((4.0 * np.pi * self.r**3 / 3.0) / volume))
+            c2 = rho_ref * 4.0 * np.pi * moments[2]
+            gr = gr * (c1 / (c1 - c2 - int(self.eqint)))
+
+        self.rdf = _rdf.RDF(self.r, gr, closed=self.closed, npart=self.npart,
+                            box_size=self.box_size, eqint=self.eqint, name=self.name)
+
+        if self.vdv:
+            # the corrected g(r) is no longer a sum over frames
+            self.rdf.Integrate()
+            return self.rdf
+
+        self.rdf.rint = self.r[1:]
+
+        if self.closed:
+            rad = self.r[1:]
+            self.rdf.kbi = 4.0 * np.pi * (moments[2][:-1] - 1.5 * moments[3][:-1] / rad
+                                          + 0.5 * moments[5][:-1] / rad**3)
+        else:
+            self.rdf.kbi = 4.0 * np.pi * moments[2][1:]
+
+        return self.rdf
+
+
+    def FindValues(self, position=None):
+        """
+        Integrate the average and read out the KBI, see RDF.FindValues.
+        Returns the KBI.
+        """
+
+        rdf = self.Integrate()
+        if rdf is None:
+            return None
+
+        rdf.FindValues(position)
+
+        return rdf.ReturnKBI()
+
+
+    def ReturnKBI(self):
+        """
+        Return the KBI from the last call to FindValues
+        """
+
+        if self.rdf is None:
+            return None
+
+        return self.rdf.ReturnKBI()
@@ -0,0 +1,428 @@
+#! /usr/bin/env python3
+
+"""
+Run the rdf pipeline in parallel worker processes.
+
+Each rdf is integrated, optionally corrected for finite size effects, and
+read out independently of the others, so the work can be spread over several
+processes. The input arrays are packed into one block of shared memory, and
+the workers write the resulting g(r) and integrals back into a second block,
+so no arrays are pickled between the processes. The results are returned in
+the same order as the input.
+
+Frames for the RDFAccumulator can be processed in parallel the same way,
+where every worker histograms a subset of the frames.
+
+With workers=1 everything is done serially in the calling process. The
+multiprocessing modules are only imported once a pool is started.
+"""
+
+#pylint: disable=invalid-name
+#pylint: disable=too-many-arguments
+#pylint: disable=too-many-locals
+
+import os
+import copy
+import numpy as np
+import pykbi.rdf as _rdf
+import pykbi.fscorr as _fscorr
+import pykbi.accumulator as _accumulator
+
+
+__all__ = ["ProcessRDFs", "AccumulateFrames"]
+
+
+## shared memory blocks attached in the worker processes
+_shared = {}
+
+
+def _NumberOfWorkers(workers):
+    """
+    Return the number of worker processes to use
+    """
+
+    if workers is None:
+        return os.cpu_count() or 1
+
+    return max(1, int(workers))
+
+
+class _SharedArrays:
+    """
+    Pack a list of float64 arrays into a single block of shared memory.
+
+    The layout is a list of (offset, shape) tuples, which can be sent to the
+    workers instead of the arrays themselves.
+    """
+    def __init__(self, arrays=None, size=None):
+
+        from multiprocessing import shared_memory
+
+        if arrays is not None:
+            size = sum(array.size for array in arrays)
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(size, 1) * 8)
+        self.data = np.ndarray((max(size, 1),), dtype=np.float64, buffer=self.shm.buf)
+        self.layout = []
+
+        if arrays is not None:
+            offset = 0
+            for array in arrays:
+                self.data[offset:offset+array.size] = array.ravel()
+                self.layout.append((offset, array.shape))
+                offset += array.size
+
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        """
+        Release and remove the shared memory
+        """
+        self.data = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _View(data, layout):
+    """
+    Return a view into the shared data from an (offset, shape) tuple
+    """
+
+    offset, shape = layout
+    return data[offset:offset+int(np.prod(shape))].reshape(shape)
+
+
+def _Attach(*names):
+    """
+    Initializer for the worker processes, attach the shared memory blocks.
+    """
+
+    from multiprocessing import shared_memory
+
+    for name in names:
+        shm = shared_memory.SharedMemory(name=name)
+        _shared[name] = (shm, np.ndarray((shm.size // 8,), dtype=np.float64, buffer=shm.buf))
+
+
+def _Array(name):
+    """
+    Return the float64 data of an attached shared memory block
+    """
+
+    if name not in _shared:
+        _Attach(name)
+
+    return _shared[name][1]
+
+
+def _LoadRDF(spec, data=None):
+    """
+    Return an RDF object from a job specification.
+
+    RDF objects are copied, so the input is not modified, file specifications
+    are read from text files, and shared memory specifications are views into
+    'data'.
+    """
+
+    if isinstance(spec, _rdf.RDF):
+        return copy.copy(spec)
+
+    meta = {key: spec[key] for key in ("closed", "kernel", "npart", "box_size", "eqint", "name")
+            if key in spec}
+
+    if "file" in spec:
+        table = np.loadtxt(spec["file"])
+        r = table[:, spec.get("r_column", 0)]
+        gr = table[:, spec["column"]]
+    else:
+        r = _View(data, spec["r"])
+        gr = _View(data, spec["gr"])
+
+    return _rdf.RDF(r, gr, **meta)
+
+
+def _RunPipeline(rdf, partner, correction, position):
+    """
+    Correct, integrate and read out a single rdf. Returns the resulting RDF,
+    or None if the correction failed.
+    """
+
+    integral_type = rdf.integral_type
+
+    if correction == "vdv":
+        rdf = _fscorr.CorrectVanDerVegt(rdf)
+    elif correction == "invn":
+        rdf = _fscorr.CorrectInverseN(rdf, partner)
+
+    if rdf is False:
+        return None
+
+    # the corrected rdf is integrated with the scheme of the input
+    rdf.integral_type = integral_type
+
+    rdf.Integrate()
+    rdf.FindValues(position)
+
+    return rdf
+
+
+def _Worker(job):
+    """
+    Run the pipeline in a worker process, and write the arrays to shared output.
+    """
+
+    data = _Array(job["input"])
+
+    partner = None
+    if job["partner"] is not None:
+        partner = _LoadRDF(job["partner"], data)
+
+    rdf = _RunPipeline(_LoadRDF(job["rdf"], data), partner, job["correction"], job["position"])
+
+    if rdf is None:
+        return None
+
+    output = _Array(job["output"])
+    offset = job["output_offset"]
+
+    # the output holds room for the longest grid of the inputs
+    nbins = len(rdf.r)
+    output[offset:offset+nbins] = rdf.r
+    output[offset+nbins:offset+2*nbins] = rdf.gr
+    output[offset+2*nbins:offset+3*nbins-1] = rdf.kbi
+
+    return {"nbins": nbins, "integral_value": rdf.integral_value,
+            "meta": {"kernel": rdf.integral_type, "npart": rdf.npart,
+                     "box_size": rdf.lt, "eqint": rdf.eqint, "name": rdf.name}}
+
+
+def _Spec(rdf, arrays):
+    """
+    Describe an RDF object or file specification for the workers.
+
+    The arrays of RDF objects are appended to 'arrays', to be placed in shared
+    memory, and the specification holds their index in that list. Returns the
+    specification and the length of the grid, or None if it is not yet known.
+    """
+
+    if not isinstance(rdf, _rdf.RDF):
+        if "file" not in rdf or "column" not in rdf:
+            raise ValueError("ProcessRDFs: file specifications need 'file' and 'column' entries")
+        return dict(rdf), None
+
+    spec = {"kernel": rdf.integral_type, "npart": rdf.npart,
+            "box_size": rdf.lt, "eqint": rdf.eqint, "name": rdf.name,
+            "r": len(arrays), "gr": len(arrays) + 1}
+    arrays.append(np.asarray(rdf.r, dtype=np.float64))
+    arrays.append(np.asarray(rdf.gr, dtype=np.float64))
+
+    return spec, len(rdf.r)
+
+
+def _SinglePosition(position):
+    """
+    True if 'position' is one readout position for all rdfs: None, a number,
+    or a sequence of one or two numbers or None
+    """
+
+    if position is None or np.isscalar(position):
+        return True
+
+    items = list(position)
+
+    return (len(items) in (1, 2)
+            and all(item is None or np.isscalar(item) for item in items)
+            and any(item is not None for item in items))
+
+
+def ProcessRDFs(rdfs, correction=None, position=None, partners=None, workers=1):
+    """
+    Correct, integrate and read out a list of rdfs in parallel.
+
+    param: rdfs: list of RDF objects, or of dictionaries describing a column in
+        a text file, with the keys 'file', 'column' and optionally 'r_column',
+        'closed' (or 'kernel'), 'npart', 'box_size', 'eqint' and 'name'.
+    param: correction: None, "vdv" (CorrectVanDerVegt) or "invn" (CorrectInverseN)
+    param: position: readout position passed to FindValues, either one
+        position for all rdfs, such as (0.1, 0.2) or [0.1, 0.2], or a list
+        with one position per rdf. A number x is read out as (x,).
+    param: partners: for the "invn" correction, the second rdf for every entry
+    param: workers: number of worker processes. None uses all cpus, and 1 runs
+        serially in this process.
+
+    Returns a list of integrated RDF objects in the same order as the input.
+    Entries where the correction failed are None.
+    """
+
+    rdfs = list(rdfs)
+
+    if correction not in (None, "vdv", "invn"):
+        raise ValueError("ProcessRDFs: unknown correction '{}'".format(correction))
+
+    if correction == "invn":
+        if partners is None or len(partners) != len(rdfs):
+            raise ValueError("ProcessRDFs: the 'invn' correction needs one partner per rdf")
+    else:
+        partners = [None] * len(rdfs)
+
+    if _SinglePosition(position):
+        positions = [position] * len(rdfs)
+    else:
+        positions = list(position)
+        if len(positions) != len(rdfs):
+            raise ValueError("ProcessRDFs: need one position per rdf, or a single position")
+
+    # FindValues takes a sequence, a number is the first position
+    positions = [(pos,) if np.isscalar(pos) else pos for pos in positions]
+
+    workers = _NumberOfWorkers(workers)
+
+    if workers == 1:
+        return [_RunPipeline(_LoadRDF(rdf),
+                             None if partner is None else _LoadRDF(partner),
+                             correction, pos)
+                for rdf, partner, pos in zip(rdfs, partners, positions)]
+
+    import concurrent.futures
+
+    arrays = []
+    jobs = []
+    for rdf, partner, pos in zip(rdfs, partners, positions):
+        spec, nbins = _Spec(rdf, arrays)
+        if nbins is None:
+            # an upper bound is enough to reserve the output
+            with open(spec["file"]) as infile:
+                nbins = sum(1 for line in infile if line.strip())
+        job = {"rdf": spec, "partner": None, "correction": correction,
+               "position": pos, "nbins": nbins}
+        if partner is not None:
+            job["partner"], partner_nbins = _Spec(partner, arrays)
+            # the corrected rdf may be resampled onto the grid of the partner
+            if partner_nbins is not None:
+                job["nbins"] = max(nbins, partner_nbins)
+        jobs.append(job)
+
+    shared_in = _SharedArrays(arrays)
+    shared_out = _SharedArrays(size=sum(3 * job["nbins"] for job in jobs))
+
+    offset = 0
+    for job in jobs:
+        for spec in (job["rdf"], job["partner"]):
+            if spec is not None and "r" in spec:
+                spec["r"] = shared_in.layout[spec["r"]]
+                spec["gr"] = shared_in.layout[spec["gr"]]
+        job["input"] = shared_in.name()
+        job["output"] = shared_out.name()
+        job["output_offset"] = offset
+        offset += 3 * job["nbins"]
+
+    try:
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, initializer=_Attach,
+                initargs=(shared_in.name(), shared_out.name())) as executor:
+            outputs = list(executor.map(_Worker, jobs))
+
+        results = []
+        for job, output in zip(jobs, outputs):
+            if output is None:
+                results.append(None)
+                continue
+
+            nbins = output["nbins"]
+            offset = job["output_offset"]
+            block = shared_out.data[offset:offset+3*nbins].copy()
+
+            rdf = _rdf.RDF(block[:nbins], block[nbins:2*nbins], **output["meta"])
+            rdf.rint = rdf.r[1:].copy()
+            rdf.kbi = block[2*nbins:3*nbins-1]
+            rdf.integral_value = output["integral_value"]
+            results.append(rdf)
+    finally:
+        shared_in.close()
+        shared_out.close()
+
+    return results
+
+
+def _AccumulateWorker(task):
+    """
+    Histogram a single frame from shared memory. Returns the unaveraged g(r).
+    """
+
+    from multiprocessing import shared_memory
+
+    name, layout_a, layout_b, lt, rmax, nbins = task
+
+    # every batch has its own block, so it is not kept attached
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        data = np.ndarray((shm.size // 8,), dtype=np.float64, buffer=shm.buf)
+        acc = _accumulator.RDFAccumulator(rmax, nbins)
+        acc.AddFrame(_View(data, layout_a), lt,
+                     None if layout_b is None else _View(data, layout_b))
+        data = None
+    finally:
+        shm.close()
+
+    return acc
+
+
+def AccumulateFrames(frames, rmax, nbins, workers=None, batch=None, block_size=None):
+    """
+    Build an RDFAccumulator from frames, histogramming the frames in parallel.
+
+    The frames are taken from the iterable in batches of 'batch' frames (by
+    default two per worker), copied to shared memory, and distributed over
+    the workers, so memory stays bounded for long trajectories.
+
+    Every frame is a tuple (positions, lt) or (positions, lt, positions_b).
+    The frames are merged in order, so blocks of 'block_size' frames are the
+    same as for a serial RDFAccumulator.
+    """
+
+    workers = _NumberOfWorkers(workers)
+    acc = _accumulator.RDFAccumulator(rmax, nbins, block_size=block_size)
+
+    if workers == 1:
+        acc.AddFrames(frames)
+        return acc
+
+    import concurrent.futures
+
+    if batch is None:
+        batch = 2 * workers
+
+    frames = iter(frames)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            chunk = [frame for _, frame in zip(range(batch), frames)]
+            if not chunk:
+                break
+
+            arrays = []
+            for frame in chunk:
+                arrays.append(np.asarray(frame[0], dtype=np.float64))
+                if len(frame) > 2 and frame[2] is not None:
+                    arrays.append(np.asarray(frame[2], dtype=np.float64))
+
+            shared = _SharedArrays(arrays)
+            try:
+                tasks = []
+                index = 0
+                for frame in chunk:
+                    layout_b = None
+                    layout_a = shared.layout[index]
+                    index += 1
+                    if len(frame) > 2 and frame[2] is not None:
+                        layout_b = shared.layout[index]
+                        index += 1
+                    tasks.append((shared.name(), layout_a, layout_b, frame[1], rmax, nbins))
+
+                for part in executor.map(_AccumulateWorker, tasks):
+                    acc.Merge(part)
+            finally:
+                shared.close()
+
+    return acc
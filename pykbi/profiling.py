@@ -0,0 +1,351 @@
+#! /usr/bin/env python3
+
+"""
+Per-stage timing of the rdf pipeline.
+
+When profiling is enabled, the pipeline stages (loading, the corrections,
+integration, read-out and saving) are wrapped, and every call records its
+wall time, the number of g(r) points it worked on, and its memory use as
+traced by tracemalloc, which also sees the numpy arrays: the net change in
+traced bytes, and the peak above the memory in use when the call started.
+Tracing is started with profiling, if it is not already on, and slows the
+traced code down. The calls are aggregated per stage, and can be exported
+as JSON, or as a stats file that pstats and the usual cProfile viewers read.
+
+    with pykbi.profiling.Profile() as profile:
+        rdf = pykbi.CorrectVanDerVegt(rdf)
+        rdf.Integrate()
+        rdf.FindValues((0.1, 0.2))
+    profile.SaveJSON("stages.json")
+
+Profiling works by replacing the functions and methods with timed wrappers,
+and putting the originals back when it is disabled, so it costs nothing
+when it is not enabled. Functions imported by name before profiling was
+enabled (from pykbi.fscorr import CorrectVanDerVegt) are not wrapped, use
+them through the module or the pykbi namespace.
+
+Own stages can be timed with the Timer context manager, and callbacks get
+the record of every call as it happens.
+"""
+
+#pylint: disable=invalid-name
+
+import functools
+import importlib
+import json
+import marshal
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+
+__all__ = ["Profiler", "EnableProfiling", "DisableProfiling", "Profile", "Timer"]
+
+
+## the wrapped stages: module, class (None for functions) and name
+TARGETS = [
+    ("pykbi.reader", None, "ReadRDFFile"),
+    ("pykbi.storage", None, "LoadRDFs"),
+    ("pykbi.fscorr", None, "CorrectVanDerVegt"),
+    ("pykbi.fscorr", None, "CorrectInverseN"),
+    ("pykbi.fscorr", None, "CorrectFiniteSize"),
+    ("pykbi.rdf", "RDF", "Integrate"),
+    ("pykbi.rdf", "RDF", "FindValues"),
+    ("pykbi.rdf", "RDF", "ScanWindows"),
+    ("pykbi.rdf", "RDF", "SaveToJSON"),
+    ("pykbi.rdfset", "RDFSet", "CorrectVanDerVegt"),
+    ("pykbi.rdfset", "RDFSet", "CorrectInverseN"),
+    ("pykbi.rdfset", "RDFSet", "Integrate"),
+    ("pykbi.rdfset", "RDFSet", "FindValues"),
+    ("pykbi.kbmatrix", "KBMatrix", "Integrate"),
+]
+
+
+def _Size(args):
+    """
+    Return the number of g(r) points in the arguments of a call
+    """
+
+    size = 0
+    for arg in args:
+        if isinstance(arg, np.ndarray):
+            size += arg.size
+        elif isinstance(getattr(arg, "gr", None), np.ndarray):
+            size += arg.gr.size
+        elif isinstance(arg, (list, tuple)):
+            size += sum(item.gr.size for item in arg
+                        if isinstance(getattr(item, "gr", None), np.ndarray))
+    return size
+
+
+class Profiler:
+    """
+    Aggregated timings per stage.
+
+    The attribute 'stages' maps the name of a stage to a dictionary with the
+    number of calls, the total, minimum and maximum wall time, the total
+    number of g(r) points, the total net change in traced memory in bytes
+    ("memory"), and the largest peak of a single call in bytes ("peak_memory").
+    """
+    def __init__(self):
+        self.stages = {}
+        self.callbacks = []
+        self.code = {}
+
+
+    def AddCallback(self, callback):
+        """
+        Call 'callback' with the record of every call: a dictionary with the
+        stage, time, size, memory and peak_memory
+        """
+
+        self.callbacks.append(callback)
+
+
+    def Record(self, stage, elapsed, size, memory=0, peak_memory=0):
+        """
+        Add the record of a single call to the stage
+        """
+
+        entry = self.stages.get(stage)
+        if entry is None:
+            entry = {"calls": 0, "time": 0.0, "min_time": np.inf, "max_time": 0.0,
+                     "size": 0, "memory": 0, "peak_memory": 0}
+            self.stages[stage] = entry
+
+        entry["calls"] += 1
+        entry["time"] += elapsed
+        entry["min_time"] = min(entry["min_time"], elapsed)
+        entry["max_time"] = max(entry["max_time"], elapsed)
+        entry["size"] += size
+        entry["memory"] += memory
+        entry["peak_memory"] = max(entry["peak_memory"], peak_memory)
+
+        for callback in self.callbacks:
+            callback({"stage": stage, "time": elapsed, "size": size,
+                      "memory": memory, "peak_memory": peak_memory})
+
+
+    def Reset(self):
+        """
+        Remove all recorded timings
+        """
+
+        self.stages = {}
+
+
+    def ReturnStats(self):
+        """
+        Return the stages, with the mean time per call added
+        """
+
+        stats = {}
+        for stage, entry in self.stages.items():
+            stats[stage] = dict(entry, mean_time=entry["time"] / entry["calls"])
+        return stats
+
+
+    def SaveJSON(self, fname):
+        """
+        Save the aggregated stages to a json file
+        """
+
+        with open(fname, "w") as outfile:
+            json.dump(self.ReturnStats(), outfile, indent=2)
+
+
+    def SavePstats(self, fname):
+        """
+        Save the stages in the marshal format of cProfile, to be read with
+        pstats.Stats(fname) or a profile viewer
+        """
+
+        stats = {}
+        for stage, entry in self.stages.items():
+            filename, line, name = self.code.get(stage, ("~", 0, stage))
+            stats[(filename, line, name)] = (entry["calls"], entry["calls"],
+                                             entry["time"], entry["time"], {})
+
+        with open(fname, "wb") as outfile:
+            marshal.dump(stats, outfile)
+
+
+    def Wrap(self, stage, function):
+        """
+        Return a timed wrapper of 'function', recorded as 'stage'
+        """
+
+        code = getattr(function, "__code__", None)
+        if code is not None:
+            self.code[stage] = (code.co_filename, code.co_firstlineno, code.co_name)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            frame = _MemoryStart()
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.Record(stage, elapsed, _Size(args), *_MemoryStop(frame))
+
+        wrapper.__profiled__ = function
+
+        return wrapper
+
+
+## the active profiler, and the original functions it replaced
+_profiler = None
+_originals = []
+
+## the traced memory of the calls in progress, and if profiling started tracemalloc
+_memory_stack = []
+_started_tracing = False
+
+
+def _MemoryStart():
+    """
+    Start measuring the memory of a call. Returns its frame, or None if
+    tracemalloc is not tracing.
+    """
+
+    if not tracemalloc.is_tracing():
+        return None
+
+    current, peak = tracemalloc.get_traced_memory()
+
+    # the peak is reset for this call, so keep it for the enclosing one
+    if _memory_stack:
+        _memory_stack[-1]["peak"] = max(_memory_stack[-1]["peak"], peak)
+
+    frame = {"start": current, "peak": current}
+    _memory_stack.append(frame)
+    tracemalloc.reset_peak()
+
+    return frame
+
+
+def _MemoryStop(frame):
+    """
+    Return the net change in traced memory and the peak above the start of a call
+    """
+
+    if frame is None or not tracemalloc.is_tracing():
+        return 0, 0
+
+    current, peak = tracemalloc.get_traced_memory()
+    peak = max(frame["peak"], peak)
+
+    if _memory_stack and _memory_stack[-1] is frame:
+        _memory_stack.pop()
+    if _memory_stack:
+        _memory_stack[-1]["peak"] = max(_memory_stack[-1]["peak"], peak)
+
+    return current - frame["start"], peak - frame["start"]
+
+
+def EnableProfiling(profiler=None):
+    """
+    Wrap the pipeline stages, and record them in 'profiler', or a new
+    Profiler. Returns the profiler.
+    """
+
+    global _profiler, _started_tracing
+
+    if _profiler is not None:
+        DisableProfiling()
+
+    _profiler = Profiler() if profiler is None else profiler
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracing = True
+
+    package = sys.modules["pykbi"]
+
+    for module_name, class_name, name in TARGETS:
+        module = importlib.import_module(module_name)
+
+        if class_name is None:
+            owner = module
+            stage = name
+        else:
+            owner = getattr(module, class_name)
+            stage = "{}.{}".format(class_name, name)
+
+        original = owner.__dict__[name]
+        setattr(owner, name, _profiler.Wrap(stage, original))
+        _originals.append((owner, name, original))
+
+        # functions are also reached through the pykbi namespace
+        if class_name is None and getattr(package, name, None) is original:
+            setattr(package, name, getattr(owner, name))
+            _originals.append((package, name, original))
+
+    return _profiler
+
+
+def DisableProfiling():
+    """
+    Put the original functions back. Returns the profiler with the recorded stages.
+    """
+
+    global _profiler, _started_tracing
+
+    while _originals:
+        owner, name, original = _originals.pop()
+        setattr(owner, name, original)
+
+    profiler = _profiler
+    _profiler = None
+
+    del _memory_stack[:]
+    if _started_tracing:
+        tracemalloc.stop()
+        _started_tracing = False
+
+    return profiler
+
+
+class Profile:
+    """
+    Context manager enabling profiling inside the block, returns the Profiler
+    """
+    def __init__(self, profiler=None):
+        self.profiler = profiler
+
+    def __enter__(self):
+        self.profiler = EnableProfiling(self.profiler)
+        return self.profiler
+
+    def __exit__(self, *args):
+        DisableProfiling()
+        return False
+
+
+class Timer:
+    """
+    Context manager timing a stage of your own, such as loading data.
+    It is recorded in the active profiler, and does nothing if profiling is
+    disabled.
+
+        with pykbi.profiling.Timer("load"):
+            data = numpy.loadtxt(fname)
+    """
+    def __init__(self, stage, size=0):
+        self.stage = stage
+        self.size = size
+        self.start = None
+        self.frame = None
+
+    def __enter__(self):
+        self.frame = _MemoryStart() if _profiler is not None else None
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        elapsed = time.perf_counter() - self.start
+        if _profiler is not None:
+            _profiler.Record(self.stage, elapsed, self.size, *_MemoryStop(self.frame))
+        return False
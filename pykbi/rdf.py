@@ -11,10 +11,11 @@ can be used to.
 #pylint: disable=too-many-instance-attributes
 #pylint: disable=too-many-arguments
 
-import scipy.integrate
-import scipy.stats
 import numpy as np
 import json
+import pykbi.numerics as _numerics
+import pykbi.cache as _cache
+import pykbi.kernels as _kernels
 
 
 __all__ = ["RDF"]
@@ -27,6 +28,134 @@ def default(o):
     raise TypeError
 
 
+def _UniformGrid(r):
+    """
+    Return (r0, dr, n) if the grid r is uniform to rounding, otherwise None
+    """
+
+    n = len(r)
+    if n < 2:
+        return None
+
+    dr = (r[-1] - r[0]) / (n - 1)
+    if dr <= 0.0:
+        return None
+
+    if np.max(np.abs(r[0] + dr * np.arange(n) - r)) > 1e-9 * dr:
+        return None
+
+    return (float(r[0]), float(dr), n)
+
+
+def _RunningWindows(values, npoints):
+    """
+    Return the mean and standard deviation of every window of 'npoints'
+    consecutive values, from prefix sums. Entry j is the window starting at j.
+    """
+
+    # shift the data to reduce the cancellation in the sum of squares
+    shift = values.mean()
+    shifted = values - shift
+
+    p1 = np.concatenate(([0.0], np.cumsum(shifted)))
+    p2 = np.concatenate(([0.0], np.cumsum(shifted**2)))
+
+    mean = (p1[npoints:] - p1[:-npoints]) / npoints
+    variance = (p2[npoints:] - p2[:-npoints]) / npoints - mean**2
+
+    return mean + shift, np.sqrt(np.maximum(variance, 0.0))
+
+
+def _ScanWindows(x, y, criterion="r2", min_points=5, step=1, chunk=256):
+    """
+    Fit a line to every window y[i:j+1] against x[i:j+1] and return the best one.
+
+    The sums of x, y, x^2, xy and y^2 over a window are differences of prefix
+    sums, so every window is fitted in closed form. The start indices are
+    handled in chunks to bound the memory use. Only windows with at least
+    'min_points' points are considered, and the window edges are taken at
+    every 'step' index.
+
+    criterion is "r2" (largest R-squared), "stderr" (smallest standard error
+    of the intercept), or a function taking a dictionary of arrays with the
+    keys "G", "slope", "r_value", "intercept_error", "npoints", "start" and
+    "stop", and returning a score, where the largest score wins.
+
+    Returns a dictionary with the start and stop index (inclusive) of the best
+    window and its score, or None if no window has enough points.
+    """
+
+    if criterion == "r2":
+        score_function = lambda stats: stats["r_value"]**2
+    elif criterion == "stderr":
+        score_function = lambda stats: -stats["intercept_error"]
+    elif callable(criterion):
+        score_function = criterion
+    else:
+        raise ValueError("Unknown window criterion '{}'".format(criterion))
+
+    # shift the data to reduce the cancellation in the sums of squares
+    x0 = x.mean()
+    y0 = y.mean()
+    xs = x - x0
+    ys = y - y0
+
+    def prefix(values):
+        return np.concatenate(([0.0], np.cumsum(values)))
+
+    px, py = prefix(xs), prefix(ys)
+    pxx, pxy, pyy = prefix(xs*xs), prefix(xs*ys), prefix(ys*ys)
+
+    edges = np.arange(0, len(x), step)
+    best = None
+
+    for first in range(0, len(edges), chunk):
+        start = edges[first:first+chunk, np.newaxis]
+        stop = edges[np.newaxis, :]
+
+        npoints = stop - start + 1
+        valid = npoints >= max(min_points, 3)
+        if not valid.any():
+            continue
+
+        start, stop = np.broadcast_arrays(start, stop)
+        start = start[valid]
+        stop = stop[valid]
+        npoints = npoints[valid].astype(float)
+
+        sx = px[stop+1] - px[start]
+        sy = py[stop+1] - py[start]
+        sxx = pxx[stop+1] - pxx[start] - sx**2 / npoints
+        sxy = pxy[stop+1] - pxy[start] - sx * sy / npoints
+        syy = pyy[stop+1] - pyy[start] - sy**2 / npoints
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            slope = sxy / sxx
+            intercept = (sy - slope * sx) / npoints
+            r_value = np.clip(np.where(sxx * syy > 0.0, sxy / np.sqrt(sxx * syy), 0.0), -1.0, 1.0)
+            residual = np.maximum(syy - slope * sxy, 0.0) / (npoints - 2.0)
+            intercept_error = np.sqrt(residual * (1.0 / npoints + (sx / npoints)**2 / sxx))
+
+        stats = {"G": y0 + intercept - slope * x0,
+                 "slope": slope,
+                 "r_value": r_value,
+                 "intercept_error": intercept_error,
+                 "npoints": npoints,
+                 "start": start,
+                 "stop": stop}
+
+        score = np.asarray(score_function(stats), dtype=float)
+        score = np.where(np.isfinite(score), score, -np.inf)
+
+        index = np.argmax(score)
+        if best is None or score[index] > best["score"]:
+            best = {"start": int(start[index]), "stop": int(stop[index]),
+                    "score": float(score[index]),
+                    "intercept_error": float(intercept_error[index])}
+
+    return best
+
+
 class RDF:
     """
     Class to contain and work with radial distribution functions.
@@ -40,24 +169,48 @@ class RDF:
     radial_dist : numpy.ndarray
         A numpy.ndarray to hold the radial distance.
     radial_dist_func : numpy.ndarray
+    compact : bool
+        Store g(r) and the integral in float32, and a uniform radial grid as
+        (r0, dr, n) only. The integrators still work in float64. The grid
+        array is built on the first access to r or rint and kept, read-only,
+        so change the grid by assigning a new r instead of writing into it.
+    kernel : str
+        Name of the integration scheme, see the kernels module. Overrides
+        'closed', which selects the "closed" or "open" scheme.
 
     """
     def __init__(self, radial_dist, radial_dist_func, closed=True,
-                 npart=None, box_size=None, eqint=None, name=None):
+                 npart=None, box_size=None, eqint=None, name=None, compact=False,
+                 kernel=None):
 
         self.npart = npart
+        self.compact = compact
+
+        # the grid, either as an array or as (r0, dr, n) in compact mode
+        self._r = None
+        self._grid = None
+        self._grid_r = None
+        self._rint = None
 
         if isinstance(radial_dist_func, np.ndarray):
-            self.gr = radial_dist_func
+            if compact:
+                self.gr = radial_dist_func.astype(np.float32)
+            else:
+                self.gr = radial_dist_func
         else:
             raise TypeError("RDF: 'radial_dist_func' must be numpy.ndarray")
 
         if isinstance(radial_dist, np.ndarray):
-            self.r = radial_dist
+            if compact:
+                self._grid = _UniformGrid(radial_dist)
+            if self._grid is None:
+                self.r = radial_dist
         else:
             raise TypeError("RDF: 'radial_dist' must be numpy.ndarray")
 
-        if closed:
+        if kernel is not None:
+            self.integral_type = kernel
+        elif closed:
             self.integral_type = "closed"
         else:
             self.integral_type = "open"
@@ -84,6 +237,61 @@ class RDF:
 
 
 
+    @property
+    def r(self):
+        """
+        The radial distances. For a compact grid they are built from
+        (r0, dr, n) on first use, and kept as a read-only array.
+        """
+
+        if self._grid is not None:
+            if self._grid_r is None:
+                r0, dr, n = self._grid
+                self._grid_r = r0 + dr * np.arange(n)
+                self._grid_r.flags.writeable = False
+            return self._grid_r
+        return self._r
+
+
+    @r.setter
+    def r(self, value):
+        self._r = value
+        self._grid = None
+        self._grid_r = None
+
+
+    @property
+    def rint(self):
+        """
+        The radial distances of the integral, a view of r[1:]
+        """
+
+        if self._rint is None and self._grid is not None and self.kbi is not None:
+            return self.r[1:]
+        return self._rint
+
+
+    @rint.setter
+    def rint(self, value):
+        self._rint = value
+
+
+    def _Dtype(self):
+        return np.float32 if self.compact else np.float64
+
+
+    def _Readout(self):
+        """
+        Return how the integral is read out, "direct" or "extrapolate", or
+        None for an unknown integration type
+        """
+
+        kernel = _kernels.ReturnKernel(self.integral_type)
+        if kernel is None:
+            return None
+        return kernel.readout
+
+
     def PrintState(self):
         """
         Print the state of this current system.
@@ -154,15 +362,60 @@ class RDF:
 
     def Integrate(self):
         """
-        Integrate the rdf-data, use either open or closed integration method
+        Integrate the rdf-data, with the integration scheme given by the
+        integration type, see the kernels module
         """
 
-        if self.integral_type == "open":
-            self._IntegrateOpenSystem()
-        elif self.integral_type == "closed":
-            self._IntegrateClosedSystem()
-        else:
+        kernel = _kernels.ReturnKernel(self.integral_type)
+
+        if kernel is None:
             print("'{}' is unknown integration type.".format(self.integral_type))
+            return
+
+        # the definition, so a scheme registered again under the same name is not mixed up
+        parameters = [kernel.ReturnDefinition()]
+
+        if kernel.NeedsSystem():
+            if self.npart is None or self.volume is None or self.eqint is None:
+                print("The '{}' integration needs npart, box size and eqint.".format(
+                    self.integral_type))
+                return
+            parameters += [self.npart, self.volume, self.eqint]
+
+        key = _cache.Key("integrate", parameters, self.r, self.gr)
+        cached = _cache.Get(key)
+        if cached is not None:
+            self.kbi = cached["kbi"]
+            self.rint = None if self._grid is not None else cached["rint"]
+            return
+
+        self._IntegrateKernel(kernel)
+
+        _cache.Put(key, {"rint": self.rint, "kbi": self.kbi})
+
+
+    def _IntegrateKernel(self, kernel):
+        """
+        Integrate with a kernel, in float64 whatever the storage type
+        """
+
+        r = self.r
+
+        self.rint = None if self._grid is not None else r[1:]
+
+        gr = np.asarray(self.gr, dtype=np.float64)
+
+        if kernel.transform is not None:
+            gr = kernel.transform(r, gr, self.npart, self.volume, self.eqint)
+
+        h = gr - 1.0
+
+        kbi = 4.0 * np.pi * kernel.Integrate(r, h)
+
+        if kernel.correction is not None:
+            kbi = kernel.correction(r[1:], kbi, self.npart, self.volume, self.eqint)
+
+        self.kbi = kbi.astype(self._Dtype(), copy=False)
 
 
 
@@ -174,12 +427,7 @@ class RDF:
         using the Kruger-integration. (IntegratedClosedSystem)
         """
 
-        self.rint = np.zeros(len(self.r)-1)
-        self.rint[:] = self.r[1:]
-
-        h = self.gr - 1.0
-
-        self.kbi = 4.0 * np.pi * scipy.integrate.cumtrapz(h * self.r**2, self.r)
+        self._IntegrateKernel(_kernels.ReturnKernel("open"))
 
 
     def _IntegrateClosedSystem(self):
@@ -190,23 +438,7 @@ class RDF:
         Kruger et al. J. Phys. Chem. Lett. 2013, 4, 235-238 (dx.doi.org/10.1021/jz301992u)
         """
 
-        elems = len(self.r)
-
-        self.rint = np.zeros(elems-1)
-        self.rint[:] = self.r[1:]
-
-        self.kbi = np.zeros(elems-1)
-
-        h = self.gr - 1.0
-
-        #check these a bit more careful. there might be something with the limit here.
-        for i in range(1, elems):
-            self.kbi[i-1] = scipy.integrate.trapz(
-                h[:i] * self.r[:i]**2 *
-                (1.0 - 1.5 * (self.r[:i]/self.r[i]) + 0.5 * (self.r[:i]/self.r[i])**3),
-                self.r[:i])
-
-        self.kbi *= 4.0 * np.pi
+        self._IntegrateKernel(_kernels.ReturnKernel("closed"))
 
 
     def FindValues(self, position=None):
@@ -215,7 +447,8 @@ class RDF:
 
         If the system was integrated as an open system, we read it directly
         from the KBI-vector, while if it is a closed system, we have to do
-        extrapolation.
+        extrapolation. Other integration schemes are read out either way,
+        see the kernels module.
 
         param: position: (first, [last])
 
@@ -225,9 +458,18 @@ class RDF:
 
         """
 
+        key = _cache.Key("findvalues", [self.integral_type, self._Readout(), position],
+                         self.rint, self.kbi)
+        cached = _cache.Get(key)
+        if cached is not None:
+            self.integral_value = cached
+            return
+
         self.integral_value = {}
 
-        if self.integral_type == "open":
+        readout = self._Readout()
+
+        if readout == "direct":
             if position is None:
                 index = len(self.kbi) - 1
             else:
@@ -242,7 +484,7 @@ class RDF:
             self.integral_value["index"] = index
 
 
-        elif self.integral_type == "closed":
+        elif readout == "extrapolate":
 
 
             if position is None:
@@ -283,7 +525,7 @@ class RDF:
 
                 index[0] = np.argmax(r_inverse < position[1])
 
-            slope, intercept, r_value, p_value, std_error = scipy.stats.linregress(
+            slope, intercept, r_value, p_value, std_error = _numerics.linregress(
                 r_inverse[index], self.kbi[index])
 
             self.integral_value["G"] = intercept
@@ -294,6 +536,175 @@ class RDF:
             self.integral_value["index_limit"] = index
             self.integral_value["value_limit"] = r_inverse[index]
 
+        _cache.Put(key, self.integral_value)
+
+
+    def ScanWindows(self, position=None, criterion="r2", min_points=5, step=1):
+        """
+        Extrapolate a closed system, choosing the window automatically.
+
+        Instead of a hand-picked window, every window of at least 'min_points'
+        points on the 1/R grid is fitted, and the best one is chosen by the
+        criterion. The criterion is "r2" for the largest R-squared, "stderr"
+        for the smallest standard error of the intercept, or a function, see
+        _ScanWindows. The window edges are taken at every 'step' point.
+
+        param: position: (lower, upper) limits in 1/R of the region to scan.
+        Either limit may be None, and the default is the whole grid.
+
+        The chosen window is stored in integral_value like for FindValues,
+        together with the number of points, the score and the standard error
+        of the intercept.
+        """
+
+        self.integral_value = None
+
+        if self._Readout() != "extrapolate":
+            print("\n Scanning extrapolation windows only applies to closed systems.\n")
+            return
+
+        if self.kbi is None:
+            print("No integral present in this dataset")
+            return
+
+        # a custom criterion cannot be part of the key
+        key = None
+        if isinstance(criterion, str):
+            key = _cache.Key("scanwindows",
+                             [self._Readout(), position, criterion, min_points, step],
+                             self.rint, self.kbi)
+        cached = _cache.Get(key)
+        if cached is not None:
+            self.integral_value = cached
+            return
+
+        r_inverse = 1.0 / self.rint
+
+        first = 0
+        last = len(self.kbi) - 1
+
+        if position is not None:
+            if position[1] is not None:
+                first = np.argmax(r_inverse < position[1])
+            if position[0] is not None:
+                if position[0] < r_inverse[-1]:
+                    print("\n Lower limit is outside of the acceptable range.\n")
+                    return
+                last = np.argmax(r_inverse < position[0])
+
+        best = _ScanWindows(r_inverse[first:last+1], self.kbi[first:last+1],
+                            criterion=criterion, min_points=min_points, step=step)
+
+        if best is None:
+            print("\n No window with at least {} points in the scanned region.\n".format(min_points))
+            return
+
+        index = [first + best["start"], first + best["stop"]]
+
+        slope, intercept, r_value, p_value, std_error = _numerics.linregress(
+            r_inverse[index[0]:index[1]+1], self.kbi[index[0]:index[1]+1])
+
+        self.integral_value = {}
+        self.integral_value["G"] = intercept
+        self.integral_value["slope"] = slope
+        self.integral_value["p_value"] = p_value
+        self.integral_value["std_error"] = std_error
+        self.integral_value["r_value"] = r_value
+        self.integral_value["index_limit"] = index
+        self.integral_value["value_limit"] = r_inverse[index]
+        self.integral_value["npoints"] = index[1] - index[0] + 1
+        self.integral_value["intercept_error"] = best["intercept_error"]
+        self.integral_value["criterion"] = criterion if isinstance(criterion, str) else "custom"
+        self.integral_value["score"] = best["score"]
+
+        _cache.Put(key, self.integral_value)
+
+
+    def FindPlateau(self, width=None, tolerance=None, truncate=False):
+        """
+        Read out an open system from the plateau of the running integral.
+
+        The mean and spread (standard deviation) of the KBI are computed over
+        a window of 'width' (in units of r) sliding along the integral. The
+        plateau is the first window with a spread below 'tolerance', or the
+        window with the smallest spread if no tolerance is given. The default
+        width is a tenth of the range.
+
+        param: truncate: drop the data beyond the plateau, see Truncate
+
+        The KBI is the mean over the plateau, and is stored in integral_value
+        together with the spread, the index and radius where the plateau
+        ends ("index", "rint_value"), and its limits ("index_limit",
+        "plateau_limit").
+        """
+
+        self.integral_value = None
+
+        if self._Readout() != "direct":
+            print("\n Finding the plateau only applies to open systems.\n")
+            return
+
+        if self.kbi is None:
+            print("No integral present in this dataset")
+            return
+
+        rint = self.rint
+
+        if width is None:
+            npoints = max(len(self.kbi) // 10, 2)
+        else:
+            npoints = max(int(round(width / np.median(np.diff(rint)))), 2)
+
+        if npoints > len(self.kbi):
+            print("\n The plateau window is longer than the integral.\n")
+            return
+
+        mean, spread = _RunningWindows(np.asarray(self.kbi, dtype=np.float64), npoints)
+
+        if tolerance is None:
+            first = np.argmin(spread)
+        else:
+            converged = np.flatnonzero(spread <= tolerance)
+            if len(converged) == 0:
+                print("\n The integral has no plateau with a spread below {}.\n".format(tolerance))
+                return
+            first = converged[0]
+
+        index = [int(first), int(first) + npoints - 1]
+
+        self.integral_value = {}
+        self.integral_value["G"] = mean[first]
+        self.integral_value["spread"] = spread[first]
+        self.integral_value["index"] = index[1]
+        self.integral_value["rint_value"] = rint[index[1]]
+        self.integral_value["index_limit"] = index
+        self.integral_value["plateau_limit"] = rint[index]
+
+        if truncate:
+            self.Truncate(rint[index[1]])
+
+
+    def Truncate(self, rmax):
+        """
+        Drop the data beyond rmax, from g(r) and from the integral. The
+        remaining data is copied, so the memory of the rest is released.
+        """
+
+        n = int(np.searchsorted(self.r, rmax, side="right"))
+
+        if self._grid is not None:
+            self._grid = (self._grid[0], self._grid[1], n)
+            self._grid_r = None
+        else:
+            self.r = self.r[:n].copy()
+
+        self.gr = self.gr[:n].copy()
+
+        if self.kbi is not None:
+            self.kbi = self.kbi[:n-1].copy()
+            if self._rint is not None:
+                self._rint = self.r[1:]
+
 
     def ReturnKBI(self):
         """
@@ -348,11 +759,11 @@ class RDF:
             print("\nNo data has been read from this data.\n")
             return
 
-        if self.integral_type == "open":
+        if self._Readout() == "direct":
             # we have only a single point
             axhandle.plot(self.integral_value["rint_value"], self.ReturnKBI(), "o", **kwargs)
 
-        elif self.integral_type == "closed":
+        elif self._Readout() == "extrapolate":
             #print(self.integral_value.keys())
             index = self.integral_value["index_limit"]
 
@@ -389,3 +800,12 @@ class RDF:
             json.dump(json_data, outfile, indent=2, default=default)
 
 
+    def SaveToBinary(self, fname):
+        """
+        Save the arrays and metadata to a binary file, see storage.SaveRDF.
+        The file can be loaded again with LoadRDF.
+        """
+
+        import pykbi.storage
+
+        pykbi.storage.SaveRDF(self, fname)
@@ -0,0 +1,394 @@
+#! /usr/bin/env python3
+
+"""
+A collection of radial distribution functions sharing the same radial grid.
+
+Multi-component systems give many g(r), typically all sampled on the same
+radial distances. The RDFSet holds them as one 2-D array of shape
+(n_pairs, n_bins), and integrates, extrapolates and corrects all of them in
+one vectorized call. Single pairs can be taken out as ordinary RDF objects.
+
+"""
+#pylint: disable=invalid-name
+#pylint: disable=too-many-instance-attributes
+#pylint: disable=too-many-arguments
+
+import numpy as np
+import pykbi.rdf as _rdf
+import pykbi.numerics as _numerics
+import pykbi.resample as _resample
+import pykbi.kernels as _kernels
+import pykbi.fscorr as _fscorr
+
+
+__all__ = ["RDFSet"]
+
+
+def _PerPair(value, npairs):
+    """
+    Broadcast a scalar or sequence to one value per pair. None is kept as None.
+    """
+
+    if value is None:
+        return None
+
+    return np.broadcast_to(np.asarray(value), (npairs,)).copy()
+
+
+def _Item(values, index):
+    """
+    Return a single element as a python scalar, or None.
+    """
+
+    if values is None:
+        return None
+
+    return values[index].item()
+
+
+class RDFSet:
+    """
+    Class to contain and work with many radial distribution functions on the same grid.
+
+    Parameters
+    ----------
+    radial_dist : numpy.ndarray
+        A numpy.ndarray of length n_bins holding the radial distance.
+    radial_dist_funcs : numpy.ndarray
+        A numpy.ndarray of shape (n_pairs, n_bins) holding the g(r), one pair per row.
+    npart, box_size, eqint :
+        Either a single value used for all pairs, or one value per pair.
+    names : list
+        One name per pair.
+    kernel : str
+        Name of the integration scheme, see RDF.
+
+    """
+    def __init__(self, radial_dist, radial_dist_funcs, closed=True,
+                 npart=None, box_size=None, eqint=None, names=None, kernel=None):
+
+        if isinstance(radial_dist, np.ndarray):
+            self.r = radial_dist
+        else:
+            raise TypeError("RDFSet: 'radial_dist' must be numpy.ndarray")
+
+        if isinstance(radial_dist_funcs, np.ndarray):
+            self.gr = np.atleast_2d(radial_dist_funcs)
+        else:
+            raise TypeError("RDFSet: 'radial_dist_funcs' must be numpy.ndarray")
+
+        if self.gr.ndim != 2 or self.gr.shape[1] != len(self.r):
+            raise ValueError("RDFSet: 'radial_dist_funcs' must have shape (n_pairs, len(radial_dist))")
+
+        npairs = self.gr.shape[0]
+
+        if kernel is not None:
+            self.integral_type = kernel
+        elif closed:
+            self.integral_type = "closed"
+        else:
+            self.integral_type = "open"
+
+        self.npart = _PerPair(npart, npairs)
+        self.eqint = _PerPair(eqint, npairs)
+
+        if box_size is not None:
+            self.AddBoxSize(box_size)
+        else:
+            self.lt = None
+            self.volume = None
+
+        if names is None:
+            self.names = ["None"] * npairs
+        elif len(names) != npairs:
+            raise ValueError("RDFSet: need one name per pair")
+        else:
+            self.names = list(names)
+
+        self.rint = None
+        self.kbi = None
+
+        ## here we store the result from the interpolation, one entry per pair
+        self.integral_value = None
+
+
+    @classmethod
+    def FromRDFs(cls, rdfs):
+        """
+        Build a set from a list of RDF objects sharing the same radial grid
+        and integration type.
+        """
+
+        rdfs = list(rdfs)
+        if not rdfs:
+            raise ValueError("RDFSet: need at least one RDF")
+
+        ref = rdfs[0]
+        for rdf in rdfs[1:]:
+            if not np.array_equal(rdf.r, ref.r):
+                raise ValueError("RDFSet: all RDFs must share the same radial grid")
+            if rdf.integral_type != ref.integral_type:
+                raise ValueError("RDFSet: all RDFs must use the same integration type")
+
+        def collect(attr):
+            values = [getattr(rdf, attr) for rdf in rdfs]
+            if any(value is None for value in values):
+                return None
+            return values
+
+        return cls(ref.r, np.stack([rdf.gr for rdf in rdfs]),
+                   kernel=ref.integral_type,
+                   npart=collect("npart"),
+                   box_size=collect("lt"),
+                   eqint=collect("eqint"),
+                   names=[rdf.name for rdf in rdfs])
+
+
+    def __len__(self):
+        return self.gr.shape[0]
+
+
+    def __getitem__(self, index):
+        """
+        Return pair 'index' as an RDF object. The arrays are views into the set.
+        """
+
+        if index < 0:
+            index += len(self)
+
+        rdf = _rdf.RDF(self.r, self.gr[index],
+                       kernel=self.integral_type,
+                       npart=_Item(self.npart, index),
+                       box_size=_Item(self.lt, index),
+                       eqint=_Item(self.eqint, index),
+                       name=self.names[index])
+
+        if self.kbi is not None:
+            rdf.rint = self.rint
+            rdf.kbi = self.kbi[index]
+
+        if self.integral_value is not None:
+            rdf.integral_value = {}
+            for key, value in self.integral_value.items():
+                if key in ("index", "index_limit", "value_limit", "rint_value"):
+                    rdf.integral_value[key] = value
+                else:
+                    rdf.integral_value[key] = value[index]
+
+        return rdf
+
+
+    def ReturnRDFs(self):
+        """
+        Return all pairs as a list of RDF objects
+        """
+
+        return [self[i] for i in range(len(self))]
+
+
+    def AddBoxSize(self, lt):
+        """
+        Add the boxsize and volume to the rdfs, either one value or one per pair
+        """
+        self.lt = _PerPair(lt, len(self)).astype(float)
+        self.volume = self.lt**3
+
+
+    def Integrate(self):
+        """
+        Integrate all rdfs, with the integration scheme given by the
+        integration type, see the kernels module
+        """
+
+        kernel = _kernels.ReturnKernel(self.integral_type)
+
+        if kernel is None:
+            print("'{}' is unknown integration type.".format(self.integral_type))
+            return
+
+        gr = self.gr
+
+        if kernel.NeedsSystem():
+            if self.npart is None or self.volume is None or self.eqint is None:
+                print("The '{}' integration needs npart, box size and eqint.".format(
+                    self.integral_type))
+                return
+
+        if kernel.transform is not None:
+            gr = kernel.transform(self.r, gr, self.npart, self.volume, self.eqint)
+
+        self.rint = self.r[1:]
+
+        h = gr - 1.0
+
+        self.kbi = 4.0 * np.pi * kernel.Integrate(self.r, h)
+
+        if kernel.correction is not None:
+            self.kbi = kernel.correction(self.rint, self.kbi, self.npart, self.volume,
+                                         self.eqint)
+
+
+    def FindValues(self, position=None):
+        """
+        Extract the values from the integrals, see RDF.FindValues.
+
+        All pairs are read out at the same position, and the closed system
+        extrapolations are fitted in one pass.
+        """
+
+        self.integral_value = {}
+
+        kernel = _kernels.ReturnKernel(self.integral_type)
+        readout = None if kernel is None else kernel.readout
+
+        if readout == "direct":
+            if position is None:
+                index = self.kbi.shape[1] - 1
+            else:
+                if position[0] > self.rint[-1] or position[0] < 0.0:
+                    print("Trying to read values outside the range of the array")
+                    return
+                else:
+                    index = np.argmax(self.rint > position[0])
+
+            self.integral_value["G"] = self.kbi[:, index]
+            self.integral_value["rint_value"] = self.rint[index]
+            self.integral_value["index"] = index
+
+
+        elif readout == "extrapolate":
+
+            if position is None:
+                print("\n We have to set the postions to extrapolate a closed system.\n")
+                self.integral_value = None
+                return
+            elif len(position) != 2:
+                print("\n We integrated a closed system, we must supply ranges to extract values\n")
+                self.integral_value = None
+                return
+
+            r_inverse = 1.0 / self.rint
+
+            index = [None, None]
+
+            if position[0] is None:
+                index[1] = self.kbi.shape[1] - 1
+            else:
+                if position[0] < r_inverse[-1]:
+                    print("\n Lower limit is outside of the acceptable range.\n")
+                    self.integral_value = None
+                    return
+
+                index[1] = np.argmax(r_inverse < position[0])
+
+            if position[1] is None:
+                print("\n Upper limit has to be set when we read out values from closed system.\n ")
+                self.integral_value = None
+                return
+            else:
+                if position[1] > r_inverse[0]:
+                    print("\n Upper limit is outside of the acceptable range.\n")
+                    self.integral_value = None
+                    return
+
+                index[0] = np.argmax(r_inverse < position[1])
+
+            slope, intercept, r_value, p_value, std_error = _numerics.linregress(
+                r_inverse[index], self.kbi[:, index])
+
+            self.integral_value["G"] = intercept
+            self.integral_value["slope"] = slope
+            self.integral_value["p_value"] = p_value
+            self.integral_value["std_error"] = std_error
+            self.integral_value["r_value"] = r_value
+            self.integral_value["index_limit"] = index
+            self.integral_value["value_limit"] = r_inverse[index]
+
+
+    def ReturnKBI(self):
+        """
+        Return the KBI values, one per pair
+        """
+
+        if self.integral_value is not None and "G" in self.integral_value.keys():
+            return self.integral_value["G"]
+        else:
+            return None
+
+
+    def CorrectVanDerVegt(self):
+        """
+        Van der Vegt finite size correction of all pairs, see fscorr.CorrectVanDerVegt.
+        Returns a new RDFSet.
+        """
+
+        if self.npart is None:
+            print("Cannot do VDV correction on this set. No particles defined")
+            return False
+
+        if self.lt is None or self.volume is None:
+            print("Cannot do VDV correction on this set. ")
+            print("RDFs without box side lengths or volume")
+            return False
+
+        if self.eqint is None:
+            print("Cannot do VDV correction on this set. ")
+            print("RDFs must have eqint value set.")
+            return False
+
+        gr = _fscorr.CorrectVanDerVegtStack(self.r, self.gr, self.npart, self.volume, self.eqint)
+
+        return RDFSet(self.r.copy(),
+                      gr,
+                      npart=self.npart,
+                      box_size=self.lt,
+                      eqint=self.eqint,
+                      names=self.names,
+                      kernel=self.integral_type)
+
+
+    def CorrectInverseN(self, other, method="linear"):
+        """
+        Inverse-N finite size correction of all pairs against a second set,
+        see fscorr.CorrectInverseN. Returns a new RDFSet.
+        """
+
+        if len(self) != len(other):
+            print("CorrectInverseN correction requires sets with the same number of pairs")
+            return False
+
+        if self.npart is None or other.npart is None:
+            print("RDFs must have a defined number of particles")
+            return False
+
+        if np.any(self.npart == other.npart):
+            print("Equal number of particles in some of the RDFs. ")
+            print("Cannot do Inverse-N finite size correction when same number of atoms")
+            return False
+
+        if len(self.r) > len(other.r):
+            setref = other
+            setext = self
+        else:
+            setref = self
+            setext = other
+
+        try:
+            r = _resample.CommonGrid([setref.r, setext.r])
+        except ValueError:
+            print("CorrectInverseN correction requires rdf's with overlapping ranges")
+            return False
+
+        grref = _resample.ReturnPlan(setref.r, r, method).Apply(setref.gr)
+        grext = _resample.ReturnPlan(setext.r, r, method).Apply(setext.gr)
+
+        ratio = (setext.npart / setref.npart)[:, np.newaxis]
+        correction_mask = (grref - grext) / (ratio - 1.0)
+
+        return RDFSet(r.copy(),
+                      grref-correction_mask,
+                      npart=setref.npart,
+                      box_size=setref.lt,
+                      eqint=setref.eqint,
+                      names=[name+" invN-corrected" for name in setref.names],
+                      kernel=setref.integral_type)
@@ -0,0 +1,311 @@
+#! /usr/bin/env python3
+
+"""
+Read radial distribution functions from the output of simulation programs.
+
+Supported layouts:
+    - "text": whitespace separated columns, with '#' comments (docs/rdf1.txt)
+    - "xvg": GROMACS output, with '#' and '@' header lines
+    - "lammps": fix ave/time output in vector mode, a block of rows for every
+      time step. The blocks are averaged, or a single block is taken.
+    - "raw": raw binary numbers, row by row, with a given number of columns
+    - "pykbi": a binary file with a "columns" array, as written by this module
+
+Text files are parsed in chunks of lines with numpy, so only one chunk is held
+in memory at a time. The parsed numbers are written once to a binary sidecar
+next to the file (the file name with ".pykbi" added), which is memory-mapped
+when the file is opened again, as long as the source file is unchanged.
+
+The columns are handed out as RDF objects whose arrays are views into the
+data, so no copies are made.
+"""
+
+#pylint: disable=invalid-name
+#pylint: disable=too-many-arguments
+
+import os
+import numpy as np
+import pykbi.rdf as _rdf
+import pykbi.rdfset as _rdfset
+import pykbi.storage as _storage
+
+
+__all__ = ["RDFFile", "ReadRDFFile"]
+
+
+## approximate number of bytes read per chunk
+_CHUNK_BYTES = 1 << 24
+
+_COMMENTS = {"text": "#", "xvg": "#@&", "lammps": "#"}
+
+## column of the radial distance, if not the first. Column 0 of LAMMPS
+## fix ave/time output is the row index.
+_R_COLUMNS = {"lammps": 1}
+
+
+def _DetectFormat(fname):
+    """
+    Guess the layout of a file from its extension and header
+    """
+
+    extension = os.path.splitext(fname)[1].lower()
+
+    if extension == _storage.EXTENSION:
+        return "pykbi"
+    if extension == ".xvg":
+        return "xvg"
+    if extension in (".bin", ".raw"):
+        return "raw"
+
+    with open(fname) as infile:
+        for line in infile:
+            if not line.startswith("#"):
+                break
+            if "Number-of-rows" in line:
+                return "lammps"
+
+    return "text"
+
+
+def _TextChunks(fname, comments, rmax=None, r_column=0):
+    """
+    Generate the numbers in a text file as 2-D arrays, one chunk of lines at a time.
+    Reading stops at the first row with r above rmax.
+    """
+
+    ncols = None
+
+    with open(fname) as infile:
+        while True:
+            lines = infile.readlines(_CHUNK_BYTES)
+            if not lines:
+                break
+
+            data = [line for line in lines if line.strip() and line.lstrip()[0] not in comments]
+            if not data:
+                continue
+
+            if ncols is None:
+                ncols = len(data[0].split())
+
+            values = np.fromstring("".join(data), sep=" ")
+            if values.size % ncols != 0:
+                raise ValueError("'{}' has rows with different number of columns".format(fname))
+
+            rows = values.reshape(-1, ncols)
+
+            if rmax is not None and np.any(rows[:, r_column] > rmax):
+                yield rows[:np.argmax(rows[:, r_column] > rmax)]
+                return
+
+            yield rows
+
+
+def _LammpsBlocks(fname, block=None):
+    """
+    Read fix ave/time vector output. Returns the average over all blocks, or
+    block number 'block' (negative numbers count from the end).
+    """
+
+    rest = np.zeros(0)
+    nrows = None
+    ncols = None
+    blocks = []
+    total = None
+    count = 0
+
+    with open(fname) as infile:
+        while True:
+            lines = infile.readlines(_CHUNK_BYTES)
+            if not lines:
+                break
+
+            data = [line for line in lines if line.strip() and not line.lstrip().startswith("#")]
+            if not data:
+                continue
+
+            if nrows is None:
+                nrows = int(data[0].split()[1])
+                ncols = len(data[1].split())
+
+            values = np.concatenate((rest, np.fromstring("".join(data), sep=" ")))
+
+            # each block is the time step, the number of rows, and the rows
+            length = 2 + nrows * ncols
+            complete = values.size // length
+            rows = values[:complete * length].reshape(complete, length)[:, 2:]
+            rows = rows.reshape(complete, nrows, ncols)
+            rest = values[complete * length:]
+
+            if block is None:
+                total = rows.sum(axis=0) if total is None else total + rows.sum(axis=0)
+            elif block >= 0:
+                if count <= block < count + complete:
+                    return rows[block - count].copy()
+            else:
+                # only keep the blocks we may need
+                blocks = (blocks + list(rows))[block:]
+
+            count += complete
+
+    if count == 0:
+        raise ValueError("No data blocks in '{}'".format(fname))
+
+    if block is None:
+        return total / count
+
+    if block >= 0 or len(blocks) < -block:
+        raise ValueError("'{}' only holds {} blocks".format(fname, count))
+
+    return blocks[0]
+
+
+class RDFFile:
+    """
+    Columns of a radial distribution function file.
+
+    The data is held as a 2-D array of shape (n_rows, n_columns), which is
+    memory-mapped when it comes from a binary file or sidecar.
+
+    param: fname: name of the file
+    param: fmt: layout, see the module documentation. Detected if not given.
+    param: cache: write a binary sidecar for text files, and use it when the
+        file is opened again
+    param: ncols: number of columns, only for "raw" files
+    param: dtype: type of the numbers, only for "raw" files
+    param: block: for "lammps" files, the block to read. All blocks are
+        averaged if not given.
+    param: rmax: only keep the rows up to this radial distance, for instance
+        the converged radius found with RDF.FindPlateau. Text files are only
+        read up to this point.
+    param: r_column: the column holding the radial distance, for rmax and
+        as the default of ReturnRDF and ReturnRDFSet. By default column 1
+        for "lammps" files, where column 0 is the row index, and column 0
+        otherwise.
+    """
+    def __init__(self, fname, fmt=None, cache=True, ncols=None, dtype=np.float64, block=None,
+                 rmax=None, r_column=None):
+
+        if fmt is None:
+            fmt = _DetectFormat(fname)
+
+        if r_column is None:
+            r_column = _R_COLUMNS.get(fmt, 0)
+
+        self.fname = fname
+        self.format = fmt
+        self.block = block
+        self.rmax = rmax
+        self.r_column = r_column
+
+        if fmt == "raw":
+            if ncols is None:
+                raise ValueError("RDFFile: 'ncols' must be given for raw binary files")
+            self.data = np.memmap(fname, dtype=dtype, mode="r").reshape(-1, ncols)
+        elif fmt == "pykbi":
+            self.data = _storage.ReadArrays(fname, mmap_mode="r")[1]["columns"]
+        elif fmt in _COMMENTS:
+            self.data = self._ReadText(cache)
+        else:
+            raise ValueError("RDFFile: unknown format '{}'".format(fmt))
+
+        if rmax is not None:
+            # a view, the rows beyond rmax of a memory-mapped file are not read
+            self.data = self.data[:np.searchsorted(self.data[:, r_column], rmax, side="right")]
+
+
+    def _Chunks(self):
+        if self.format == "lammps":
+            return [_LammpsBlocks(self.fname, self.block)]
+        return _TextChunks(self.fname, _COMMENTS[self.format], self.rmax, self.r_column)
+
+
+    def _ReadText(self, cache):
+        """
+        Parse a text file, through the binary sidecar if caching is used
+        """
+
+        if not cache:
+            return np.concatenate(list(self._Chunks()))
+
+        sidecar = self.fname + _storage.EXTENSION
+        stat = os.stat(self.fname)
+        source = {"source_size": stat.st_size, "source_mtime": stat.st_mtime_ns,
+                  "format": self.format, "block": self.block,
+                  "rmax": self.rmax, "r_column": self.r_column}
+
+        if os.path.exists(sidecar):
+            try:
+                header, arrays = _storage.ReadArrays(sidecar, mmap_mode="r")
+                if all(header.get(key) == value for key, value in source.items()):
+                    return arrays["columns"]
+            except (ValueError, KeyError):
+                pass
+
+        try:
+            _storage.WriteArrayStream(sidecar, source, "columns", self._Chunks())
+        except OSError:
+            # no write access next to the file, keep the data in memory
+            return np.concatenate(list(self._Chunks()))
+
+        return _storage.ReadArrays(sidecar, mmap_mode="r")[1]["columns"]
+
+
+    def __len__(self):
+        return self.data.shape[0]
+
+
+    def Column(self, index):
+        """
+        Return a view of a single column
+        """
+
+        return self.data[:, index]
+
+
+    def ReturnRDF(self, column, r_column=None, closed=True, npart=None, box_size=None,
+                  eqint=None, name=None):
+        """
+        Return a column as an RDF object, the arrays are views into the file data.
+        The radial distance is taken from the file's r_column if not given.
+        """
+
+        if r_column is None:
+            r_column = self.r_column
+
+        if name is None:
+            name = "{}:{}".format(os.path.basename(self.fname), column)
+
+        return _rdf.RDF(self.Column(r_column), self.Column(column), closed=closed,
+                        npart=npart, box_size=box_size, eqint=eqint, name=name)
+
+
+    def ReturnRDFSet(self, columns, r_column=None, closed=True, npart=None, box_size=None,
+                     eqint=None, names=None):
+        """
+        Return several columns as an RDFSet.
+
+        If 'columns' is a slice, the g(r) array is a view into the file data,
+        otherwise the selected columns are copied. The radial distance is
+        taken from the file's r_column if not given.
+        """
+
+        if r_column is None:
+            r_column = self.r_column
+
+        if names is None:
+            names = ["{}:{}".format(os.path.basename(self.fname), column)
+                     for column in np.arange(self.data.shape[1])[columns]]
+
+        return _rdfset.RDFSet(self.Column(r_column), self.data[:, columns].T, closed=closed,
+                              npart=npart, box_size=box_size, eqint=eqint, names=names)
+
+
+def ReadRDFFile(fname, fmt=None, cache=True, ncols=None, dtype=np.float64, block=None,
+                rmax=None, r_column=None):
+    """
+    Open a radial distribution function file, see RDFFile
+    """
+
+    return RDFFile(fname, fmt=fmt, cache=cache, ncols=ncols, dtype=dtype, block=block,
+                   rmax=rmax, r_column=r_column)
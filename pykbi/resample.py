@@ -0,0 +1,177 @@
+#! /usr/bin/env python3
+
+"""
+Resampling of radial distribution functions onto a different r-grid.
+
+RDFs from different programs, or with different bin widths and offsets,
+do not share a grid, and cannot be compared bin by bin. A ResamplePlan holds
+the stencil indices and weights that map values on a source grid onto a
+target grid, so applying it is a single gather and weighted sum, for one
+g(r) or a whole stack of them. Grids do not have to be uniform.
+
+Two methods are available:
+    - "linear": linear interpolation, as numpy.interp
+    - "cubic": local cubic Lagrange interpolation on the four nearest points
+
+Outside the source grid the end values are used, as for numpy.interp.
+
+Plans are cached on the content of the grids, so correcting many rdfs on the
+same pair of grids only builds the plan once.
+"""
+
+#pylint: disable=invalid-name
+
+import collections
+import hashlib
+import numpy as np
+import pykbi.rdf as _rdf
+
+
+__all__ = ["ResamplePlan", "ReturnPlan", "ResampleRDF", "CommonGrid"]
+
+
+## number of plans kept by ReturnPlan
+_PLAN_CACHE_SIZE = 32
+
+_plans = collections.OrderedDict()
+
+
+class ResamplePlan:
+    """
+    Interpolation from a source grid onto a target grid.
+
+    param: source: increasing grid of the values
+    param: target: grid to interpolate onto
+    param: method: "linear" or "cubic"
+
+    """
+    def __init__(self, source, target, method="linear"):
+
+        source = np.asarray(source, dtype=float)
+        target = np.asarray(target, dtype=float)
+
+        if method not in ("linear", "cubic"):
+            raise ValueError("ResamplePlan: unknown method '{}'".format(method))
+
+        if source.ndim != 1 or len(source) < 2:
+            raise ValueError("ResamplePlan: 'source' must be a 1-D grid with at least two points")
+
+        if np.any(np.diff(source) <= 0.0):
+            raise ValueError("ResamplePlan: 'source' must be strictly increasing")
+
+        self.source_size = len(source)
+        self.target = target
+        self.method = method
+        self.identity = source.shape == target.shape and np.array_equal(source, target)
+
+        if self.identity:
+            self.index = None
+            self.weights = None
+            return
+
+        # the end values are used outside the grid
+        x = np.clip(target, source[0], source[-1])
+
+        nstencil = 4 if method == "cubic" and len(source) >= 4 else 2
+
+        # index of the interval holding every point
+        interval = np.clip(np.searchsorted(source, x, side="right") - 1, 0, len(source) - 2)
+
+        first = np.clip(interval - (nstencil // 2 - 1), 0, len(source) - nstencil)
+        self.index = first[np.newaxis, :] + np.arange(nstencil)[:, np.newaxis]
+
+        # Lagrange basis on the stencil points, linear for two points
+        nodes = source[self.index]
+        self.weights = np.ones_like(nodes)
+        for j in range(nstencil):
+            for m in range(nstencil):
+                if m != j:
+                    self.weights[j] *= (x - nodes[m]) / (nodes[j] - nodes[m])
+
+
+    def Apply(self, values):
+        """
+        Interpolate values on the source grid, along the last axis.
+        values may hold several functions on the same grid.
+        """
+
+        values = np.asarray(values)
+
+        if values.shape[-1] != self.source_size:
+            raise ValueError("ResamplePlan: values do not match the source grid")
+
+        if self.identity:
+            return values.copy()
+
+        return np.sum(self.weights * values[..., self.index], axis=-2)
+
+
+def _Digest(array):
+    array = np.ascontiguousarray(array, dtype=float)
+    return hashlib.blake2b(array.data, digest_size=16).digest() + str(array.shape).encode()
+
+
+def ReturnPlan(source, target, method="linear"):
+    """
+    Return a ResamplePlan, reusing a cached plan for the same grids
+    """
+
+    key = (_Digest(source), _Digest(target), method)
+
+    if key in _plans:
+        _plans.move_to_end(key)
+        return _plans[key]
+
+    plan = ResamplePlan(source, target, method)
+
+    _plans[key] = plan
+    while len(_plans) > _PLAN_CACHE_SIZE:
+        _plans.popitem(last=False)
+
+    return plan
+
+
+def CommonGrid(grids):
+    """
+    Return a grid that all grids can be resampled onto.
+
+    This is the part of the coarsest grid, judged by the median bin width,
+    that lies inside the range covered by all grids. Raises a ValueError if
+    the grids do not overlap.
+    """
+
+    lower = max(grid[0] for grid in grids)
+    upper = min(grid[-1] for grid in grids)
+
+    if lower >= upper:
+        raise ValueError("CommonGrid: the grids do not overlap")
+
+    # the first of the coarsest grids, ignoring differences from rounding
+    widths = [np.median(np.diff(grid)) for grid in grids]
+    coarsest = next(grid for grid, width in zip(grids, widths)
+                    if width >= max(widths) * (1.0 - 1e-6))
+
+    # a small tolerance keeps end points which differ by rounding only
+    tolerance = 1e-9 * max(abs(lower), abs(upper), 1.0)
+    mask = (coarsest >= lower - tolerance) & (coarsest <= upper + tolerance)
+
+    if mask.all():
+        return coarsest
+
+    return coarsest[mask]
+
+
+def ResampleRDF(rdf, target, method="linear"):
+    """
+    Return a new rdf with the g(r) resampled onto the target grid
+    """
+
+    plan = ReturnPlan(rdf.r, target, method)
+
+    return _rdf.RDF(np.array(target, dtype=float),
+                    plan.Apply(rdf.gr),
+                    kernel=rdf.integral_type,
+                    npart=rdf.npart,
+                    box_size=rdf.lt,
+                    eqint=rdf.eqint,
+                    name=rdf.name)
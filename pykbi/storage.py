@@ -0,0 +1,268 @@
+#! /usr/bin/env python3
+
+"""
+Binary storage of RDF objects.
+
+The file starts with a short magic string and the length of a JSON header,
+followed by the header and the raw array buffers. The header holds the
+metadata of every rdf (npart, lt, eqint, integral_type, integral_value and
+name), and the dtype, shape and file offset of its arrays. The buffers are
+aligned, so they can be memory-mapped directly. Loading with a mmap_mode
+opens even large files instantly, and pages the data in when it is used.
+
+A file holds any number of rdfs. Arrays shared between rdfs, such as the
+common radial grid of an RDFSet, are only written once.
+"""
+
+#pylint: disable=invalid-name
+
+import json
+import struct
+import numpy as np
+import pykbi.rdf as _rdf
+
+
+__all__ = ["SaveRDF", "LoadRDF", "SaveRDFs", "LoadRDFs"]
+
+
+MAGIC = b"PYKBI001"
+EXTENSION = ".pykbi"
+
+## alignment of the array buffers in the file
+_ALIGN = 64
+
+
+def _ToJSON(o):
+    """
+    Convert numpy types in the metadata to python types for the json header
+    """
+    if isinstance(o, np.integer):
+        return int(o)
+    if isinstance(o, np.floating):
+        return float(o)
+    if isinstance(o, np.bool_):
+        return bool(o)
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    raise TypeError("Cannot store object of type {}".format(type(o)))
+
+
+def _Padding(position):
+    return (-position) % _ALIGN
+
+
+def _FileName(fname):
+    if not fname.endswith(EXTENSION):
+        fname += EXTENSION
+    return fname
+
+
+def WriteArrays(fname, header, arrays):
+    """
+    Write a header dictionary and a dictionary of named arrays to a file.
+
+    The header is extended with an "arrays" entry describing where every
+    array is stored. Used for RDF objects, and by other modules storing
+    numpy data in the same layout.
+    """
+
+    names = list(arrays.keys())
+    descriptions = {}
+
+    # first pass to find the size of the header, offsets are filled in below
+    for name in names:
+        array = np.ascontiguousarray(arrays[name])
+        arrays[name] = array
+        descriptions[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": 0}
+
+    header = dict(header)
+    header["arrays"] = descriptions
+
+    # the offsets change the header length, so iterate until it is stable
+    header_length = 0
+    while True:
+        start = len(MAGIC) + 8 + header_length
+        position = start + _Padding(start)
+        for name in names:
+            descriptions[name]["offset"] = position
+            position += arrays[name].nbytes
+            position += _Padding(position)
+        encoded = json.dumps(header, default=_ToJSON).encode("utf-8")
+        if len(encoded) <= header_length:
+            break
+        header_length = len(encoded) + 64
+
+    encoded = encoded.ljust(header_length)
+
+    with open(fname, "wb") as outfile:
+        outfile.write(MAGIC)
+        outfile.write(struct.pack("<Q", header_length))
+        outfile.write(encoded)
+        for name in names:
+            outfile.write(b"\0" * (descriptions[name]["offset"] - outfile.tell()))
+            outfile.write(arrays[name].tobytes())
+
+
+def WriteArrayStream(fname, header, name, chunks, reserve=16384):
+    """
+    Write a single 2-D array to a file, one chunk of rows at a time.
+
+    The chunks are 2-D arrays with the same number of columns and dtype. The
+    full array is never held in memory, so this can convert files larger than
+    the memory. Space for the header is reserved up front and filled in once
+    the number of rows is known. The file is read with ReadArrays.
+    """
+
+    start = len(MAGIC) + 8 + reserve
+    offset = start + _Padding(start)
+
+    nrows = 0
+    ncols = None
+    dtype = None
+
+    with open(fname, "wb") as outfile:
+        outfile.write(b"\0" * offset)
+
+        for chunk in chunks:
+            chunk = np.ascontiguousarray(chunk)
+            if ncols is None:
+                ncols = chunk.shape[1]
+                dtype = chunk.dtype
+            elif chunk.shape[1] != ncols:
+                raise ValueError("All chunks must have the same number of columns")
+            outfile.write(chunk.astype(dtype, copy=False).tobytes())
+            nrows += chunk.shape[0]
+
+        if ncols is None:
+            raise ValueError("No data to write to '{}'".format(fname))
+
+        header = dict(header)
+        header["arrays"] = {name: {"dtype": dtype.str, "shape": [nrows, ncols], "offset": offset}}
+        encoded = json.dumps(header, default=_ToJSON).encode("utf-8")
+        if len(encoded) > reserve:
+            raise ValueError("Header too large for the reserved space")
+
+        outfile.seek(0)
+        outfile.write(MAGIC)
+        outfile.write(struct.pack("<Q", reserve))
+        outfile.write(encoded.ljust(reserve))
+
+
+def ReadArrays(fname, mmap_mode=None):
+    """
+    Read a file written with WriteArrays or WriteArrayStream. Returns the
+    header and a dictionary of arrays, memory-mapped if mmap_mode is given
+    ('r', 'r+' or 'c').
+    """
+
+    with open(fname, "rb") as infile:
+        if infile.read(len(MAGIC)) != MAGIC:
+            raise ValueError("'{}' is not a pykbi binary file".format(fname))
+        header_length = struct.unpack("<Q", infile.read(8))[0]
+        header = json.loads(infile.read(header_length).decode("utf-8"))
+
+    arrays = {}
+    for name, description in header.pop("arrays").items():
+        dtype = np.dtype(description["dtype"])
+        shape = tuple(description["shape"])
+        if mmap_mode is None:
+            arrays[name] = np.fromfile(fname, dtype=dtype, count=int(np.prod(shape)),
+                                       offset=description["offset"]).reshape(shape)
+        elif int(np.prod(shape)) == 0:
+            arrays[name] = np.zeros(shape, dtype=dtype)
+        else:
+            arrays[name] = np.memmap(fname, dtype=dtype, mode=mmap_mode,
+                                     offset=description["offset"], shape=shape)
+
+    return header, arrays
+
+
+def SaveRDFs(rdfs, fname):
+    """
+    Save a list of RDF objects to a single binary file.
+    """
+
+    fname = _FileName(fname)
+
+    arrays = {}
+    stored = {}
+    entries = []
+
+    def add(array):
+        # arrays shared between rdfs are only stored once
+        key = id(array)
+        if key not in stored:
+            stored[key] = "a{}".format(len(stored))
+            arrays[stored[key]] = array
+        return stored[key]
+
+    for rdf in rdfs:
+        entry = {"name": rdf.name,
+                 "npart": rdf.npart,
+                 "lt": rdf.lt,
+                 "eqint": rdf.eqint,
+                 "compact": rdf.compact,
+                 "integral_type": rdf.integral_type,
+                 "integral_value": rdf.integral_value,
+                 "r": add(rdf.r),
+                 "gr": add(rdf.gr),
+                 "kbi": None if rdf.kbi is None else add(rdf.kbi)}
+        entries.append(entry)
+
+    WriteArrays(fname, {"rdfs": entries}, arrays)
+
+
+def LoadRDFs(fname, mmap_mode=None):
+    """
+    Load all RDF objects from a binary file.
+
+    With mmap_mode ('r', 'r+' or 'c') the arrays are memory-mapped from the
+    file instead of being read into memory.
+    """
+
+    header, arrays = ReadArrays(_FileName(fname), mmap_mode=mmap_mode)
+
+    rdfs = []
+    for entry in header["rdfs"]:
+        rdf = _rdf.RDF(arrays[entry["r"]], arrays[entry["gr"]],
+                       npart=entry["npart"],
+                       box_size=entry["lt"],
+                       eqint=entry["eqint"],
+                       name=entry["name"],
+                       # files written before compact was stored hold full rdfs
+                       compact=entry.get("compact", False),
+                       kernel=entry["integral_type"])
+
+        if entry["kbi"] is not None:
+            rdf.kbi = arrays[entry["kbi"]]
+            rdf.rint = rdf.r[1:]
+
+        if entry["integral_value"] is not None:
+            rdf.integral_value = entry["integral_value"]
+            if "value_limit" in rdf.integral_value:
+                rdf.integral_value["value_limit"] = np.array(rdf.integral_value["value_limit"])
+
+        rdfs.append(rdf)
+
+    return rdfs
+
+
+def SaveRDF(rdf, fname):
+    """
+    Save a single RDF object to a binary file.
+    """
+
+    SaveRDFs([rdf], fname)
+
+
+def LoadRDF(fname, mmap_mode=None):
+    """
+    Load a single RDF object from a binary file, see LoadRDFs.
+    """
+
+    rdfs = LoadRDFs(fname, mmap_mode=mmap_mode)
+
+    if len(rdfs) != 1:
+        raise ValueError("'{}' holds {} rdfs, use LoadRDFs".format(fname, len(rdfs)))
+
+    return rdfs[0]
@@ -0,0 +1,131 @@
+#! /usr/bin/env python3
+
+"""
+Statistical uncertainty of Kirkwood-Buff integrals.
+
+The std_error from FindValues is the error of the fitted slope, and says
+nothing about the sampling noise in g(r). Here the g(r) is instead given as
+independent block estimates, for example several columns from separate parts
+of a trajectory, or the blocks of an RDFAccumulator. From these we compute
+
+    - the block average: the KBI of every block, with its standard error,
+    - the bootstrap: blocks are resampled with replacement, and the KBI of
+      every resampled average g(r) gives a confidence interval.
+
+The resampled g(r) are integrated as 2-D batches through RDFSet, so there is
+no python loop over the resamples. The random number generator is seeded, so
+the results can be reproduced.
+"""
+
+#pylint: disable=invalid-name
+#pylint: disable=too-many-arguments
+#pylint: disable=too-many-locals
+
+import numpy as np
+import pykbi.rdfset as _rdfset
+import pykbi.accumulator as _accumulator
+
+
+__all__ = ["KBIUncertainty"]
+
+
+def _ReadBlocks(blocks, r):
+    """
+    Return the radial grid and the (n_blocks, n_bins) g(r) array from the input
+    """
+
+    if isinstance(blocks, _rdfset.RDFSet):
+        return blocks.r, blocks.gr
+
+    if isinstance(blocks, _accumulator.RDFAccumulator):
+        return blocks.r, blocks.ReturnBlocks()
+
+    if r is None:
+        raise ValueError("KBIUncertainty: 'r' must be given together with a g(r) array")
+
+    return r, np.atleast_2d(blocks)
+
+
+def _KBI(r, gr, closed, position, correction, npart, box_size, eqint):
+    """
+    Integrate and read out a batch of g(r), returns one KBI per row
+    """
+
+    rdfset = _rdfset.RDFSet(r, gr, closed=closed, npart=npart, box_size=box_size, eqint=eqint)
+
+    if correction == "vdv":
+        rdfset = rdfset.CorrectVanDerVegt()
+
+    rdfset.Integrate()
+    rdfset.FindValues(position)
+
+    return rdfset.ReturnKBI()
+
+
+def KBIUncertainty(blocks, r=None, closed=True, position=None, resamples=1000, seed=None,
+                   confidence=0.95, correction=None, npart=None, box_size=None, eqint=None,
+                   batch=256):
+    """
+    Block average and bootstrap uncertainty of the KBI.
+
+    param: blocks: g(r) of the blocks, either an array of shape (n_blocks, n_bins)
+        together with 'r', an RDFSet, or an RDFAccumulator with a block size.
+    param: closed: integrate as closed or open system
+    param: position: readout position, as for RDF.FindValues
+    param: resamples: number of bootstrap resamples
+    param: seed: seed for the random number generator
+    param: confidence: width of the bootstrap confidence interval
+    param: correction: None or "vdv", to apply the van der Vegt correction
+        to every average before it is integrated. Needs npart, box_size and eqint.
+    param: batch: number of resamples integrated together
+
+    Returns a dictionary with the KBI of the average g(r), the block average
+    and its standard error, and the bootstrap mean, standard deviation and
+    confidence interval.
+    """
+
+    r, gr = _ReadBlocks(blocks, r)
+
+    if gr is None or gr.shape[0] < 2:
+        raise ValueError("KBIUncertainty: need at least two blocks")
+
+    nblocks = gr.shape[0]
+
+    def kbi(batch_gr):
+        return _KBI(r, batch_gr, closed, position, correction, npart, box_size, eqint)
+
+    block_values = kbi(gr)
+    if block_values is None:
+        print("Could not read out the KBI, check the readout position.")
+        return None
+
+    result = {}
+    result["G"] = kbi(gr.mean(axis=0)[np.newaxis, :])[0]
+    result["nblocks"] = nblocks
+    result["block_values"] = block_values
+    result["block_mean"] = block_values.mean()
+    result["block_std_error"] = block_values.std(ddof=1) / np.sqrt(nblocks)
+
+    # every resample is a weighted average of the blocks, where the weight is
+    # the number of times the block was drawn
+    rng = np.random.default_rng(seed)
+
+    values = np.empty(resamples)
+    for start in range(0, resamples, batch):
+        stop = min(start + batch, resamples)
+        draws = rng.integers(0, nblocks, size=(stop - start, nblocks))
+        weights = np.zeros((stop - start, nblocks))
+        np.add.at(weights, (np.arange(stop - start)[:, np.newaxis], draws), 1.0 / nblocks)
+        values[start:stop] = kbi(weights @ gr)
+
+    tail = 0.5 * (1.0 - confidence) * 100.0
+
+    result["resamples"] = resamples
+    result["seed"] = seed
+    result["bootstrap_values"] = values
+    result["bootstrap_mean"] = values.mean()
+    result["bootstrap_std"] = values.std(ddof=1)
+    result["confidence"] = confidence
+    result["confidence_interval"] = tuple(np.percentile(values, [tail, 100.0 - tail]))
+
+    return result
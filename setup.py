@@ -35,9 +35,11 @@ setup(
         long_description_content_type="text/markdown",
         keywords="kirkwood-buff integral",
         install_requires=get_requirements(),
+        extras_require={"plot": ["matplotlib>=2.2.2"]},
         author="Sondre K. Schnell",
         author_email="sondresc@gmail.com",
         packages=["pykbi"],
+        entry_points={"console_scripts": ["pykbi=pykbi.cli:main"]},
         test_suite="nose.collector",
         tests_require=["nose"],
         )
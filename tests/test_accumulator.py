@@ -0,0 +1,83 @@
+import unittest
+import numpy as np
+import pykbi
+
+
+def brute_force(pos_a, pos_b, lt, edges, same):
+    delta = pos_b[np.newaxis, :, :] - pos_a[:, np.newaxis, :]
+    delta -= lt * np.round(delta / lt)
+    dist = np.sqrt((delta**2).sum(axis=-1))
+    if same:
+        dist = dist[np.triu_indices(len(pos_a), k=1)]
+    counts = np.histogram(dist.ravel(), bins=edges)[0]
+    shell = 4.0 * np.pi / 3.0 * (edges[1:]**3 - edges[:-1]**3)
+    if same:
+        norm = 2.0 * lt**3 / (len(pos_a) * (len(pos_a) - 1))
+    else:
+        norm = lt**3 / (len(pos_a) * len(pos_b))
+    return norm * counts / shell
+
+
+class TestRDFAccumulator(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = np.random.default_rng(42)
+        self.lt = 12.0
+        self.acc = pykbi.RDFAccumulator(rmax=3.5, nbins=35)
+
+    def test_cells_equal_brute_force(self):
+        pos = self.rng.random((400, 3)) * self.lt
+        self.acc.AddFrame(pos, self.lt)
+        rdf = self.acc.ReturnRDF()
+        np.testing.assert_allclose(rdf.gr, brute_force(pos, pos, self.lt, self.acc.edges, True))
+
+    def test_unlike_pairs(self):
+        pos_a = self.rng.random((200, 3)) * self.lt
+        pos_b = self.rng.random((150, 3)) * self.lt
+        self.acc.AddFrame(pos_a, self.lt, pos_b)
+        rdf = self.acc.ReturnRDF()
+        self.assertFalse(rdf.eqint)
+        np.testing.assert_allclose(rdf.gr, brute_force(pos_a, pos_b, self.lt, self.acc.edges, False))
+
+    def test_small_box(self):
+        acc = pykbi.RDFAccumulator(rmax=2.5, nbins=10)
+        pos = self.rng.random((100, 3)) * 6.0
+        acc.AddFrame(pos, 6.0)
+        np.testing.assert_allclose(acc.ReturnRDF().gr, brute_force(pos, pos, 6.0, acc.edges, True))
+
+    def test_generator(self):
+        frames = ((self.rng.random((300, 3)) * self.lt, self.lt) for _ in range(5))
+        self.acc.AddFrames(frames)
+        rdf = self.acc.ReturnRDF(name="ideal")
+        self.assertEqual(self.acc.nframes, 5)
+        self.assertEqual(rdf.npart, 300)
+        self.assertAlmostEqual(rdf.lt, self.lt)
+        self.assertTrue(rdf.eqint)
+        # ideal gas, g(r) close to one away from the origin
+        self.assertAlmostEqual(rdf.gr[10:].mean(), 1.0, places=1)
+
+    def test_rmax_too_large(self):
+        self.assertRaises(ValueError, lambda: self.acc.AddFrame(np.zeros((2, 3)), 5.0))
+
+    def test_merge_blocks(self):
+        frames = [(self.rng.random((100, 3)) * self.lt, self.lt) for _ in range(4)]
+        serial = pykbi.RDFAccumulator(3.5, 35, block_size=2)
+        serial.AddFrames(frames)
+        merged = pykbi.RDFAccumulator(3.5, 35, block_size=2)
+        for frame in frames:
+            single = pykbi.RDFAccumulator(3.5, 35)
+            single.AddFrame(*frame)
+            merged.Merge(single)
+        np.testing.assert_allclose(merged.ReturnBlocks(), serial.ReturnBlocks())
+        # three frames without blocks do not fit in a block of two
+        self.acc.AddFrames(frames[:3])
+        self.assertRaises(ValueError, lambda: merged.Merge(self.acc))
+        self.assertEqual(merged.nframes, 4)
+        self.assertRaises(ValueError, lambda: pykbi.RDFAccumulator(3.5, 35, block_size=3).Merge(serial))
+
+    def tearDown(self):
+        self.acc = None
+
+
+if __name__ == "__main__":
+    unittest.main()
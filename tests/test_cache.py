@@ -0,0 +1,88 @@
+import tempfile
+import unittest
+import numpy as np
+import pykbi
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        self.r = np.linspace(0.01, 20.0, 2000)
+        self.gr = pykbi.odf(self.r, 2.0)
+
+    def tearDown(self):
+        pykbi.DisableCache()
+
+    def test_disabled(self):
+        self.assertIsNone(pykbi.CacheInfo())
+        rdf = pykbi.RDF(self.r, self.gr)
+        rdf.Integrate()
+        self.assertIsNotNone(rdf.kbi)
+
+    def test_memory(self):
+        pykbi.EnableCache(maxsize=8)
+        results = []
+        for _ in range(2):
+            rdf = pykbi.RDF(self.r, self.gr, npart=1000, box_size=30.0, eqint=True)
+            rdf = pykbi.CorrectVanDerVegt(rdf)
+            rdf.Integrate()
+            rdf.FindValues((0.1, 0.2))
+            results.append(rdf)
+        info = pykbi.CacheInfo()
+        self.assertEqual(info["misses"], 3)
+        self.assertEqual(info["hits"], 3)
+        np.testing.assert_array_equal(results[0].gr, results[1].gr)
+        np.testing.assert_array_equal(results[0].kbi, results[1].kbi)
+        self.assertEqual(results[0].ReturnKBI(), results[1].ReturnKBI())
+        # the cache hands out copies
+        results[1].kbi[:] = 0.0
+        rdf = pykbi.RDF(results[0].r, results[0].gr)
+        rdf.Integrate()
+        np.testing.assert_array_equal(rdf.kbi, results[0].kbi)
+
+    def test_kernel_registered_again(self):
+        pykbi.EnableCache()
+        self.addCleanup(pykbi.UnregisterKernel, "k")
+        results = []
+        for terms in ([(0, 1.0)], [(0, 1.0), (1, -1.0)]):
+            pykbi.RegisterKernel(pykbi.Kernel("k", terms))
+            rdf = pykbi.RDF(self.r, self.gr, kernel="k")
+            rdf.Integrate()
+            results.append(rdf.kbi)
+        pykbi.DisableCache()
+        rdf = pykbi.RDF(self.r, self.gr, kernel="k")
+        rdf.Integrate()
+        np.testing.assert_array_equal(results[1], rdf.kbi)
+        self.assertFalse(np.array_equal(results[0], results[1]))
+
+    def test_lru(self):
+        pykbi.EnableCache(maxsize=1)
+        for scale in (1.0, 2.0, 1.0):
+            pykbi.RDF(self.r, scale * self.gr).Integrate()
+        self.assertEqual(pykbi.CacheInfo()["hits"], 0)
+        self.assertEqual(pykbi.CacheInfo()["size"], 1)
+
+    def test_disk(self):
+        with tempfile.TemporaryDirectory() as directory:
+            pykbi.EnableCache(directory=directory)
+            rdf = pykbi.RDF(self.r, self.gr)
+            rdf.Integrate()
+            rdf.FindValues((0.1, 0.2))
+            # a new cache only finds the results on disk
+            pykbi.EnableCache(directory=directory)
+            cached = pykbi.RDF(self.r, self.gr)
+            cached.Integrate()
+            cached.FindValues((0.1, 0.2))
+            self.assertEqual(pykbi.CacheInfo()["hits"], 2)
+            np.testing.assert_array_equal(cached.kbi, rdf.kbi)
+            self.assertAlmostEqual(cached.ReturnKBI(), rdf.ReturnKBI())
+            np.testing.assert_array_equal(cached.integral_value["value_limit"],
+                                          rdf.integral_value["value_limit"])
+            pykbi.ClearCache()
+            pykbi.EnableCache(directory=directory)
+            pykbi.RDF(self.r, self.gr).Integrate()
+            self.assertEqual(pykbi.CacheInfo()["hits"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pykbi
+import pykbi.cli
+
+
+class TestCLI(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        r = np.linspace(0.01, 20.0, 500)
+        np.savetxt(self.fname("rdf1.txt"), np.column_stack([r, pykbi.odf(r, 2.0), pykbi.odf(r, 3.0)]))
+        np.savetxt(self.fname("rdf2.txt"), np.column_stack([r, pykbi.odf(r, 2.1), pykbi.odf(r, 3.1)]))
+        manifest = {
+            "defaults": {"npart": 1200, "box_size": 40.0, "position": [0.1, 0.2]},
+            "jobs": [
+                {"name": "a", "file": "rdf1.txt", "column": 1, "eqint": True, "correction": "vdv"},
+                {"name": "b", "file": "rdf1.txt", "column": 2, "eqint": False},
+                {"name": "c", "file": "rdf1.txt", "column": 1, "correction": "invn",
+                 "partner": {"file": "rdf2.txt", "column": 1, "npart": 2400}},
+                {"name": "d", "file": "rdf1.txt", "column": 1, "position": None},
+            ]}
+        with open(self.fname("manifest.json"), "w") as outfile:
+            json.dump(manifest, outfile)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def fname(self, name):
+        return os.path.join(self.tmpdir.name, name)
+
+    def test_run(self):
+        output = self.fname("results.csv")
+        code = pykbi.cli.main([self.fname("manifest.json"), "-o", output])
+        # job 'd' is a closed system without a readout window
+        self.assertEqual(code, 1)
+        with open(output) as infile:
+            rows = list(csv.DictReader(infile))
+        self.assertEqual([row["name"] for row in rows], ["a", "b", "c", "d"])
+        self.assertEqual([row["status"] for row in rows], ["ok", "ok", "ok", "failed"])
+
+        rdf = pykbi.RDF(np.loadtxt(self.fname("rdf1.txt"))[:, 0],
+                        np.loadtxt(self.fname("rdf1.txt"))[:, 2])
+        rdf.Integrate()
+        rdf.FindValues((0.1, 0.2))
+        self.assertAlmostEqual(float(rows[1]["G"]), rdf.ReturnKBI())
+
+        # nothing changed, only the failed job runs again
+        with mock.patch.object(pykbi.cli._parallel, "ProcessRDFs",
+                               wraps=pykbi.cli._parallel.ProcessRDFs) as process:
+            pykbi.cli.main([self.fname("manifest.json"), "-o", output])
+            self.assertEqual(process.call_count, 1)
+            self.assertEqual(len(process.call_args[0][0]), 1)
+
+    def test_open_vdv(self):
+        manifest = {"jobs": [{"name": "open", "file": "rdf1.txt", "column": 1, "npart": 1200,
+                              "box_size": 40.0, "eqint": True, "closed": False,
+                              "correction": "vdv", "position": 10.0}]}
+        with open(self.fname("open.json"), "w") as outfile:
+            json.dump(manifest, outfile)
+        output = self.fname("open.csv")
+        self.assertEqual(pykbi.cli.main([self.fname("open.json"), "-o", output]), 0)
+        with open(output) as infile:
+            row = next(csv.DictReader(infile))
+        self.assertEqual(row["status"], "ok")
+        self.assertEqual(row["integral_type"], "open")
+
+        table = np.loadtxt(self.fname("rdf1.txt"))
+        rdf = pykbi.CorrectVanDerVegt(pykbi.RDF(table[:, 0], table[:, 1], closed=False,
+                                                npart=1200, box_size=40.0, eqint=True))
+        rdf.Integrate()
+        rdf.FindValues((10.0,))
+        self.assertAlmostEqual(float(row["G"]), rdf.ReturnKBI())
+
+    def test_binary(self):
+        output = self.fname("results.pykbi")
+        pykbi.cli.main([self.fname("manifest.json"), "-o", output, "--workers", "2"])
+        header, arrays = pykbi.storage.ReadArrays(output)
+        self.assertEqual(header["table"]["name"], ["a", "b", "c", "d"])
+        self.assertTrue(np.isnan(arrays["G"][3]))
+        self.assertTrue(np.all(np.isfinite(arrays["G"][:3])))
+
+
+if __name__ == "__main__":
+    unittest.main()
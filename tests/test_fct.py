@@ -0,0 +1,99 @@
+import unittest
+import numpy as np
+import pykbi
+
+
+class TestKBdataNcomp(unittest.TestCase):
+
+    def setUp(self):
+        self.G3 = np.array([[-10.0, -5.0, -3.0],
+                            [-5.0, -20.0, -4.0],
+                            [-3.0, -4.0, -15.0]])
+        self.c3 = np.array([0.02, 0.01, 0.015])
+
+    def test_two_components(self):
+        kb2 = pykbi.KBdata2comp(-10.0, -20.0, -5.0, 0.02, 0.01)
+        kb2.CalculateProperties()
+        kbn = pykbi.KBdataNcomp([[-10.0, -5.0], [-5.0, -20.0]], [0.02, 0.01])
+        kbn.CalculateProperties()
+        self.assertAlmostEqual(kbn.gamma[0, 0], kb2.gamma)
+        self.assertAlmostEqual(kbn.pmv[0], kb2.pmv1)
+        self.assertAlmostEqual(kbn.pmv[1], kb2.pmv2)
+        self.assertAlmostEqual(kbn.isothermal_compress, kb2.isothermal_compress)
+        # Gibbs-Duhem, x1 dmu1/dx1 = x2 dmu2/dx2
+        self.assertAlmostEqual(kbn.x[0] * kbn.dmudx[0, 0] / kbn.x[1], kb2.dmu2dx2)
+
+    def test_three_components(self):
+        G = self.G3
+        kb3 = pykbi.KBdata3comp(G[0, 0], G[1, 1], G[2, 2], G[0, 1], G[0, 2], G[1, 2], *self.c3)
+        kb3.CalculateProperties()
+        kbn = pykbi.KBdataNcomp(G, self.c3)
+        kbn.CalculateProperties()
+        np.testing.assert_allclose(kbn.gamma.ravel(),
+                                   [kb3.gamma0, kb3.gamma1, kb3.gamma2, kb3.gamma3])
+        np.testing.assert_allclose(kbn.pmv, [kb3.pmv0, kb3.pmv1, kb3.pmv2])
+        self.assertAlmostEqual(kbn.isothermal_compress, kb3.isothermal_compress)
+        np.testing.assert_allclose(kbn.B, kb3.B)
+
+    def test_stack(self):
+        x1 = np.linspace(0.1, 0.9, 7)
+        c = np.stack([0.03 * x1, 0.03 * (1.0 - x1), np.full(7, 0.01)], axis=-1)
+        G = np.broadcast_to(self.G3, (7, 3, 3))
+        kbn = pykbi.KBdataNcomp(G, c)
+        kbn.CalculateProperties()
+        self.assertEqual(kbn.gamma.shape, (7, 2, 2))
+        for i in range(7):
+            single = pykbi.KBdataNcomp(self.G3, c[i])
+            single.CalculateProperties()
+            np.testing.assert_allclose(kbn.gamma[i], single.gamma)
+            np.testing.assert_allclose(kbn.pmv[i], single.pmv)
+
+    def test_wrong_shape(self):
+        self.assertRaises(ValueError, lambda: pykbi.KBdataNcomp(np.zeros((3, 3)), np.ones(2)))
+
+
+class TestKBdata3comp(unittest.TestCase):
+
+    def test_ideal(self):
+        # equal KBIs for all pairs make an ideal mixture, D_ij = 0
+        kb = pykbi.KBdata3comp(-10.0, -10.0, -10.0, -10.0, -10.0, -10.0, 0.02, 0.01, 0.015)
+        kb.CalculateProperties()
+        np.testing.assert_allclose([kb.gamma0, kb.gamma1, kb.gamma2, kb.gamma3],
+                                   [1.0, 0.0, 0.0, 1.0], atol=1e-12)
+        np.testing.assert_allclose([kb.pmv0, kb.pmv1, kb.pmv2], 1.0 / 0.045)
+        self.assertAlmostEqual(kb.isothermal_compress, (1.0 - 0.045 * 10.0) / 0.045)
+
+
+class TestKBdataArrays(unittest.TestCase):
+
+    def test_two_components(self):
+        x1 = np.linspace(0.1, 0.9, 9)
+        G11 = np.linspace(-12.0, -8.0, 9)
+        kb = pykbi.KBdata2comp(G11, -20.0, [-5.0], 0.03 * x1, 0.03 * (1.0 - x1))
+        kb.CalculateProperties()
+        properties = kb.ReturnProperties()
+        self.assertEqual(properties["gamma"].shape, (9,))
+        for i in range(9):
+            single = pykbi.KBdata2comp(G11[i], -20.0, -5.0, 0.03 * x1[i], 0.03 * (1.0 - x1[i]))
+            single.CalculateProperties()
+            for key, value in single.ReturnProperties().items():
+                self.assertAlmostEqual(properties[key][i], value)
+
+    def test_three_components(self):
+        # a grid of compositions, (5, 4) state points
+        c1 = np.linspace(0.005, 0.02, 5)[:, np.newaxis]
+        c2 = np.linspace(0.005, 0.02, 4)[np.newaxis, :]
+        kb = pykbi.KBdata3comp(-10.0, -20.0, -15.0, -5.0, -3.0, -4.0, c1, c2, 0.01)
+        kb.CalculateProperties()
+        self.assertEqual(kb.B.shape, (5, 4, 3, 3))
+        self.assertEqual(kb.ReturnProperties()["gamma0"].shape, (5, 4))
+        single = pykbi.KBdata3comp(-10.0, -20.0, -15.0, -5.0, -3.0, -4.0, c1[2, 0], c2[0, 3], 0.01)
+        single.CalculateProperties()
+        np.testing.assert_allclose(kb.B[2, 3], single.B)
+        self.assertAlmostEqual(kb.pmv1[2, 3], single.pmv1)
+        self.assertAlmostEqual(kb.gamma2[2, 3], single.gamma2)
+        kb.PrintProperties()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+import numpy as np
+import pykbi
+
+
+class TestFourier(unittest.TestCase):
+
+    def setUp(self):
+        # a gaussian h(r) has the transform A (2 pi s^2)^(3/2) exp(-k^2 s^2 / 2)
+        self.r = np.arange(0.005, 20.0, 0.01)
+        self.amplitude = -0.5
+        self.gr = 1.0 + self.amplitude * np.exp(-self.r**2 / 2.0)
+        self.G = self.amplitude * (2.0 * np.pi)**1.5
+
+    def test_transform(self):
+        k, hk = pykbi.FourierTransform(self.r, self.gr - 1.0, window=None)
+        self.assertEqual(k[0], 0.0)
+        mask = k < 5.0
+        np.testing.assert_allclose(hk[mask], self.G * np.exp(-k[mask]**2 / 2.0), atol=1e-4)
+
+    def test_nonuniform_grid(self):
+        r = np.sort(np.concatenate([self.r[::2], [0.1234, 3.3333]]))
+        gr = 1.0 + self.amplitude * np.exp(-r**2 / 2.0)
+        k, hk = pykbi.FourierTransform(r, gr - 1.0, window=None, pad=4)
+        np.testing.assert_allclose(hk[k < 5.0], self.G * np.exp(-k[k < 5.0]**2 / 2.0), atol=1e-3)
+
+    def test_kbi(self):
+        rdf = pykbi.RDF(self.r, self.gr, npart=1000, box_size=40.0, eqint=True)
+        result = pykbi.FourierKBI(rdf, window=None)
+        self.assertAlmostEqual(result["G"], self.G, delta=1e-2 * abs(self.G))
+        k, sk = pykbi.StructureFactor(rdf, window=None)
+        self.assertAlmostEqual(sk[0], 1.0 + 1000 / 40.0**3 * self.G, places=4)
+
+    def test_batched(self):
+        rdfset = pykbi.RDFSet(self.r, np.stack([self.gr, 2.0 * self.gr - 1.0]),
+                              npart=[1000, 1000], box_size=40.0, eqint=[True, False])
+        result = pykbi.FourierKBI(rdfset)
+        single = pykbi.FourierKBI(pykbi.RDF(self.r, self.gr))
+        self.assertEqual(result["G"].shape, (2,))
+        self.assertAlmostEqual(result["G"][0], single["G"])
+        self.assertAlmostEqual(result["G"][1], 2.0 * single["G"])
+        k, sk = pykbi.StructureFactor(rdfset)
+        self.assertEqual(sk.shape, (2, len(k)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import numpy as np
+import scipy.integrate
+import pykbi
+
+
+class TestCorrectFiniteSize(unittest.TestCase):
+
+    def setUp(self):
+        self.ginf = lambda r: pykbi.odf(r, 2.0)
+        self.slope = lambda r: np.exp(-r)
+        self.sizes = [500, 1000, 2000, 4000]
+        self.rdfs = []
+        for k, npart in enumerate(self.sizes):
+            # different ranges and resolutions for every system
+            r = np.linspace(0.01, 10.0 + k, 1000 + 100 * k)
+            gr = self.ginf(r) + self.slope(r) * 100.0 / npart
+            self.rdfs.append(pykbi.RDF(r, gr, npart=npart, box_size=npart**(1.0/3.0),
+                                       eqint=True, name="rdf"))
+
+    def test_inverse_n(self):
+        rdf = pykbi.CorrectFiniteSize(self.rdfs, weights=[1.0, 2.0, 3.0, 4.0])
+        np.testing.assert_array_equal(rdf.r, self.rdfs[0].r)
+        # linear interpolation error of the finer grids only
+        np.testing.assert_allclose(rdf.gr, self.ginf(rdf.r), atol=1e-3)
+        self.assertEqual(rdf.npart, 4000)
+        self.assertTrue(rdf.eqint)
+
+    def test_inverse_l(self):
+        for rdf in self.rdfs:
+            rdf.gr = self.ginf(rdf.r) + self.slope(rdf.r) / rdf.lt
+        rdf = pykbi.CorrectFiniteSize(self.rdfs, variable="L")
+        np.testing.assert_allclose(rdf.gr, self.ginf(rdf.r), atol=1e-3)
+
+    def test_invalid(self):
+        self.assertFalse(pykbi.CorrectFiniteSize(self.rdfs[:1]))
+        self.assertFalse(pykbi.CorrectFiniteSize([self.rdfs[0], self.rdfs[0]]))
+        with self.assertRaises(ValueError):
+            pykbi.CorrectFiniteSize(self.rdfs, variable="V")
+
+
+class TestCorrectVanDerVegtStack(unittest.TestCase):
+
+    def setUp(self):
+        self.r = np.linspace(0.01, 5.0, 500)
+        self.npart = np.array([1000, 2000, 1500])
+        self.lt = np.array([10.0, 12.6, 11.4])
+        self.eqint = np.array([True, False, True])
+        self.gr = np.array([pykbi.odf(self.r, 2.0) * (1.0 + 0.01 * k) for k in range(3)])
+
+    def reference(self, i):
+        # the correction as it was written for a single rdf, with scipy's cumtrapz
+        volume = self.lt[i]**3
+        c1 = self.npart[i] * (1.0 - ((4.0 * np.pi * self.r**3 / 3.0) / volume))
+        c2 = self.npart[i] / volume * 4.0 * np.pi * scipy.integrate.cumulative_trapezoid(
+            (self.gr[i] - 1.0) * self.r**2, self.r, initial=0.0)
+        return self.gr[i] * (c1 / (c1 - c2 - int(self.eqint[i])))
+
+    def test_single(self):
+        gr = pykbi.CorrectVanDerVegtStack(self.r, self.gr[0], self.npart[0], self.lt[0]**3, True)
+        np.testing.assert_allclose(gr, self.reference(0), rtol=1e-12)
+
+    def test_stack(self):
+        gr = pykbi.CorrectVanDerVegtStack(self.r, self.gr, self.npart, self.lt**3, self.eqint)
+        self.assertEqual(gr.shape, self.gr.shape)
+        for i in range(3):
+            np.testing.assert_allclose(gr[i], self.reference(i), rtol=1e-12)
+            rdf = pykbi.RDF(self.r, self.gr[i], npart=self.npart[i], box_size=self.lt[i],
+                            eqint=self.eqint[i])
+            np.testing.assert_allclose(pykbi.CorrectVanDerVegt(rdf).gr, self.reference(i),
+                                       rtol=1e-12)
+
+    def test_in_place(self):
+        expected = pykbi.CorrectVanDerVegtStack(self.r, self.gr, self.npart, self.lt**3, self.eqint)
+        gr = self.gr.copy()
+        result = pykbi.CorrectVanDerVegtStack(self.r, gr, self.npart, self.lt**3, self.eqint, out=gr)
+        self.assertIs(result, gr)
+        np.testing.assert_array_equal(gr, expected)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            pykbi.CorrectVanDerVegtStack(self.r[1:], self.gr, self.npart, self.lt**3, self.eqint)
+        with self.assertRaises(ValueError):
+            pykbi.CorrectVanDerVegtStack(self.r, self.gr, self.npart, self.lt**3, self.eqint,
+                                         out=np.empty(len(self.r)))
+
+
+if __name__ == "__main__":
+    unittest.main()
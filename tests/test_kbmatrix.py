@@ -0,0 +1,89 @@
+import unittest
+import numpy as np
+import pykbi
+
+
+class TestKBMatrix(unittest.TestCase):
+
+    def setUp(self):
+        self.r = np.linspace(0.01, 5.0, 500)
+        self.lt = 10.0
+        self.npart = [1000, 400, 200]
+        self.species = ["a", "b", "c"]
+        self.sigma = {(0, 0): 1.0, (0, 1): 1.1, (0, 2): 1.2, (1, 1): 1.3, (1, 2): 1.4, (2, 2): 1.5}
+
+    def _Matrix(self, closed=True, **kwargs):
+        kbm = pykbi.KBMatrix(self.species, **kwargs)
+        for (i, j), sigma in self.sigma.items():
+            kbm.AddRDF(i, j, pykbi.RDF(self.r, pykbi.odf(self.r, sigma), closed=closed,
+                                       npart=self.npart[i], box_size=self.lt, eqint=(i == j)))
+        return kbm
+
+    def test_matches_pairs(self):
+        kbm = self._Matrix()
+        G = kbm.Integrate(position=(0.3, 0.6))
+        np.testing.assert_allclose(G, G.T)
+        np.testing.assert_allclose(kbm.c, np.array(self.npart) / self.lt**3)
+        for (i, j), sigma in self.sigma.items():
+            rdf = pykbi.RDF(self.r, pykbi.odf(self.r, sigma), npart=self.npart[i],
+                            box_size=self.lt, eqint=(i == j))
+            rdf.Integrate()
+            rdf.FindValues((0.3, 0.6))
+            self.assertAlmostEqual(G[i, j], rdf.ReturnKBI())
+
+    def test_kbdata(self):
+        kbm = self._Matrix()
+        self.assertIsNone(kbm.ReturnKBdata())
+        kbm.Integrate(position=(0.3, 0.6))
+        kbdata = kbm.ReturnKBdata()
+        reference = pykbi.KBdataNcomp(kbm.G, kbm.c)
+        reference.CalculateProperties()
+        np.testing.assert_allclose(kbdata.pmv, reference.pmv)
+
+    def test_workers(self):
+        batched = self._Matrix().Integrate(position=(0.3, 0.6), correction="vdv")
+        serial = self._Matrix().Integrate(position=[0.3, 0.6], correction="vdv", workers=1)
+        np.testing.assert_allclose(batched, serial)
+
+    def test_open_vdv(self):
+        kbm = self._Matrix(closed=False)
+        G = kbm.Integrate(position=(4.0,), correction="vdv")
+        self.assertIsNotNone(G)
+        for (i, j), sigma in self.sigma.items():
+            rdf = pykbi.RDF(self.r, pykbi.odf(self.r, sigma), closed=False, npart=self.npart[i],
+                            box_size=self.lt, eqint=(i == j))
+            rdf = pykbi.CorrectVanDerVegt(rdf)
+            rdf.Integrate()
+            rdf.FindValues((4.0,))
+            self.assertAlmostEqual(G[i, j], rdf.ReturnKBI())
+
+    def test_bookkeeping(self):
+        kbm = pykbi.KBMatrix(self.species, npart=self.npart, box_size=self.lt)
+        for (i, j), sigma in self.sigma.items():
+            # the pair given in reverse order, without metadata
+            kbm.AddRDF(self.species[j], self.species[i],
+                       pykbi.RDF(self.r, pykbi.odf(self.r, sigma), closed=False))
+        kbm.Integrate()
+        self.assertTrue(kbm.rdfs[(0, 0)].eqint)
+        self.assertFalse(kbm.rdfs[(1, 0)].eqint)
+        self.assertEqual(kbm.rdfs[(1, 0)].npart, self.npart[1])
+        np.testing.assert_allclose(kbm.G, kbm.G.T)
+
+    def test_invalid(self):
+        kbm = pykbi.KBMatrix(self.species)
+        with self.assertRaises(ValueError):
+            kbm.AddRDF("a", "d", pykbi.RDF(self.r, pykbi.odf(self.r, 1.0)))
+        kbm.AddRDF("a", "a", pykbi.RDF(self.r, pykbi.odf(self.r, 1.0)))
+        self.assertEqual(len(kbm.ReturnMissingPairs()), 5)
+        with self.assertRaises(ValueError):
+            kbm.Integrate(position=(0.3, 0.6))
+        # the number of particles of 'c' is unknown once its rdf is replaced by one without
+        # npart
+        kbm = self._Matrix()
+        kbm.AddRDF("c", "c", pykbi.RDF(self.r, pykbi.odf(self.r, 1.5), box_size=self.lt))
+        with self.assertRaises(ValueError):
+            kbm.ReturnConcentrations()
+
+
+if __name__ == "__main__":
+    unittest.main()
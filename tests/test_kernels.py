@@ -0,0 +1,98 @@
+import unittest
+import numpy as np
+import pykbi
+import pykbi.numerics
+
+
+class TestKernels(unittest.TestCase):
+
+    def setUp(self):
+        self.r = np.linspace(0.01, 10.0, 400)
+        self.gr = pykbi.odf(self.r, 2.0)
+
+    def test_cortes_huerto(self):
+        # ideal particles in a closed box, g(r) = 1 - 1/N
+        gr = np.full(len(self.r), 1.0 - 1.0 / 1000)
+        closed = pykbi.RDF(self.r, gr, npart=1000, box_size=25.0, eqint=True)
+        closed.Integrate()
+        rdf = pykbi.RDF(self.r, gr, npart=1000, box_size=25.0, eqint=True, kernel="cortes_huerto")
+        rdf.Integrate()
+        sphere = np.pi * self.r[1:]**3 / 6.0
+        np.testing.assert_allclose(closed.kbi[-1], -sphere[-1] / 1000, rtol=1e-3)
+        # it drops out up to the discretisation, large for the first few bins
+        np.testing.assert_allclose(rdf.kbi[100:] / sphere[100:] * 1000, 0.0, atol=1e-4)
+        # the closed integral, corrected for every R
+        gr = np.stack([self.gr, pykbi.odf(self.r, 3.0)])
+        rdfset = pykbi.RDFSet(self.r, gr, npart=[1000, 500], box_size=25.0, eqint=[True, False],
+                              kernel="cortes_huerto")
+        rdfset.Integrate()
+        for i, (npart, eqint) in enumerate([(1000, True), (500, False)]):
+            closed = pykbi.RDF(self.r, gr[i], npart=npart, box_size=25.0, eqint=eqint)
+            closed.Integrate()
+            expected = (closed.kbi + eqint * sphere / npart) / (1.0 - sphere / 25.0**3)
+            np.testing.assert_allclose(rdfset.kbi[i], expected)
+        self.assertNotIn("cube_truncated", pykbi.ReturnKernelNames())
+        rdf = pykbi.RDF(self.r, self.gr, kernel="cortes_huerto")
+        rdf.Integrate()
+        self.assertIsNone(rdf.kbi)
+
+    def test_ganguly(self):
+        rdf = pykbi.RDF(self.r, self.gr, npart=1000, box_size=25.0, eqint=True, kernel="ganguly")
+        rdf.Integrate()
+        corrected = pykbi.CorrectVanDerVegt(pykbi.RDF(self.r, self.gr, closed=False, npart=1000,
+                                                      box_size=25.0, eqint=True))
+        corrected.Integrate()
+        np.testing.assert_allclose(rdf.kbi, corrected.kbi)
+        rdf.FindValues((8.0,))
+        self.assertIn("rint_value", rdf.integral_value)
+
+    def test_register_and_batch(self):
+        pykbi.RegisterKernel(pykbi.Kernel("linear", [(0, 1.0), (1, -1.0)], readout="extrapolate"))
+        self.addCleanup(pykbi.UnregisterKernel, "linear")
+        gr = np.stack([self.gr, pykbi.odf(self.r, 3.0)])
+        rdfset = pykbi.RDFSet(self.r, gr, npart=1000, box_size=25.0, eqint=[True, False],
+                              kernel="linear")
+        rdfset.Integrate()
+        rdfset.FindValues((0.15, 0.3))
+        for i in range(2):
+            rdf = pykbi.RDF(self.r, gr[i], kernel="linear")
+            rdf.Integrate()
+            rdf.FindValues((0.15, 0.3))
+            self.assertAlmostEqual(rdfset.ReturnKBI()[i], rdf.ReturnKBI())
+        self.assertIn("linear", pykbi.ReturnKernelNames())
+
+    def test_simpson(self):
+        pykbi.RegisterKernel(pykbi.Kernel("open_simpson", [(0, 1.0)], rule="simpson"))
+        self.addCleanup(pykbi.UnregisterKernel, "open_simpson")
+        rdf = pykbi.RDF(self.r, self.gr, kernel="open_simpson")
+        rdf.Integrate()
+        h = self.gr - 1.0
+        expected = 4.0 * np.pi * pykbi.numerics.cumsimpson(h * self.r**2, self.r)
+        np.testing.assert_allclose(rdf.kbi, expected)
+        with self.assertRaises(ValueError):
+            pykbi.Kernel("midpoint", [(0, 1.0)], rule="midpoint")
+
+    def test_float32(self):
+        r = np.linspace(0.01, 50.0, 200000)
+        gr = pykbi.odf(r, 2.0)
+        single = pykbi.RDF(r, gr.astype(np.float32), closed=False)
+        double = pykbi.RDF(r, gr.astype(np.float32).astype(np.float64), closed=False)
+        single.Integrate()
+        double.Integrate()
+        self.assertEqual(single.kbi.dtype, np.float64)
+        np.testing.assert_array_equal(single.kbi, double.kbi)
+
+    def test_unregister(self):
+        pykbi.RegisterKernel(pykbi.Kernel("temporary", [(0, 1.0)]))
+        pykbi.UnregisterKernel("temporary")
+        self.assertIsNone(pykbi.ReturnKernel("temporary"))
+        self.assertNotIn("temporary", pykbi.ReturnKernelNames())
+
+    def test_unknown(self):
+        rdf = pykbi.RDF(self.r, self.gr, kernel="unknown")
+        rdf.Integrate()
+        self.assertIsNone(rdf.kbi)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import numpy as np
+import scipy.integrate
+import scipy.stats
+from pykbi import numerics
+
+
+class TestNumerics(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        self.x = np.sort(rng.random(50)) * 10.0
+        self.y = rng.normal(size=(3, 50))
+
+    def test_trapz(self):
+        np.testing.assert_allclose(numerics.trapz(self.y, self.x),
+                                   scipy.integrate.trapezoid(self.y, self.x))
+
+    def test_cumtrapz(self):
+        np.testing.assert_array_equal(numerics.cumtrapz(self.y, self.x),
+                                      scipy.integrate.cumulative_trapezoid(self.y, self.x))
+        result = numerics.cumtrapz(self.y.T, self.x, axis=0, initial=0.0)
+        np.testing.assert_array_equal(
+            result, scipy.integrate.cumulative_trapezoid(self.y.T, self.x, axis=0, initial=0.0))
+
+    def test_linregress(self):
+        slope, intercept, r_value, p_value, std_error = numerics.linregress(self.x, self.y)
+        for i in range(3):
+            fit = scipy.stats.linregress(self.x, self.y[i])
+            self.assertAlmostEqual(slope[i], fit.slope)
+            self.assertAlmostEqual(intercept[i], fit.intercept)
+            self.assertAlmostEqual(r_value[i], fit.rvalue)
+            self.assertAlmostEqual(p_value[i], fit.pvalue)
+            self.assertAlmostEqual(std_error[i], fit.stderr)
+
+    def test_linregress_two_points(self):
+        slope, intercept, r_value, p_value, std_error = numerics.linregress(
+            np.array([1.0, 2.0]), np.array([3.0, 5.0]))
+        self.assertAlmostEqual(slope, 2.0)
+        self.assertAlmostEqual(intercept, 1.0)
+        self.assertEqual(p_value, 0.0)
+        self.assertEqual(std_error, 0.0)
+
+    def test_pairwise_cumsum(self):
+        values = np.random.default_rng(5).random((2, 100000)).astype(np.float32)
+        exact = np.cumsum(values.astype(np.longdouble), axis=-1)
+        result = numerics.pairwise_cumsum(values)
+        self.assertEqual(result.dtype, np.float64)
+        self.assertLess(np.abs(result - exact).max(), np.abs(np.cumsum(values, axis=-1) - exact).max())
+        np.testing.assert_allclose(result, exact, rtol=1e-14)
+        out = np.empty((100000, 2))
+        self.assertIs(numerics.pairwise_cumsum(values.T, axis=0, out=out), out)
+        np.testing.assert_array_equal(out, result.T)
+
+    def test_cumtrapz_pairwise(self):
+        np.testing.assert_allclose(numerics.cumtrapz(self.y, self.x, pairwise=True),
+                                   scipy.integrate.cumulative_trapezoid(self.y, self.x), rtol=1e-12)
+        result = numerics.cumtrapz(self.y.T, self.x, axis=0, initial=0.0, pairwise=True)
+        np.testing.assert_allclose(
+            result, scipy.integrate.cumulative_trapezoid(self.y.T, self.x, axis=0, initial=0.0),
+            rtol=1e-12)
+        # float32 values are integrated in float64
+        single = self.y.astype(np.float32)
+        np.testing.assert_array_equal(numerics.cumtrapz(single, self.x, pairwise=True),
+                                      numerics.cumtrapz(single.astype(np.float64), self.x,
+                                                        pairwise=True))
+
+    def test_cumsimpson(self):
+        # exact for a parabola on any grid
+        y = 1.0 + 2.0 * self.x - 0.5 * self.x**2
+        exact = self.x + self.x**2 - self.x**3 / 6.0
+        for pairwise in (False, True):
+            result = numerics.cumsimpson(y, self.x, initial=0.0, pairwise=pairwise)
+            np.testing.assert_allclose(result, exact - exact[0], atol=1e-12)
+        # fourth order on a uniform grid
+        x = np.linspace(0.0, 3.0, 201)
+        error = np.abs(numerics.cumsimpson(np.sin(x), x) - (1.0 - np.cos(x[1:]))).max()
+        self.assertLess(error, 1e-8)
+        np.testing.assert_allclose(numerics.cumsimpson(self.y, self.x),
+                                   numerics.cumsimpson(self.y.T, self.x, axis=0).T)
+
+
+if __name__ == "__main__":
+    unittest.main()
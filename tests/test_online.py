@@ -0,0 +1,54 @@
+import unittest
+import numpy as np
+import pykbi
+
+
+class TestOnlineKBI(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        self.r = np.linspace(0.01, 20.0, 400)
+        self.frames = pykbi.odf(self.r, 2.0) + rng.normal(0.0, 0.02, (6, 400))
+        self.mean = self.frames.mean(axis=0)
+
+    def reference(self, closed, position, vdv=False):
+        rdf = pykbi.RDF(self.r, self.mean, closed=closed, npart=800, box_size=42.0, eqint=True)
+        if vdv:
+            rdf = pykbi.CorrectVanDerVegt(rdf)
+        rdf.Integrate()
+        rdf.FindValues(position)
+        return rdf
+
+    def test_closed(self):
+        online = pykbi.OnlineKBI(self.r, closed=True)
+        online.AddFrames(self.frames)
+        value = online.FindValues((0.1, 0.2))
+        reference = self.reference(True, (0.1, 0.2))
+        self.assertAlmostEqual(value, reference.ReturnKBI())
+        np.testing.assert_allclose(online.rdf.kbi, reference.kbi, atol=1e-10)
+
+    def test_open(self):
+        online = pykbi.OnlineKBI(self.r, closed=False)
+        for gr in self.frames:
+            online.AddFrame(gr)
+            online.FindValues()
+        self.assertEqual(online.nframes, 6)
+        self.assertAlmostEqual(online.ReturnKBI(), self.reference(False, None).ReturnKBI())
+
+    def test_vdv(self):
+        online = pykbi.OnlineKBI(self.r, closed=True, npart=800, box_size=42.0,
+                                 eqint=True, vdv=True)
+        online.AddFrames(self.frames)
+        value = online.FindValues((0.1, 0.2))
+        reference = self.reference(True, (0.1, 0.2), vdv=True)
+        np.testing.assert_allclose(online.rdf.gr, reference.gr)
+        self.assertAlmostEqual(value, reference.ReturnKBI())
+
+    def test_no_frames(self):
+        online = pykbi.OnlineKBI(self.r)
+        self.assertIsNone(online.FindValues((0.1, 0.2)))
+        self.assertRaises(ValueError, lambda: online.AddFrame(np.ones(3)))
+
+
+if __name__ == "__main__":
+    unittest.main()
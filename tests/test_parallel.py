@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pykbi
+
+
+class TestProcessRDFs(unittest.TestCase):
+
+    def setUp(self):
+        self.r = np.linspace(0.01, 15.0, 300)
+        self.rdfs = [pykbi.RDF(self.r, pykbi.odf(self.r, chi), npart=500, box_size=32.0,
+                               eqint=True, name="chi={}".format(chi))
+                     for chi in (1.0, 1.5, 2.0, 2.5)]
+
+    def reference(self, correction=None):
+        values = []
+        for rdf in self.rdfs:
+            if correction == "vdv":
+                rdf = pykbi.CorrectVanDerVegt(rdf)
+            rdf.Integrate()
+            rdf.FindValues((0.1, 0.2))
+            values.append(rdf.ReturnKBI())
+        return values
+
+    def test_serial(self):
+        results = pykbi.ProcessRDFs(self.rdfs, position=(0.1, 0.2), workers=1)
+        # the input objects are not integrated in place
+        self.assertIsNone(self.rdfs[0].kbi)
+        self.assertEqual([rdf.ReturnKBI() for rdf in results], self.reference())
+
+    def test_positions(self):
+        results = pykbi.ProcessRDFs(self.rdfs, position=[0.1, 0.2], workers=1)
+        self.assertEqual([rdf.ReturnKBI() for rdf in results], self.reference())
+        results = pykbi.ProcessRDFs(self.rdfs, position=[(0.1, 0.2)] * len(self.rdfs), workers=1)
+        self.assertEqual([rdf.ReturnKBI() for rdf in results], self.reference())
+        with self.assertRaises(ValueError):
+            pykbi.ProcessRDFs(self.rdfs, position=[(0.1, 0.2)] * (len(self.rdfs) - 1))
+
+    def test_open_vdv(self):
+        for rdf in self.rdfs:
+            rdf.integral_type = "open"
+        expected = []
+        for rdf in self.rdfs:
+            corrected = pykbi.CorrectVanDerVegt(rdf)
+            corrected.Integrate()
+            corrected.FindValues((10.0,))
+            expected.append(corrected.ReturnKBI())
+        for workers in (1, 2):
+            # a number is read out as the first position
+            results = pykbi.ProcessRDFs(self.rdfs, correction="vdv", position=10.0,
+                                        workers=workers)
+            self.assertEqual([rdf.integral_type for rdf in results], ["open"] * len(self.rdfs))
+            np.testing.assert_allclose([rdf.ReturnKBI() for rdf in results], expected)
+
+    def test_parallel_order(self):
+        results = pykbi.ProcessRDFs(self.rdfs, correction="vdv", position=(0.1, 0.2), workers=2)
+        self.assertEqual([rdf.name for rdf in results], [rdf.name for rdf in self.rdfs])
+        np.testing.assert_allclose([rdf.ReturnKBI() for rdf in results], self.reference("vdv"))
+
+    def test_files(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, "rdf.txt")
+            np.savetxt(fname, np.column_stack([self.r] + [rdf.gr for rdf in self.rdfs]))
+            specs = [{"file": fname, "column": i + 1, "npart": 500, "box_size": 32.0}
+                     for i in range(len(self.rdfs))]
+            results = pykbi.ProcessRDFs(specs, position=(0.1, 0.2), workers=2)
+        np.testing.assert_allclose([rdf.ReturnKBI() for rdf in results], self.reference())
+
+    def test_unknown_correction(self):
+        self.assertRaises(ValueError, lambda: pykbi.ProcessRDFs(self.rdfs, correction="none"))
+
+
+class TestAccumulateFrames(unittest.TestCase):
+
+    def test_parallel_equals_serial(self):
+        rng = np.random.default_rng(1)
+        frames = [(rng.random((200, 3)) * 10.0, 10.0) for _ in range(5)]
+        serial = pykbi.RDFAccumulator(3.0, 30)
+        serial.AddFrames(frames)
+        parallel = pykbi.AccumulateFrames(iter(frames), 3.0, 30, workers=2, batch=2)
+        self.assertEqual(parallel.nframes, 5)
+        np.testing.assert_allclose(parallel.gr_sum, serial.gr_sum)
+
+
+if __name__ == "__main__":
+    unittest.main()
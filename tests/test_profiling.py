@@ -0,0 +1,81 @@
+import json
+import os
+import pstats
+import tempfile
+import unittest
+import numpy as np
+import pykbi
+import pykbi.fscorr
+from pykbi import profiling
+
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        r = np.linspace(0.01, 20.0, 1000)
+        self.rdf = pykbi.RDF(r, pykbi.odf(r, 2.0), npart=1000, box_size=40.0, eqint=True)
+
+    def tearDown(self):
+        profiling.DisableProfiling()
+
+    def test_stages(self):
+        records = []
+        with profiling.Profile() as profile:
+            profile.AddCallback(records.append)
+            rdf = pykbi.CorrectVanDerVegt(self.rdf)
+            rdf.Integrate()
+            rdf.FindValues((0.1, 0.2))
+            rdf.FindValues((0.1, 0.3))
+            with profiling.Timer("custom"):
+                pass
+        stats = profile.ReturnStats()
+        self.assertEqual(stats["CorrectVanDerVegt"]["calls"], 1)
+        self.assertEqual(stats["CorrectVanDerVegt"]["size"], 1000)
+        self.assertEqual(stats["RDF.Integrate"]["calls"], 1)
+        self.assertEqual(stats["RDF.FindValues"]["calls"], 2)
+        self.assertIn("custom", stats)
+        self.assertEqual(len(records), 5)
+
+    def test_memory(self):
+        with profiling.Profile() as profile:
+            with profiling.Timer("outer"):
+                with profiling.Timer("kept"):
+                    kept = np.ones(1000000)
+                with profiling.Timer("temporary"):
+                    np.ones(1000000).sum()
+        stats = profile.ReturnStats()
+        # the numpy data buffers are seen
+        self.assertGreaterEqual(stats["kept"]["memory"], kept.nbytes)
+        self.assertLess(abs(stats["temporary"]["memory"]), 100000)
+        self.assertGreaterEqual(stats["temporary"]["peak_memory"], 8000000)
+        # the peak of an inner call counts for the outer one
+        self.assertGreaterEqual(stats["outer"]["peak_memory"], 16000000)
+
+    def test_disabled(self):
+        original = pykbi.fscorr.CorrectVanDerVegt
+        method = pykbi.RDF.Integrate
+        profiler = profiling.EnableProfiling()
+        self.assertIsNot(pykbi.CorrectVanDerVegt, original)
+        self.assertIs(profiling.DisableProfiling(), profiler)
+        self.assertIs(pykbi.CorrectVanDerVegt, original)
+        self.assertIs(pykbi.fscorr.CorrectVanDerVegt, original)
+        self.assertIs(pykbi.RDF.Integrate, method)
+        # nothing is recorded once disabled
+        with profiling.Timer("custom"):
+            self.rdf.Integrate()
+        self.assertEqual(profiler.stages, {})
+
+    def test_export(self):
+        with profiling.Profile() as profile:
+            self.rdf.Integrate()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            profile.SaveJSON(os.path.join(tmpdir, "stages.json"))
+            with open(os.path.join(tmpdir, "stages.json")) as infile:
+                self.assertEqual(json.load(infile)["RDF.Integrate"]["calls"], 1)
+            profile.SavePstats(os.path.join(tmpdir, "stages.prof"))
+            stats = pstats.Stats(os.path.join(tmpdir, "stages.prof"))
+            self.assertEqual(stats.total_calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
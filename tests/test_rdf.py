@@ -1,5 +1,9 @@
+import json
+import os
+import tempfile
 import unittest
 import numpy as np
+import scipy.stats
 import pykbi
 
 class TestRDF_Open(unittest.TestCase):
@@ -58,6 +62,17 @@ class TestRDF_Closed(unittest.TestCase):
     def test_integral_type(self):
         self.assertEqual(self.rdf.integral_type, "closed")
 
+    def test_save_json(self):
+        self.rdf.FindValues([2.0, 3.0])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, "closed")
+            self.rdf.SaveToJSON(fname)
+            with open(fname + ".json") as infile:
+                data = json.load(infile)
+        self.assertAlmostEqual(data["G"], 0.0)
+        self.assertEqual(data["std_error"], 0.0)
+        self.assertEqual(data["r"], self.rdf.r.tolist())
+
 
     def test_eqint(self):
         self.assertIsNone(self.rdf.eqint)
@@ -76,6 +91,145 @@ class TestRDF_Closed(unittest.TestCase):
         self.rdf = None
 
 
+class TestRDF_ClosedIntegrator(unittest.TestCase):
+
+    def setUp(self):
+        self.r = np.linspace(0.001, 25.0, 600)
+        self.rdf = pykbi.RDF(self.r, pykbi.odf(self.r, 2.0), closed=True)
+        self.rdf.Integrate()
+
+    def loop_integral(self):
+        # reference implementation, one trapz for every upper limit
+        h = self.rdf.gr - 1.0
+        kbi = np.zeros(len(self.r)-1)
+        for i in range(1, len(self.r)):
+            x = self.r[:i] / self.r[i]
+            kbi[i-1] = pykbi.numerics.trapz(
+                h[:i] * self.r[:i]**2 * (1.0 - 1.5 * x + 0.5 * x**3), self.r[:i])
+        return 4.0 * np.pi * kbi
+
+    def test_matches_loop(self):
+        np.testing.assert_allclose(self.rdf.kbi, self.loop_integral(), rtol=1e-10, atol=1e-12)
+
+    def test_rint(self):
+        np.testing.assert_array_equal(self.rdf.rint, self.r[1:])
+
+    def TearDown(self):
+        self.rdf = None
+
+
+class TestRDF_ScanWindows(unittest.TestCase):
+
+    def setUp(self):
+        # G(R) linear in 1/R below 1/R = 0.2, curved above
+        r = np.linspace(1.0, 20.0, 200)
+        self.rdf = pykbi.RDF(r, np.ones(len(r)), closed=True)
+        self.rdf.Integrate()
+        r_inverse = 1.0 / self.rdf.rint
+        noise = np.random.default_rng(3).normal(0.0, 1e-3, len(r_inverse))
+        self.rdf.kbi = -2.0 + 3.0 * r_inverse + 20.0 * np.maximum(r_inverse - 0.2, 0.0)**2 + noise
+
+    def test_r2(self):
+        self.rdf.ScanWindows(min_points=30)
+        self.assertAlmostEqual(self.rdf.ReturnKBI(), -2.0, places=2)
+        self.assertLess(self.rdf.integral_value["value_limit"][0], 0.25)
+        self.assertGreaterEqual(self.rdf.integral_value["npoints"], 30)
+
+    def test_stderr(self):
+        self.rdf.ScanWindows(criterion="stderr", min_points=10)
+        self.assertAlmostEqual(self.rdf.ReturnKBI(), -2.0, places=2)
+        self.assertGreater(self.rdf.integral_value["intercept_error"], 0.0)
+
+    def test_matches_linregress(self):
+        # a criterion that only accepts a single window
+        self.rdf.ScanWindows(criterion=lambda stats: -abs(stats["start"] - 150) - abs(stats["stop"] - 190))
+        self.assertEqual(self.rdf.integral_value["index_limit"], [150, 190])
+        x = 1.0 / self.rdf.rint[150:191]
+        fit = scipy.stats.linregress(x, self.rdf.kbi[150:191])
+        self.assertAlmostEqual(self.rdf.ReturnKBI(), fit.intercept)
+        self.assertAlmostEqual(self.rdf.integral_value["slope"], fit.slope)
+
+    def test_open_system(self):
+        rdf = pykbi.RDF(np.linspace(0.1, 1.1, 10), np.ones(10), closed=False)
+        rdf.Integrate()
+        rdf.ScanWindows()
+        self.assertIsNone(rdf.integral_value)
+
+    def TearDown(self):
+        self.rdf = None
+
+
+class TestRDF_Compact(unittest.TestCase):
+
+    def setUp(self):
+        self.r = np.linspace(0.01, 20.0, 2000)
+        self.gr = pykbi.odf(self.r, 2.0)
+
+    def test_uniform_grid(self):
+        rdf = pykbi.RDF(self.r, self.gr, compact=True)
+        self.assertIsNone(rdf._r)
+        self.assertEqual(rdf.gr.dtype, np.float32)
+        np.testing.assert_allclose(rdf.r, self.r, rtol=1e-12)
+        rdf.Integrate()
+        self.assertEqual(rdf.kbi.dtype, np.float32)
+        np.testing.assert_allclose(rdf.rint, self.r[1:], rtol=1e-12)
+        # the grid is built once, rint is a view of it, and it is read-only
+        self.assertIs(rdf.r, rdf.r)
+        self.assertTrue(np.shares_memory(rdf.rint, rdf.r))
+        with self.assertRaises(ValueError):
+            rdf.r[0] = 0.0
+        rdf.Truncate(10.0)
+        self.assertLessEqual(rdf.r[-1], 10.0)
+        self.assertEqual(len(rdf.r), len(rdf.gr))
+
+    def test_integral(self):
+        full = pykbi.RDF(self.r, self.gr)
+        full.Integrate()
+        full.FindValues((0.1, 0.2))
+        rdf = pykbi.RDF(self.r, self.gr, compact=True)
+        rdf.Integrate()
+        rdf.FindValues((0.1, 0.2))
+        np.testing.assert_allclose(rdf.kbi, full.kbi, rtol=1e-5, atol=1e-5)
+        self.assertAlmostEqual(rdf.ReturnKBI(), full.ReturnKBI(), places=4)
+
+    def test_nonuniform_grid(self):
+        r = np.sort(np.random.default_rng(1).uniform(0.1, 5.0, 100))
+        rdf = pykbi.RDF(r, np.ones(100), compact=True)
+        self.assertIs(rdf.r, r)
+        rdf.Integrate()
+        self.assertTrue(np.shares_memory(rdf.rint, r))
+
+
+class TestRDF_Plateau(unittest.TestCase):
+
+    def setUp(self):
+        # the open integral of a gaussian h(r) converges to A (2 pi)^(3/2)
+        self.r = np.linspace(0.0, 30.0, 3001)
+        self.rdf = pykbi.RDF(self.r, 1.0 - 0.5 * np.exp(-self.r**2 / 2.0), closed=False)
+        self.rdf.Integrate()
+        self.G = -0.5 * (2.0 * np.pi)**1.5
+
+    def test_smallest_spread(self):
+        self.rdf.FindPlateau(width=2.0)
+        self.assertAlmostEqual(self.rdf.ReturnKBI(), self.G, places=3)
+        self.assertLess(self.rdf.integral_value["spread"], 1e-6)
+
+    def test_tolerance_truncate(self):
+        self.rdf.FindPlateau(width=1.0, tolerance=1e-3, truncate=True)
+        self.assertAlmostEqual(self.rdf.ReturnKBI(), self.G, places=2)
+        rmax = self.rdf.integral_value["rint_value"]
+        self.assertLess(rmax, 10.0)
+        self.assertEqual(self.rdf.r[-1], rmax)
+        self.assertEqual(len(self.rdf.kbi), len(self.rdf.r) - 1)
+        np.testing.assert_array_equal(self.rdf.rint, self.rdf.r[1:])
+
+    def test_no_plateau(self):
+        rdf = pykbi.RDF(self.r, 1.0 + 0.1 * np.sin(self.r), closed=False)
+        rdf.Integrate()
+        rdf.FindPlateau(width=1.0, tolerance=1e-3)
+        self.assertIsNone(rdf.ReturnKBI())
+
+
 class TestRDF_Initiating(unittest.TestCase):
 
     def setUp(self):
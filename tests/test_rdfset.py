@@ -0,0 +1,85 @@
+import unittest
+import numpy as np
+import pykbi
+
+
+class TestRDFSet_Closed(unittest.TestCase):
+
+    def setUp(self):
+        self.r = np.linspace(0.01, 20.0, 400)
+        self.chis = [1.0, 2.0, 3.0]
+        self.rdfs = [pykbi.RDF(self.r, pykbi.odf(self.r, chi), npart=500, box_size=40.0,
+                               eqint=(chi < 2.5), name="chi={}".format(chi))
+                     for chi in self.chis]
+        self.rdfset = pykbi.RDFSet.FromRDFs(self.rdfs)
+
+    def test_shape(self):
+        self.assertEqual(self.rdfset.gr.shape, (3, 400))
+        self.assertEqual(len(self.rdfset), 3)
+
+    def test_integrate(self):
+        self.rdfset.Integrate()
+        for i, rdf in enumerate(self.rdfs):
+            rdf.Integrate()
+            np.testing.assert_allclose(self.rdfset.kbi[i], rdf.kbi, rtol=1e-12, atol=1e-14)
+
+    def test_extrapolation(self):
+        self.rdfset.Integrate()
+        self.rdfset.FindValues((0.1, 0.2))
+        for i, rdf in enumerate(self.rdfs):
+            rdf.Integrate()
+            rdf.FindValues((0.1, 0.2))
+            self.assertAlmostEqual(self.rdfset.ReturnKBI()[i], rdf.ReturnKBI())
+            self.assertAlmostEqual(self.rdfset.integral_value["slope"][i],
+                                   rdf.integral_value["slope"])
+
+    def test_vdv(self):
+        corrected = self.rdfset.CorrectVanDerVegt()
+        for i, rdf in enumerate(self.rdfs):
+            np.testing.assert_allclose(corrected.gr[i], pykbi.CorrectVanDerVegt(rdf).gr)
+
+    def test_corrections_keep_kernel(self):
+        self.rdfset.integral_type = "open"
+        self.assertEqual(self.rdfset.CorrectVanDerVegt().integral_type, "open")
+        other = pykbi.RDFSet(self.r, self.rdfset.gr, npart=1000, box_size=50.0,
+                             eqint=self.rdfset.eqint, kernel="open")
+        self.assertEqual(self.rdfset.CorrectInverseN(other).integral_type, "open")
+        self.assertEqual(pykbi.CorrectVanDerVegt(self.rdfs[0]).integral_type, "closed")
+        self.rdfs[0].integral_type = "open"
+        self.assertEqual(pykbi.CorrectVanDerVegt(self.rdfs[0]).integral_type, "open")
+
+    def test_view(self):
+        self.rdfset.Integrate()
+        self.rdfset.FindValues((0.1, 0.2))
+        rdf = self.rdfset[1]
+        self.assertIsInstance(rdf, pykbi.RDF)
+        self.assertEqual(rdf.name, "chi=2.0")
+        self.assertEqual(rdf.npart, 500)
+        self.assertTrue(np.shares_memory(rdf.gr, self.rdfset.gr))
+        self.assertAlmostEqual(rdf.ReturnKBI(), self.rdfset.ReturnKBI()[1])
+
+    def tearDown(self):
+        self.rdfset = None
+
+
+class TestRDFSet_Open(unittest.TestCase):
+
+    def setUp(self):
+        n = 10
+        self.rdfset = pykbi.RDFSet(np.linspace(0.1, 1.1, n), np.ones((4, n)), closed=False)
+        self.rdfset.Integrate()
+
+    def test_extrapolation(self):
+        self.rdfset.FindValues()
+        np.testing.assert_allclose(self.rdfset.ReturnKBI(), np.zeros(4))
+
+    def test_wrong_input(self):
+        self.assertRaises(ValueError, lambda: pykbi.RDFSet(np.zeros(3), np.zeros((2, 4))))
+        self.assertRaises(TypeError, lambda: pykbi.RDFSet(np.zeros(3), 1.0))
+
+    def tearDown(self):
+        self.rdfset = None
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pykbi
+
+
+class TestReader(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.r = np.linspace(0.01, 5.0, 50)
+        self.data = np.column_stack([self.r, pykbi.odf(self.r, 2.0), pykbi.odf(self.r, 3.0)])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def fname(self, name):
+        return os.path.join(self.tmpdir.name, name)
+
+    def test_text_sidecar(self):
+        fname = self.fname("rdf.txt")
+        np.savetxt(fname, self.data, header="npart 1200 600 600")
+        rdffile = pykbi.ReadRDFFile(fname)
+        self.assertEqual(rdffile.format, "text")
+        self.assertTrue(os.path.exists(fname + ".pykbi"))
+        np.testing.assert_allclose(rdffile.data, self.data)
+        # the second open uses the memory-mapped sidecar
+        rdffile = pykbi.ReadRDFFile(fname)
+        self.assertIsInstance(rdffile.data, np.memmap)
+        rdf = rdffile.ReturnRDF(2, npart=1200)
+        np.testing.assert_allclose(rdf.gr, self.data[:, 2])
+        rdfset = rdffile.ReturnRDFSet(slice(1, 3))
+        self.assertEqual(len(rdfset), 2)
+        self.assertTrue(np.shares_memory(rdfset.gr, rdffile.data))
+
+    def test_rmax(self):
+        fname = self.fname("rdf.txt")
+        np.savetxt(fname, self.data)
+        rdffile = pykbi.ReadRDFFile(fname, rmax=2.0)
+        np.testing.assert_allclose(rdffile.data, self.data[self.r <= 2.0])
+        # the sidecar of a different rmax is not reused
+        rdffile = pykbi.ReadRDFFile(fname)
+        self.assertEqual(len(rdffile), 50)
+        raw = self.fname("rdf.bin")
+        self.data.tofile(raw)
+        self.assertEqual(len(pykbi.ReadRDFFile(raw, ncols=3, rmax=2.0)), np.sum(self.r <= 2.0))
+
+    def test_xvg(self):
+        fname = self.fname("rdf.xvg")
+        with open(fname, "w") as outfile:
+            outfile.write("# GROMACS\n@    title \"Radial distribution\"\n@TYPE xy\n")
+            np.savetxt(outfile, self.data)
+            outfile.write("&\n")
+        rdffile = pykbi.ReadRDFFile(fname, cache=False)
+        np.testing.assert_allclose(rdffile.data, self.data)
+
+    def test_lammps(self):
+        fname = self.fname("rdf.lammps")
+        blocks = [self.data, 2.0 * self.data]
+        with open(fname, "w") as outfile:
+            outfile.write("# Time-averaged data for fix rdf\n# TimeStep Number-of-rows\n")
+            outfile.write("# Row c_rdf[1] c_rdf[2] c_rdf[3]\n")
+            for step, block in enumerate(blocks):
+                outfile.write("{} {}\n".format(1000 * step, len(block)))
+                rows = np.column_stack([np.arange(1, len(block) + 1), block])
+                np.savetxt(outfile, rows)
+        rdffile = pykbi.ReadRDFFile(fname, cache=False)
+        self.assertEqual(rdffile.format, "lammps")
+        np.testing.assert_allclose(rdffile.data[:, 1:], 1.5 * self.data)
+        last = pykbi.ReadRDFFile(fname, cache=False, block=-1)
+        np.testing.assert_allclose(last.data[:, 1:], 2.0 * self.data)
+        first = pykbi.ReadRDFFile(fname, cache=False, block=0)
+        np.testing.assert_allclose(first.data[:, 1:], self.data)
+        # column 0 is the row index, r is in column 1
+        self.assertEqual(first.r_column, 1)
+        np.testing.assert_allclose(first.ReturnRDF(2).r, self.r)
+        np.testing.assert_allclose(first.ReturnRDFSet(slice(2, 4)).r, self.r)
+        short = pykbi.ReadRDFFile(fname, cache=False, block=0, rmax=2.0)
+        np.testing.assert_allclose(short.data[:, 1:], self.data[self.r <= 2.0])
+
+    def test_raw(self):
+        fname = self.fname("rdf.bin")
+        self.data.tofile(fname)
+        rdffile = pykbi.ReadRDFFile(fname, ncols=3)
+        np.testing.assert_array_equal(rdffile.data, self.data)
+        self.assertEqual(len(rdffile), 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
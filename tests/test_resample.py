@@ -0,0 +1,49 @@
+import unittest
+import numpy as np
+import pykbi
+
+
+class TestResample(unittest.TestCase):
+
+    def setUp(self):
+        self.source = np.sort(np.random.default_rng(4).uniform(0.0, 10.0, 400))
+        self.target = np.linspace(1.0, 9.0, 123)
+
+    def test_linear(self):
+        values = np.sin(self.source)
+        plan = pykbi.ResamplePlan(self.source, self.target)
+        np.testing.assert_allclose(plan.Apply(values),
+                                   np.interp(self.target, self.source, values), atol=1e-13)
+
+    def test_cubic_stack(self):
+        values = np.stack([self.source**3, 2.0 - self.source**2])
+        plan = pykbi.ResamplePlan(self.source, self.target, method="cubic")
+        np.testing.assert_allclose(plan.Apply(values),
+                                   np.stack([self.target**3, 2.0 - self.target**2]), rtol=1e-9)
+
+    def test_cached_plan(self):
+        plan = pykbi.ReturnPlan(self.source, self.target)
+        self.assertIs(pykbi.ReturnPlan(self.source.copy(), self.target.copy()), plan)
+        self.assertIsNot(pykbi.ReturnPlan(self.source, self.target, "cubic"), plan)
+
+    def test_common_grid(self):
+        grid = pykbi.CommonGrid([np.linspace(0.0, 10.0, 1001), np.linspace(0.5, 8.0, 151)])
+        np.testing.assert_allclose(grid, np.linspace(0.5, 8.0, 151))
+        with self.assertRaises(ValueError):
+            pykbi.CommonGrid([np.linspace(0.0, 1.0, 10), np.linspace(2.0, 3.0, 10)])
+
+    def test_inverse_n_offset_grids(self):
+        # bin centres against bin edges, with different bin widths
+        r1 = np.arange(0.005, 10.0, 0.01)
+        r2 = np.arange(0.0, 12.0, 0.02)
+        rdf1 = pykbi.RDF(r1, pykbi.odf(r1, 2.0), npart=1000)
+        rdf2 = pykbi.RDF(r2, pykbi.odf(r2, 2.0), npart=2000)
+        rdf = pykbi.CorrectInverseN(rdf1, rdf2, method="cubic")
+        self.assertTrue(np.all(np.diff(rdf.r) > 0.015))
+        # away from the hard core, where the odf has a kink
+        mask = rdf.r > 2.5
+        np.testing.assert_allclose(rdf.gr[mask], pykbi.odf(rdf.r[mask], 2.0), atol=1e-4)
+
+
+if __name__ == "__main__":
+    unittest.main()
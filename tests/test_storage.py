@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pykbi
+
+
+class TestStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        r = np.linspace(0.01, 20.0, 500)
+        self.rdf = pykbi.RDF(r, pykbi.odf(r, 2.0), npart=1200, box_size=14.8,
+                             eqint=False, name="rdf_12")
+        self.rdf.Integrate()
+        self.rdf.FindValues((0.1, 0.2))
+
+    def fname(self, name):
+        return os.path.join(self.tmpdir.name, name)
+
+    def test_roundtrip(self):
+        self.rdf.SaveToBinary(self.fname("single"))
+        self.assertTrue(os.path.exists(self.fname("single.pykbi")))
+        rdf = pykbi.LoadRDF(self.fname("single"))
+        np.testing.assert_array_equal(rdf.gr, self.rdf.gr)
+        np.testing.assert_array_equal(rdf.kbi, self.rdf.kbi)
+        np.testing.assert_array_equal(rdf.rint, self.rdf.rint)
+        self.assertEqual(rdf.npart, 1200)
+        self.assertEqual(rdf.lt, 14.8)
+        self.assertFalse(rdf.eqint)
+        self.assertEqual(rdf.name, "rdf_12")
+        self.assertEqual(rdf.ReturnKBI(), self.rdf.ReturnKBI())
+        np.testing.assert_array_equal(rdf.integral_value["value_limit"],
+                                      self.rdf.integral_value["value_limit"])
+
+    def test_compact(self):
+        r = np.linspace(0.01, 20.0, 500)
+        compact = pykbi.RDF(r, pykbi.odf(r, 2.0), npart=1200, box_size=14.8, compact=True)
+        compact.Integrate()
+        pykbi.SaveRDFs([compact, self.rdf], self.fname("compact.pykbi"))
+        rdfs = pykbi.LoadRDFs(self.fname("compact.pykbi"))
+        self.assertTrue(rdfs[0].compact)
+        self.assertFalse(rdfs[1].compact)
+        self.assertEqual(rdfs[0].gr.dtype, np.float32)
+        np.testing.assert_array_equal(rdfs[0].gr, compact.gr)
+        np.testing.assert_allclose(rdfs[0].r, compact.r)
+        np.testing.assert_array_equal(rdfs[0].kbi, compact.kbi)
+
+    def test_collection_mmap(self):
+        r = np.linspace(0.01, 10.0, 100)
+        rdfset = pykbi.RDFSet(r, np.ones((3, 100)), closed=False, npart=10, names=["a", "b", "c"])
+        pykbi.SaveRDFs(rdfset.ReturnRDFs() + [self.rdf], self.fname("many.pykbi"))
+        rdfs = pykbi.LoadRDFs(self.fname("many.pykbi"), mmap_mode="r")
+        self.assertEqual([rdf.name for rdf in rdfs], ["a", "b", "c", "rdf_12"])
+        self.assertIsInstance(rdfs[0].gr, np.memmap)
+        # the shared grid is stored once
+        self.assertTrue(np.shares_memory(rdfs[0].r, rdfs[2].r))
+        self.assertEqual(rdfs[1].integral_type, "open")
+        self.assertIsNone(rdfs[1].kbi)
+        np.testing.assert_array_equal(rdfs[3].gr, self.rdf.gr)
+
+    def test_wrong_file(self):
+        with open(self.fname("bad.pykbi"), "w") as outfile:
+            outfile.write("not binary")
+        self.assertRaises(ValueError, lambda: pykbi.LoadRDF(self.fname("bad.pykbi")))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    unittest.main()
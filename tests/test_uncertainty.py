@@ -0,0 +1,51 @@
+import unittest
+import numpy as np
+import pykbi
+
+
+class TestKBIUncertainty(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.r = np.linspace(0.01, 20.0, 400)
+        self.blocks = pykbi.odf(self.r, 2.0) + rng.normal(0.0, 0.01, (8, 400))
+
+    def test_block_average(self):
+        result = pykbi.KBIUncertainty(self.blocks, r=self.r, position=(0.1, 0.2),
+                                      resamples=50, seed=1)
+        values = []
+        for gr in self.blocks:
+            rdf = pykbi.RDF(self.r, gr)
+            rdf.Integrate()
+            rdf.FindValues((0.1, 0.2))
+            values.append(rdf.ReturnKBI())
+        np.testing.assert_allclose(result["block_values"], values)
+        self.assertAlmostEqual(result["block_mean"], np.mean(values))
+        self.assertGreater(result["block_std_error"], 0.0)
+
+    def test_bootstrap(self):
+        result = pykbi.KBIUncertainty(self.blocks, r=self.r, position=(0.1, 0.2),
+                                      resamples=300, seed=1, batch=64)
+        low, high = result["confidence_interval"]
+        self.assertLess(low, result["G"])
+        self.assertGreater(high, result["G"])
+        self.assertEqual(len(result["bootstrap_values"]), 300)
+        # the same seed gives the same resamples
+        again = pykbi.KBIUncertainty(self.blocks, r=self.r, position=(0.1, 0.2),
+                                     resamples=300, seed=1)
+        np.testing.assert_array_equal(again["bootstrap_values"], result["bootstrap_values"])
+
+    def test_accumulator_blocks(self):
+        rng = np.random.default_rng(2)
+        acc = pykbi.RDFAccumulator(4.0, 20, block_size=2)
+        acc.AddFrames((rng.random((150, 3)) * 10.0, 10.0) for _ in range(7))
+        self.assertEqual(acc.ReturnBlocks().shape, (3, 20))
+        result = pykbi.KBIUncertainty(acc, closed=False, resamples=20, seed=0)
+        self.assertEqual(result["nblocks"], 3)
+
+    def test_single_block(self):
+        self.assertRaises(ValueError, lambda: pykbi.KBIUncertainty(self.blocks[:1], r=self.r))
+
+
+if __name__ == "__main__":
+    unittest.main()